@@ -0,0 +1,53 @@
+import model as ns
+import matplotlib.pyplot as plt
+from datetime import datetime
+from math import radians
+from duallink import DualDownlink
+
+# Campaign of one week
+start = (2024, 1, 16)
+stop = (2024, 1, 23)
+
+# QSS-Micius (TLE) serves Paris, a second satellite on a similar
+# sun-synchronous orbit (Keplerian) serves Nice
+tle_line_1 = "1 41731U 16051A   24016.15735159  .00011450  00000-0  34540-3 0  9998"
+tle_line_2 = "2 41731  97.3167 289.0989 0012522  59.2544 300.9930 15.34373256413200"
+tle = (tle_line_1, tle_line_2)
+
+kepler = [6872181.5, 0.00132, radians(97.37), radians(178.58), radians(300.), radians(246.08),
+          'TRUE', None, datetime(2024, 1, 16), 3.986004418e14]
+
+micius = ns.Satellite(tle, simType="tle", backend="numpy")
+second = ns.Satellite(kepler, simType="keplerian", backend="numpy")
+
+paris = ns.GroundStation(48.8566, 2.3522, 80, "Paris")
+nice = ns.GroundStation(43.6274, 7.2991, 1200, "Nice")
+
+# Telescopes (0.3 m on board, 0.8 m on the ground), 1550 nm, r0 = 1.5 m and
+# 1 MHz pair source; the atmospheric transmittance of each site is read from
+# transmission_data_<site>.csv
+r0 = 1.5
+reprate = 1e6
+
+# Same satellite for both stations
+single = DualDownlink(micius, paris, nice, 0.3, 0.8, 1550e-9, r0, reprate, minTransmittance=0.01)
+# One satellite per station
+double = DualDownlink(micius, paris, nice, 0.3, 0.8, 1550e-9, r0, reprate, minTransmittance=0.01,
+                      secondSatellite=second)
+
+for name, link in (("Micius -> Paris + Nice", single), ("Micius -> Paris, second -> Nice", double)):
+    perPass, perDay = link.accumulate(start, stop, step=1.)
+    print(name)
+    print(perPass)
+    print(perDay)
+
+    plt.figure()
+    plt.title(f"EPR pairs per day ({name})")
+    plt.semilogy(perDay.index, perDay["pairsNoMemory"], "o-", label="without memory")
+    plt.semilogy(perDay.index, perDay["pairsMemory"], "o-", label="with memory")
+    plt.ylabel("Pairs")
+    plt.xticks(rotation=45)
+    plt.grid()
+    plt.legend()
+
+plt.show()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite.
+
+Measures the throughput [samples/s] and the peak memory (Python and NumPy
+allocations, with tracemalloc) of the main computation paths, at several grid
+sizes:
+    * timelistgen
+    * SimpleDownlinkChannel.calculateChannelParameters for the 'tle',
+      'keplerian' and 'polOrbPass' orbits, with the 'numpy' backend and the
+      'orekit' backend (per-sample and bulk)
+    * transmittance interpolation (TransmittanceTable.interpolate)
+    * end_to_end
+    * visibility.visible
+
+The inputs are fixed (QSS-Micius TLE of the examples, Paris ground station,
+transmission_data_Paris.csv), and nothing is downloaded: the Orekit cases use
+the local Orekit data, given by --orekit-data, the OREKIT_DATA environment
+variable, or 'orekit-data.zip' next to this script (not relative to the
+current directory). The data are not part of the repository; download them
+once, e.g. next to this script with
+    python -c "from orekit.pyhelpers import download_orekit_data_curdir; download_orekit_data_curdir()"
+or point OREKIT_DATA to an existing orekit-data.zip (or data directory).
+Without Orekit or its data, the Orekit cases are skipped: they are listed as
+skipped, with the reason, in the output and in the baseline, so that a
+baseline without them is recognizable.
+
+The results can be saved as a baseline (JSON) and later runs compared against
+it: a case whose throughput drops by more than the threshold, or whose peak
+memory grows by more than the threshold, is reported as a regression, and the
+script exits with status 1. Timings depend on the machine, so no baseline is
+shipped: save one on a reference commit first. --compare without a baseline
+file fails before running anything (status 2).
+
+Usage:
+    python benchmark.py --save-baseline      # on a reference commit
+    python benchmark.py --compare            # later, same machine
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from math import radians
+
+import numpy as np
+
+import model
+import orekitcontext
+import visibility
+from orekitcontext import getContext, orekitContextError
+from transmittance import siteTransmittance
+
+
+DATA_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(DATA_DIRECTORY, 'benchmark_baseline.json')
+DEFAULT_OREKIT_DATA = os.environ.get('OREKIT_DATA', os.path.join(DATA_DIRECTORY, orekitcontext.DEFAULT_DATA_PATH))
+
+# fixed inputs
+START = (2024, 1, 23, 23)
+STOP = (2024, 1, 24, 1)
+TLE = ("1 41731U 16051A   24016.15735159  .00011450  00000-0  34540-3 0  9998",
+       "2 41731  97.3167 289.0989 0012522  59.2544 300.9930 15.34373256413200")
+KEPLER = [6872181.5, 0.00132, radians(97.3699), radians(178.5836), radians(267.45), radians(246.0824),
+          'TRUE', 'EME2000', datetime(2024, 1, 23, 22), 3.986004418e14]
+PARIS = (48.8566, 2.3522, 80, "Paris")
+
+
+def _keplerOrekit():
+    """ KEPLER with the Orekit objects required by the 'orekit' backend """
+    getContext()
+    from org.orekit.frames import FramesFactory
+    from orekit.pyhelpers import datetime_to_absolutedate
+    from org.orekit.orbits import PositionAngleType
+
+    return KEPLER[:6] + [PositionAngleType.TRUE, FramesFactory.getEME2000(),
+                         datetime_to_absolutedate(KEPLER[8]), KEPLER[9]]
+
+
+def orekitUnavailable(dataPath=DEFAULT_OREKIT_DATA):
+    """ Reason why the Orekit context cannot be created offline with the data
+    at dataPath, or None if it can """
+    try:
+        orekitcontext.configure(dataPath)
+        getContext()
+    except (ImportError, orekitContextError) as error:
+        return f"{type(error).__name__}: {error}"
+    return None
+
+
+def benchmarkCases(sizes, maxOrekitSize, orekitSkipped=None):
+    """ Benchmark cases
+
+    Parameters
+    ----------
+    sizes: list of int
+        Numbers of samples.
+    maxOrekitSize: int
+        Largest number of samples of the Orekit cases.
+    orekitSkipped: str, optional
+        If given, the Orekit cases are skipped for this reason.
+
+    Returns
+    -------
+    list of tuple (str, int, callable)
+        Name, number of samples and preparation function of each case. The
+        preparation (not timed) returns the function to benchmark. The
+        preparation of a skipped case is the reason why it is skipped (str).
+    """
+    cases = []
+    for n in sizes:
+        def timelist(n=n):
+            return lambda: model.timelistgen(START, STOP, n)
+
+        def channel(simType, backend, bulk=False, n=n):
+            def prepare():
+                if simType == 'polOrbPass':
+                    sat = model.Satellite(None, simType='polOrbPass', incAngle=10, satAlt=500)
+                elif simType == 'tle':
+                    sat = model.Satellite(TLE, simType='tle', backend=backend)
+                else:
+                    params = KEPLER if backend == 'numpy' else _keplerOrekit()
+                    sat = model.Satellite(params, simType='keplerian', backend=backend)
+                link = model.SimpleDownlinkChannel(sat, model.GroundStation(*PARIS))
+                timeList = model.timelistgen(START, STOP, n)
+                return lambda: link.calculateChannelParameters(timeList, bulk=bulk)
+            return prepare
+
+        def interpolation(n=n):
+            table = siteTransmittance("Paris", directory=DATA_DIRECTORY)
+            elevation = np.linspace(0, 90, n)
+            return lambda: table.interpolate(elevation)
+
+        def endToEnd(n=n):
+            length = np.linspace(5e5, 1.5e6, n)
+            transmittance = np.linspace(0.1, 0.9, n)
+            return lambda: model.end_to_end(0.3, 0.8, 1550e-9, transmittance, length, 1.5)
+
+        def visible(n=n):
+            rng = np.random.default_rng(0)
+            a, b = (x / np.linalg.norm(x, axis=0) * 7e6 for x in rng.normal(size=(2, 3, n)))
+            return lambda: visibility.visible(a, b)
+
+        cases += [
+            (f'timelistgen[{n}]', n, timelist),
+            (f'channel.polOrbPass[{n}]', n, channel('polOrbPass', None)),
+            (f'channel.tle.numpy[{n}]', n, channel('tle', 'numpy')),
+            (f'channel.keplerian.numpy[{n}]', n, channel('keplerian', 'numpy')),
+            (f'transmittance.interpolate[{n}]', n, interpolation),
+            (f'end_to_end[{n}]', n, endToEnd),
+            (f'visibility.visible[{n}]', n, visible),
+        ]
+        if n <= maxOrekitSize:
+            for simType in ('tle', 'keplerian'):
+                cases += [
+                    (f'channel.{simType}.orekit[{n}]', n, orekitSkipped or channel(simType, 'orekit')),
+                    (f'channel.{simType}.orekit.bulk[{n}]', n,
+                     orekitSkipped or channel(simType, 'orekit', bulk=True)),
+                ]
+    return cases
+
+
+def measure(run, repeat=3):
+    """ Best time [s] over repeat runs, and peak memory [bytes] of one run """
+    run()  # warm-up (lazy initializations, caches)
+    seconds = min(_timed(run) for _ in range(repeat))
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return (seconds, peak)
+
+
+def _timed(run):
+    t0 = time.perf_counter()
+    run()
+    return time.perf_counter() - t0
+
+
+def runBenchmarks(cases, repeat=3, pattern=None):
+    """ Run the cases (optionally only those whose name contains pattern)
+
+    Returns
+    -------
+    dict
+        Mapping from the case names to {'samples', 'seconds',
+        'samplesPerSecond', 'peakBytes'}, or {'samples', 'skipped'} (the
+        reason) for the skipped cases.
+    """
+    results = {}
+    for name, samples, prepare in cases:
+        if pattern is not None and pattern not in name:
+            continue
+        if isinstance(prepare, str):
+            results[name] = {'samples': samples, 'skipped': prepare}
+            print(f"{name:40s} SKIPPED", flush=True)
+            continue
+        seconds, peak = measure(prepare(), repeat)
+        results[name] = {'samples': samples, 'seconds': seconds,
+                         'samplesPerSecond': samples / seconds, 'peakBytes': peak}
+        print(f"{name:40s} {samples / seconds:14.4g} samples/s {peak / 2 ** 20:10.2f} MiB", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """ Regressions of results w.r.t. baseline
+
+    Returns
+    -------
+    list of str
+        Description of the cases slower (lower throughput) or using more
+        memory than the baseline by more than the threshold (fraction).
+        Cases skipped in the results or in the baseline are not compared.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or 'skipped' in result or 'skipped' in baseline[name]:
+            continue
+        reference = baseline[name]
+        speed = result['samplesPerSecond'] / reference['samplesPerSecond']
+        if speed < 1 - threshold:
+            regressions.append(f"{name}: throughput {speed:.0%} of the baseline")
+        memory = result['peakBytes'] / max(reference['peakBytes'], 1)
+        if memory > 1 + threshold:
+            regressions.append(f"{name}: peak memory {memory:.0%} of the baseline")
+    return regressions
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Benchmark the propagation, channel and link-budget paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10 ** 3, 10 ** 4, 10 ** 5],
+                        help="numbers of samples")
+    parser.add_argument("--max-orekit-size", type=int, default=10 ** 4,
+                        help="largest number of samples of the Orekit cases")
+    parser.add_argument("--no-orekit", action="store_true", help="skip the Orekit cases")
+    parser.add_argument("--orekit-data", default=DEFAULT_OREKIT_DATA,
+                        help="Orekit data (default: $OREKIT_DATA or orekit-data.zip next to this script)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best kept)")
+    parser.add_argument("--only", default=None, help="only run the cases whose name contains this string")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare the results with the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="regression threshold (fraction)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArguments()
+    if args.compare and not args.save_baseline and not os.path.isfile(args.baseline):
+        print(f"No baseline at '{args.baseline}': run 'python benchmark.py --save-baseline' on a reference "
+              "commit first (or give --baseline).", file=sys.stderr)
+        sys.exit(2)
+    orekitSkipped = "--no-orekit" if args.no_orekit else orekitUnavailable(args.orekit_data)
+    if orekitSkipped:
+        print(f"Orekit cases SKIPPED: {orekitSkipped}")
+    results = runBenchmarks(benchmarkCases(args.sizes, args.max_orekit_size, orekitSkipped), args.repeat, args.only)
+    skipped = [name for name, result in results.items() if 'skipped' in result]
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Baseline saved to '{args.baseline}'"
+              + (f", with {len(skipped)} skipped cases." if skipped else "."))
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        notCompared = [name for name in results if name in skipped or 'skipped' in baseline.get(name, {})]
+        if notCompared:
+            print(f"Not compared (skipped here or in the baseline): {', '.join(notCompared)}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression beyond {args.threshold:.0%}.")
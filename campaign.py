@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-process coverage campaigns.
+
+A campaign computes coverage statistics (passes per night, contact time,
+maximum-elevation histograms) of many satellites over many candidate ground
+stations on long horizons. The work is split into (satellite, station, time
+slice) units, run on a process pool:
+    * the units only carry picklable specifications (orbit parameters, station
+      coordinates, slice bounds); each worker rebuilds the Satellite and
+      GroundStation objects, once per worker;
+    * each worker initializes its own Orekit context once (pool initializer),
+      and only if a satellite uses the 'orekit' backend;
+    * the results are consumed in the order of the units, whatever the number
+      of workers, and merged on the fly into per-station statistics: the
+      output does not depend on the number of workers, and only one pass per
+      (satellite, station) is held while merging. Passes cut by the boundary
+      of two slices are joined.
+The coarse scan and the bisection brackets of the pass search start at the
+slice boundaries, so results of different slice lengths are not bit-identical:
+their AOS and LOS agree within the pass tolerance (1 ms).
+
+Night passes are defined by the local mean solar time of the culmination
+(18h to 6h, from the longitude of the station), not by the elevation of the
+Sun: at high latitudes in summer, some of them are in daylight.
+"""
+import multiprocessing
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+import orekitcontext
+import propagation
+
+from model import Satellite, GroundStation
+from passes import findPasses
+from timegrid import toDatetime64
+
+
+class StationStatistics:
+    """ Coverage statistics of a ground station
+
+    Parameters
+    ----------
+    station: GroundStation
+        Ground station.
+    elevationBins: np.array
+        Edges of the bins of the maximum-elevation histogram [degrees].
+
+    Attributes
+    ----------
+    passes: int
+        Number of passes.
+    contactTime: float
+        Total duration of the passes [s].
+    maxElevationHistogram: np.array
+        Number of passes per bin of maximum elevation.
+    nightPasses: Counter
+        Number of night passes (culmination between 18h and 6h local mean solar
+        time, regardless of the elevation of the Sun) per night, keyed by the
+        date of the evening.
+    passesPerSatellite: Counter
+        Number of passes per satellite index.
+    """
+
+    def __init__(self, station, elevationBins):
+        self.station = station
+        self.elevationBins = np.asarray(elevationBins, dtype=float)
+        self.passes = 0
+        self.contactTime = 0.
+        self.maxElevationHistogram = np.zeros(len(self.elevationBins) - 1, dtype=int)
+        self.nightPasses = Counter()
+        self.passesPerSatellite = Counter()
+
+    def __repr__(self):
+        return (f"StationStatistics({self.station.name}: {self.passes} passes, "
+                f"{self.contactTime / 60:.1f} contact minutes)")
+
+    def update(self, satelliteIndex, aos, los, culmination, maxElevation):
+        """ Add a pass (times as int64 nanoseconds) """
+        self.passes += 1
+        self.contactTime += (los - aos) / 1e9
+        self.passesPerSatellite[satelliteIndex] += 1
+
+        k = np.searchsorted(self.elevationBins, maxElevation, side='right') - 1
+        if 0 <= k < len(self.maxElevationHistogram):
+            self.maxElevationHistogram[k] += 1
+
+        # local mean solar time of the culmination
+        localTime = pd.Timestamp(culmination) + pd.Timedelta(hours=np.rad2deg(self.station.longitude) / 15)
+        if localTime.hour >= 18 or localTime.hour < 6:
+            self.nightPasses[(localTime - pd.Timedelta(hours=12)).date()] += 1
+
+    @property
+    def contactMinutes(self):
+        return self.contactTime / 60
+
+    def passesPerNight(self):
+        """ Number of night passes per night, as a pd.Series indexed by the
+        date of the evening """
+        nights = sorted(self.nightPasses)
+        return pd.Series([self.nightPasses[n] for n in nights], index=pd.DatetimeIndex(nights, name='night'))
+
+
+def satelliteSpec(satellite):
+    """ Picklable specification of a 'tle' or 'keplerian' satellite """
+    params = satellite.tleList if satellite.isTLE() else satellite.keplerList
+    return (tuple(params), satellite.simType, satellite.backend, satellite.dut1)
+
+
+def stationSpec(station):
+    """ Picklable specification of a ground station """
+    return (np.rad2deg(station.latitude), np.rad2deg(station.longitude), station.altitude, station.name)
+
+
+# objects rebuilt by the worker, reused by all its units
+_workerObjects = {}
+
+
+def _initWorker(dataPath, needsOrekit):
+    if needsOrekit:
+        orekitcontext.initWorker(dataPath)
+
+
+def _build(cls, spec):
+    if cls is Satellite:
+        # dut1 sources are rebuilt by pickling: identify them by their key
+        key = (cls.__name__, spec[:3], propagation.dut1Key(spec[3]))
+    else:
+        key = (cls.__name__, spec)
+    if key not in _workerObjects:
+        if cls is Satellite:
+            params, simType, backend, dut1 = spec
+            _workerObjects[key] = Satellite(params, simType=simType, backend=backend, dut1=dut1)
+        else:
+            _workerObjects[key] = GroundStation(*spec)
+    return _workerObjects[key]
+
+
+def _runUnit(unit):
+    """ Passes of one (satellite, station, time slice) unit, as an array of
+    rows (aos, los, culmination) [ns] and the maximum elevations """
+    from model import SimpleDownlinkChannel
+
+    satSpec, gsSpec, begin, end, coarseStep, minElevation = unit
+    channel = SimpleDownlinkChannel(_build(Satellite, satSpec), _build(GroundStation, gsSpec))
+    passes = findPasses(channel, pd.Timestamp(begin), pd.Timestamp(end), coarseStep, minElevation)
+
+    times = np.array([(p.aos.value, p.los.value, p.culmination.value) for p in passes],
+                     dtype=np.int64).reshape(-1, 3)
+    return (times, np.array([p.maxElevation for p in passes]))
+
+
+class Campaign:
+    """ Coverage campaign of satellites over ground stations
+
+    Parameters
+    ----------
+    satellites: list of Satellite
+        Satellites with 'tle' or 'keplerian' orbits. Their parameters must be
+        picklable (e.g. Keplerian parameters with the anomaly type as a string
+        and the epoch as a datetime).
+    stations: list of GroundStation
+        Candidate ground stations.
+    start, stop: tuple or datetime
+        Horizon of the campaign.
+    sliceLength: float
+        Length of the time slices [s].
+    coarseStep: float
+        Step of the coarse pass search [s] (see passes.findPasses).
+    minElevation: float
+        Minimum elevation of a pass [degrees].
+    elevationBins: np.array
+        Edges of the maximum-elevation histograms [degrees].
+    """
+
+    def __init__(self, satellites, stations, start, stop, sliceLength=7 * 86400., coarseStep=60.,
+                 minElevation=0., elevationBins=np.arange(0, 91, 5)):
+        self.satellites = list(satellites)
+        self.stations = list(stations)
+        self.start, self.stop = (int(toDatetime64(t).astype(np.int64)) for t in (start, stop))
+        self.sliceLength = sliceLength
+        self.coarseStep = coarseStep
+        self.minElevation = minElevation
+        self.elevationBins = elevationBins
+
+    def slices(self):
+        """ Bounds of the time slices [ns] """
+        bounds = np.arange(self.start, self.stop, int(self.sliceLength * 1e9), dtype=np.int64)
+        bounds = np.append(bounds, np.int64(self.stop))
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def units(self):
+        """ Work units, ordered by satellite, station and time slice """
+        satSpecs = [satelliteSpec(sat) for sat in self.satellites]
+        gsSpecs = [stationSpec(gs) for gs in self.stations]
+        for satSpec in satSpecs:
+            for gsSpec in gsSpecs:
+                for begin, end in self.slices():
+                    yield (satSpec, gsSpec, begin, end, self.coarseStep, self.minElevation)
+
+    def run(self, processes=None, dataPath=None, chunksize=1):
+        """ Run the campaign
+
+        Parameters
+        ----------
+        processes: int, optional
+            Number of worker processes (default: number of cores; 1 runs in
+            the calling process).
+        dataPath: str, optional
+            Orekit data path of the workers (see orekitcontext).
+        chunksize: int
+            Number of units sent to a worker at once.
+
+        Returns
+        -------
+        list of StationStatistics
+            Statistics of each station, in the order of the stations.
+        """
+        statistics = [StationStatistics(gs, self.elevationBins) for gs in self.stations]
+        needsOrekit = any(not sat.isNumpyBackend() for sat in self.satellites)
+
+        if processes == 1:
+            if needsOrekit and dataPath is not None:
+                orekitcontext.configure(dataPath)
+            self._merge(map(_runUnit, self.units()), statistics)
+        else:
+            # the JVM does not survive a fork
+            method = 'spawn' if orekitcontext.isInitialized() else None
+            with multiprocessing.get_context(method).Pool(processes, _initWorker, (dataPath, needsOrekit)) as pool:
+                self._merge(pool.imap(_runUnit, self.units(), chunksize), statistics)
+
+        return statistics
+
+    def _merge(self, results, statistics):
+        """ Merge the unit results, in the order of the units """
+        slices = self.slices()
+        nSlices = len(slices)
+        pending = None
+        for n, (times, maxElevation) in enumerate(results):
+            satIndex, rest = divmod(n, len(self.stations) * nSlices)
+            gsIndex, sliceIndex = divmod(rest, nSlices)
+            stats = statistics[gsIndex]
+
+            for (aos, los, culmination), elevation in zip(times, maxElevation):
+                if pending is not None and aos == pending[1]:
+                    # continuation of the pass cut at the slice boundary
+                    if elevation > pending[3]:
+                        pending = (pending[0], los, culmination, elevation)
+                    else:
+                        pending = (pending[0], los, pending[2], pending[3])
+                    continue
+                if pending is not None:
+                    stats.update(satIndex, *pending)
+                pending = (aos, los, culmination, elevation)
+
+            # a pass can only continue in the next slice of the same link
+            if pending is not None and (sliceIndex == nSlices - 1 or pending[1] != slices[sliceIndex][1]):
+                stats.update(satIndex, *pending)
+                pending = None
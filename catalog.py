@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TLE catalogs.
+
+A TLECatalog holds many element sets (several objects, many historical epochs
+per object) in a compact columnar store: the catalog numbers, the epochs
+(int64 nanoseconds, UTC) and the two lines as fixed-width byte strings,
+sorted by catalog number and epoch. It is built by bulk-parsing TLE files (two
+lines per element set, with or without a name line, as distributed by
+Space-Track or CelesTrak), and saved to / loaded from a directory of .npy
+files, memory-mapped when read, so that large historical archives are not
+loaded in memory.
+
+Lookups are vectorized: the element sets with the epoch nearest to a time are
+found for many objects at once (by bisection inside the epochs of each
+object), and Satellite objects (or a propagation.TLEElements stack for the
+numpy backend) are built in batch, chunk by chunk along a time grid.
+"""
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import propagation
+
+from model import Satellite, timeChunks
+
+
+LINE_LENGTH = 69
+
+# Alpha-5 catalog numbers: a letter (I and O excluded) replaces the first digit
+_ALPHA5 = {letter: 10 + k for k, letter in enumerate('ABCDEFGHJKLMNPQRSTUVWXYZ')}
+
+
+class catalogError(Exception):
+    pass
+
+
+def parseCatalogNumber(field):
+    """ Catalog number of a 5-character TLE field, with Alpha-5 support """
+    field = field.strip()
+    if field and field[0] in _ALPHA5:
+        return _ALPHA5[field[0]] * 10000 + int(field[1:])
+    return int(field)
+
+
+def parseCatalogNumbers(fields):
+    """ Catalog numbers of an array of 5-character TLE fields ('S5'); the
+    numeric fields are converted at once, only the Alpha-5 ones one by one """
+    numbers = np.zeros(len(fields), dtype=np.int32)
+    numeric = np.char.isdigit(np.char.strip(fields))
+    numbers[numeric] = fields[numeric].astype(np.int32)
+    numbers[~numeric] = [parseCatalogNumber(field.decode()) for field in fields[~numeric]]
+    return numbers
+
+
+def _column(lines, start, stop):
+    """ Columns start:stop of an 'S69' array, as an array of byte strings """
+    chars = lines.view('S1').reshape(len(lines), LINE_LENGTH)
+    return np.ascontiguousarray(chars[:, start:stop]).view(f'S{stop - start}').ravel()
+
+
+def parseEpochs(line1):
+    """ Epochs [int64 ns, UTC] of an array of TLE first lines ('S69') """
+    year = _column(line1, 18, 20).astype(int)
+    year += np.where(year >= 57, 1900, 2000)
+    dayOfYear = _column(line1, 20, 32).astype(float)
+
+    newYear = (year - 1970).astype('datetime64[Y]').astype('datetime64[ns]').astype(np.int64)
+    return newYear + np.round((dayOfYear - 1) * 86400e9).astype(np.int64)
+
+
+class TLECatalog:
+    """ Columnar TLE store indexed by catalog number and epoch
+
+    Parameters
+    ----------
+    catalogNumber: np.array
+        Catalog numbers (int32).
+    epoch: np.array
+        Epochs [int64 ns, UTC].
+    line1, line2: np.array
+        Lines of the element sets ('S69').
+    maxSatellites: int
+        Number of Satellite objects kept for reuse by satellites (least
+        recently used first out); a call always keeps its own satellites.
+
+    The arrays are sorted by (catalogNumber, epoch) when needed.
+    """
+
+    def __init__(self, catalogNumber, epoch, line1, line2, maxSatellites=1024):
+        order = np.lexsort((epoch, catalogNumber))
+        if np.any(order != np.arange(len(order))):
+            catalogNumber, epoch, line1, line2 = (np.asarray(a)[order] for a in (catalogNumber, epoch, line1, line2))
+
+        self.catalogNumber = catalogNumber
+        self.epoch = epoch
+        self.line1 = line1
+        self.line2 = line2
+
+        # index: element sets of numbers[k] are start[k]:start[k + 1]
+        self.numbers, self.start = np.unique(np.asarray(catalogNumber), return_index=True)
+        self.start = np.append(self.start, len(catalogNumber))
+        self.maxSatellites = maxSatellites
+        self._satellites = OrderedDict()
+
+    def __len__(self):
+        return len(self.epoch)
+
+    def __repr__(self):
+        return f"TLECatalog({len(self.numbers)} objects, {len(self)} element sets)"
+
+    # import / export
+    @classmethod
+    def fromFiles(cls, paths):
+        """ Parse TLE files (2 or 3 lines per element set)
+
+        Lines that are not part of a valid pair (a line 1 followed by the line
+        2 of the same object) are ignored, as are duplicated element sets.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+
+        lines1, lines2 = [], []
+        for path in paths:
+            with open(path, 'rb') as f:
+                previous = b''
+                for line in f:
+                    line = line.rstrip()
+                    if (line[:2] == b'2 ' and previous[:2] == b'1 ' and len(line) >= LINE_LENGTH
+                            and len(previous) >= LINE_LENGTH and line[2:7] == previous[2:7]):
+                        lines1.append(previous[:LINE_LENGTH])
+                        lines2.append(line[:LINE_LENGTH])
+                    previous = line
+
+        return cls.fromLines(lines1, lines2)
+
+    @classmethod
+    def fromLines(cls, lines1, lines2):
+        """ Catalog of lists of first and second lines """
+        line1 = np.array(lines1, dtype=f'S{LINE_LENGTH}')
+        line2 = np.array(lines2, dtype=f'S{LINE_LENGTH}')
+        if len(line1) == 0:
+            raise catalogError("no element set found")
+
+        catalogNumber = parseCatalogNumbers(_column(line1, 2, 7))
+        epoch = parseEpochs(line1)
+
+        # remove the duplicated element sets (same object and epoch)
+        _, unique = np.unique(np.stack((catalogNumber.astype(np.int64), epoch)), axis=1, return_index=True)
+        unique = np.sort(unique)
+        return cls(catalogNumber[unique], epoch[unique], line1[unique], line2[unique])
+
+    def save(self, directory):
+        """ Save the catalog as .npy files in directory """
+        os.makedirs(directory, exist_ok=True)
+        for name in ('catalogNumber', 'epoch', 'line1', 'line2'):
+            np.save(os.path.join(directory, name + '.npy'), np.asarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """ Load a catalog saved with save, memory-mapped by default """
+        mode = 'r' if mmap else None
+        return cls(*(np.load(os.path.join(directory, name + '.npy'), mmap_mode=mode)
+                     for name in ('catalogNumber', 'epoch', 'line1', 'line2')))
+
+    # lookups
+    def _objectIndex(self, catalogNumbers):
+        numbers = np.atleast_1d(np.asarray(catalogNumbers))
+        k = np.clip(np.searchsorted(self.numbers, numbers), 0, len(self.numbers) - 1)
+        missing = self.numbers[k] != numbers
+        if missing.any():
+            raise catalogError(f"objects not in the catalog: {numbers[missing].tolist()}")
+        return k
+
+    def epochs(self, catalogNumber):
+        """ Epochs of the element sets of an object, as a pd.DatetimeIndex """
+        k = self._objectIndex(catalogNumber)[0]
+        return pd.to_datetime(np.asarray(self.epoch[self.start[k]:self.start[k + 1]]))
+
+    def nearest(self, catalogNumbers, time):
+        """ Indices of the element sets with the epoch nearest to time
+
+        Parameters
+        ----------
+        catalogNumbers: array_like
+            Catalog numbers of the objects.
+        time: datetime or array_like
+            Time, or one time per object.
+
+        Returns
+        -------
+        np.array
+            Indices of the element sets in the catalog.
+        """
+        k = self._objectIndex(catalogNumbers)
+        t = np.broadcast_to(propagation.asDatetime64(time).astype(np.int64), k.shape)
+        epoch = self.epoch
+
+        # vectorized bisection of the first epoch >= t in each object
+        lo = self.start[k].copy()
+        hi = self.start[k + 1].copy()
+        while np.any(lo < hi):
+            active = lo < hi
+            mid = (lo + hi) // 2
+            below = active & (np.asarray(epoch[np.minimum(mid, len(epoch) - 1)]) < t)
+            lo = np.where(below, mid + 1, lo)
+            hi = np.where(active & ~below, mid, hi)
+
+        # nearest of the epochs around t
+        after = np.minimum(lo, self.start[k + 1] - 1)
+        before = np.maximum(lo - 1, self.start[k])
+        useBefore = np.abs(t - np.asarray(epoch[before])) <= np.abs(np.asarray(epoch[after]) - t)
+        return np.where(useBefore, before, after)
+
+    def elementSets(self, catalogNumbers, time):
+        """ (line1, line2) of the element sets nearest to time """
+        index = self.nearest(catalogNumbers, time)
+        return [(self.line1[i].decode(), self.line2[i].decode()) for i in index]
+
+    def elements(self, catalogNumbers, time):
+        """ propagation.TLEElements stack of the element sets nearest to time,
+        for the vectorized numpy propagation """
+        return propagation.TLEElements(self.elementSets(catalogNumbers, time))
+
+    def satellites(self, catalogNumbers, time, backend='orekit', dut1=0.):
+        """ Satellite objects of the element sets nearest to time
+
+        The Satellite objects are built once per element set and reused by the
+        following calls, within the maxSatellites most recently used (so that
+        consecutive chunks of satelliteChunks share the satellites whose
+        element set did not change, without keeping every satellite of a long
+        horizon). dut1 is passed to the satellites (see model.Satellite).
+        """
+        satellites = []
+        for i in self.nearest(catalogNumbers, time):
+            key = (int(i), backend, propagation.dut1Key(dut1))
+            if key in self._satellites:
+                self._satellites.move_to_end(key)
+            else:
+                tle = (self.line1[i].decode(), self.line2[i].decode())
+                self._satellites[key] = Satellite(tle, simType='tle', backend=backend, dut1=dut1)
+            satellites.append(self._satellites[key])
+
+        while len(self._satellites) > max(self.maxSatellites, len(satellites)):
+            self._satellites.popitem(last=False)
+        return satellites
+
+    def satelliteChunks(self, catalogNumbers, start, stop, step=1., chunkSize=10000, backend='orekit', dut1=0.):
+        """ Satellites along a time grid, with the element sets nearest to the
+        middle of each chunk
+
+        Parameters
+        ----------
+        catalogNumbers: array_like
+            Catalog numbers of the objects.
+        start, stop, step, chunkSize:
+            Time grid (see model.timeChunks).
+        backend: str
+            Propagation backend of the satellites.
+        dut1: float or callable
+            UT1 - UTC of the satellites (see model.Satellite).
+
+        Yields
+        ------
+        tuple (TimeGrid, list of Satellite)
+        """
+        for times in timeChunks(start, stop, step, chunkSize):
+            yield (times, self.satellites(catalogNumbers, times[len(times) // 2], backend, dut1))
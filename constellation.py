@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-link channels: N satellites x M ground stations.
+
+SimpleDownlinkChannel binds one satellite to one ground station, so computing
+several links propagates the same satellite once per station. MultiLinkChannel
+propagates each satellite once per epoch, to Earth-fixed (ITRF) positions, and
+reuses these positions for every station: the topocentric range and elevation
+of all the stations are then computed with NumPy. The cost of the propagation
+scales with the number of satellites, not with the number of links.
+
+Satellites using the 'numpy' backend are stacked and propagated together in a
+single vectorized call.
+"""
+import numpy as np
+
+import propagation
+
+from model import orbitModelError, absoluteDateList
+
+
+class MultiLinkChannel:
+    """ Downlink channels between several satellites and ground stations
+
+    Parameters
+    ----------
+    satellites: list of Satellite
+        Satellites, with 'tle' or 'keplerian' orbits (any backend).
+    groundStations: list of GroundStation
+        Ground stations.
+    cache: EphemerisCache, optional
+        Persistent cache of the satellite positions (see ephemcache.py).
+    """
+
+    def __init__(self, satellites, groundStations, cache=None):
+        for sat in satellites:
+            if not (sat.isTLE() or sat.isKeplerian()):
+                raise orbitModelError("MultiLinkChannel requires 'tle' or 'keplerian' satellites")
+
+        self.satellites = list(satellites)
+        self.groundStations = list(groundStations)
+        self.cache = cache
+
+    def satellitePositions(self, timeList):
+        """ ITRF positions of all the satellites
+
+        Parameters
+        ----------
+        timeList : list
+            List of times at which to calculate the positions.
+
+        Returns
+        -------
+        np.array
+            Positions [m], of shape (n_sat, n_time, 3).
+        """
+        if self.cache is not None:
+            return np.stack([self.cache.positions(sat, timeList) for sat in self.satellites])
+
+        positions = np.zeros((len(self.satellites), len(timeList), 3))
+
+        # numpy backend: one vectorized propagation per orbit type and dut1
+        for simType, elementsClass, paramsName in (('tle', propagation.TLEElements, 'tleList'),
+                                                   ('keplerian', propagation.KeplerianElements, 'keplerList')):
+            groups = {}
+            for k, sat in enumerate(self.satellites):
+                if sat.isNumpyBackend() and sat.simType == simType:
+                    groups.setdefault(id(sat.dut1) if callable(sat.dut1) else sat.dut1, []).append(k)
+            for index in groups.values():
+                elements = elementsClass([getattr(self.satellites[k], paramsName) for k in index])
+                positions[index] = elements.itrfPositions(timeList, self.satellites[index[0]].dut1)
+
+        # orekit backend: the date conversion is shared by all the satellites
+        index = [k for k, sat in enumerate(self.satellites) if not sat.isNumpyBackend()]
+        if index:
+            absDateList = absoluteDateList(timeList)
+            for k in index:
+                positions[k] = self.satellites[k].itrfPositions(timeList, absDateList)
+
+        return positions
+
+    def calculateChannelParameters(self, timeList):
+        """ Calculate the parameters of all the channels
+
+        Parameters
+        ----------
+        timeList : list
+            List of times at which to calculate the channel parameters.
+
+        Returns
+        -------
+        tuple (np.array, np.array, list)
+            - length [m], of shape (n_sat, n_station, n_time)
+            - elevation [degrees], of shape (n_sat, n_station, n_time)
+            - timeList
+        """
+        positions = self.satellitePositions(timeList)
+
+        shape = (len(self.satellites), len(self.groundStations), len(timeList))
+        channelLength = np.zeros(shape)
+        elevation = np.zeros(shape)
+
+        for j, gs in enumerate(self.groundStations):
+            channelLength[:, j], elevation[:, j] = propagation.rangeElevation(
+                positions, gs.itrfPosition, gs.topocentricRotation)
+
+        return (channelLength, elevation, timeList)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ground-site coverage maps.
+
+Instead of one GroundStation (and one Orekit TopocentricFrame) per candidate
+site, the satellites are propagated once to Earth-fixed (ITRF) positions (see
+constellation.MultiLinkChannel.satellitePositions), and the elevation of every
+site of a latitude/longitude grid is computed with NumPy from the local
+vertical of the site. The time grid and the sites are processed in chunks, so
+that the memory stays bounded whatever the size of the grid and the length of
+the horizon.
+
+For each site, the map holds the maximum elevation, the contact time (time
+with at least one satellite above the minimum elevation) and optionally a
+throughput: the time integral of the atmospheric transmittance, or, given the
+link parameters, the number of photons received (repRate times the integral
+of end_to_end).
+"""
+import numpy as np
+
+import propagation
+
+from constellation import MultiLinkChannel
+from model import end_to_end
+from sweep import trapezoidWeights
+
+
+class CoverageMap:
+    """ Coverage statistics on a latitude/longitude grid
+
+    Parameters
+    ----------
+    latitudes, longitudes: np.array
+        Axes of the grid [degrees].
+    altitude: float or np.array
+        Altitude of the sites [m], scalar or of shape (n_lat, n_lon).
+    maxElevation: np.array
+        Maximum elevation [degrees], of shape (n_lat, n_lon).
+    contactTime: np.array
+        Contact time [s], of shape (n_lat, n_lon).
+    throughput: np.array, optional
+        Throughput, of shape (n_lat, n_lon) (see coverageMap).
+    duration: float
+        Duration of the time grid [s].
+    """
+
+    quantities = ('maxElevation', 'contactTime', 'throughput', 'visibleFraction')
+
+    def __init__(self, latitudes, longitudes, altitude, maxElevation, contactTime, throughput, duration):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.altitude = altitude
+        self.maxElevation = maxElevation
+        self.contactTime = contactTime
+        self.throughput = throughput
+        self.duration = duration
+
+    def __repr__(self):
+        return f"CoverageMap({len(self.latitudes)} x {len(self.longitudes)} sites, {self.duration:.0f} s)"
+
+    @property
+    def visibleFraction(self):
+        """ Fraction of the time with a satellite in view """
+        return self.contactTime / self.duration if self.duration else np.zeros_like(self.contactTime)
+
+    def best(self, quantity='contactTime', n=10):
+        """ The n best sites for a quantity, as a list of (latitude,
+        longitude, value) """
+        values = getattr(self, quantity)
+        order = np.argsort(values, axis=None)[::-1][:n]
+        i, j = np.unravel_index(order, values.shape)
+        return [(self.latitudes[a], self.longitudes[b], values[a, b]) for a, b in zip(i, j)]
+
+    def save(self, path):
+        """ Save the map as a .npz file """
+        arrays = dict(latitudes=self.latitudes, longitudes=self.longitudes, altitude=self.altitude,
+                      maxElevation=self.maxElevation, contactTime=self.contactTime, duration=self.duration)
+        if self.throughput is not None:
+            arrays['throughput'] = self.throughput
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['latitudes'], data['longitudes'], data['altitude'], data['maxElevation'],
+                       data['contactTime'], data['throughput'] if 'throughput' in data else None,
+                       float(data['duration']))
+
+    def plot(self, quantity='contactTime', ax=None, **kwargs):
+        """ Plot a quantity of the map with matplotlib (pcolormesh) """
+        import matplotlib.pyplot as plt
+
+        if ax is None:
+            _, ax = plt.subplots()
+        mesh = ax.pcolormesh(self.longitudes, self.latitudes, getattr(self, quantity), shading='nearest', **kwargs)
+        ax.set_xlabel("Longitude (degrees)")
+        ax.set_ylabel("Latitude (degrees)")
+        ax.figure.colorbar(mesh, ax=ax, label=quantity)
+        return mesh
+
+
+def coverageMap(satellites, timeList, latitudes, longitudes, altitude=0., minElevation=0., transmittance=None,
+                DT=None, DR=None, wl=None, r0=None, repRate=1., cache=None, chunkBytes=2 ** 26):
+    """ Coverage map of satellites over a grid of candidate sites
+
+    Parameters
+    ----------
+    satellites: list of Satellite
+        Satellites with 'tle' or 'keplerian' orbits (any backend).
+    timeList: list
+        Time grid (list of times or TimeGrid).
+    latitudes, longitudes: np.array
+        Axes of the grid of sites [degrees].
+    altitude: float or np.array
+        Altitude of the sites [m], scalar or of shape (n_lat, n_lon).
+    minElevation: float
+        Minimum elevation of a contact [degrees].
+    transmittance: callable, optional
+        Atmospheric transmittance as a function of the elevation [degrees]
+        (e.g. a TransmittanceTable).
+    DT, DR, wl, r0: float, optional
+        Link parameters (see model.end_to_end). If given, the throughput is
+        the number of photons received, repRate * integral of end_to_end
+        (with the atmospheric transmittance if given); otherwise, it is the
+        integral of the atmospheric transmittance [s].
+    repRate: float
+        Photon rate of the source [1/s].
+    cache: EphemerisCache, optional
+        Persistent cache of the satellite positions.
+    chunkBytes: int
+        Approximate size of the arrays of one chunk [bytes].
+
+    Returns
+    -------
+    CoverageMap
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    shape = (len(latitudes), len(longitudes))
+    withLink = DT is not None
+    withThroughput = transmittance is not None or withLink
+
+    # sites: position and local vertical (zenith row of the topocentric matrix)
+    lat, lon = (np.radians(x).ravel() for x in np.meshgrid(latitudes, longitudes, indexing='ij'))
+    alt = np.broadcast_to(altitude, shape).ravel()
+    sitePosition = propagation.geodeticToItrf(lat, lon, alt)
+    zenith = propagation.topocentricMatrix(lat, lon)[:, 2]
+    nSites = len(lat)
+
+    # trapezoidal weights [s] of the samples
+    weights = trapezoidWeights(timeList, np.zeros(len(timeList), dtype=int))
+    times = propagation.asDatetime64(timeList)
+    duration = float((times[-1] - times[0]) / np.timedelta64(1, 's')) if len(times) else 0.
+
+    maxElevation = np.full(nSites, -90.)
+    contactTime = np.zeros(nSites)
+    throughput = np.zeros(nSites) if withThroughput else None
+
+    channel = MultiLinkChannel(satellites, [], cache)
+    nSat = len(channel.satellites)
+    # ~8 float arrays of (sites, satellites, times) per chunk
+    timeChunk = max(1, min(len(times), chunkBytes // (64 * nSat)))
+
+    for t0 in range(0, len(times), timeChunk):
+        t1 = min(t0 + timeChunk, len(times))
+        positions = channel.satellitePositions(timeList[t0:t1])
+        w = weights[t0:t1]
+        siteChunk = max(1, chunkBytes // (64 * nSat * (t1 - t0)))
+
+        for s0 in range(0, nSites, siteChunk):
+            s1 = min(s0 + siteChunk, nSites)
+            # line of sight (sites, satellites, times, 3)
+            los = positions[None] - sitePosition[s0:s1, None, None]
+            distance = np.sqrt((los ** 2).sum(-1))
+            elevation = np.rad2deg(np.arcsin(np.einsum('sntk,sk->snt', los, zenith[s0:s1]) / distance))
+
+            maxElevation[s0:s1] = np.maximum(maxElevation[s0:s1], elevation.max(axis=(1, 2)))
+            visible = elevation >= minElevation
+            contactTime[s0:s1] += (visible.any(1) * w).sum(-1)
+
+            if withThroughput:
+                value = np.zeros(elevation.shape)
+                atmosphere = transmittance(elevation[visible]) if transmittance is not None else 1.
+                if withLink:
+                    value[visible] = repRate * end_to_end(DT, DR, wl, atmosphere, distance[visible], r0)
+                else:
+                    value[visible] = atmosphere
+                throughput[s0:s1] += (value.sum(1) * w).sum(-1)
+
+    return CoverageMap(latitudes, longitudes, altitude, maxElevation.reshape(shape), contactTime.reshape(shape),
+                       throughput.reshape(shape) if withThroughput else None, duration)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dual-downlink entanglement distribution.
+
+A source of entangled photon pairs on a satellite sends one photon to each of
+two ground stations (or, with two satellites, each satellite serves one
+station). Pairs are distributed during the coincident-pass windows, where both
+links are above their minimum elevation (and transmittance). With end-to-end
+transmittances T_A(t) and T_B(t), the pair rates are
+    - without quantum memory: repRate * T_A * T_B
+    - with quantum memory (the photon of the best link is stored until its
+      partner arrives): repRate * min(T_A, T_B)
+
+The rates are integrated with the trapezoidal rule on the actual sampling
+times (non-uniform grids, e.g. windows whose ends are not on the step, are
+handled exactly). The windows are sampled and integrated chunk by chunk, and
+only the totals per pass and per (UTC) day are kept, so that campaigns of any
+length run in constant memory.
+"""
+import numpy as np
+import pandas as pd
+
+from model import SimpleDownlinkChannel, end_to_end
+from passes import findPasses
+from timegrid import toDatetime64
+from transmittance import TransmittanceTable, siteTransmittance
+
+DAY = 86400 * 10 ** 9  # [ns]
+
+
+class CoincidentPass:
+    """ Window where both downlinks are available
+
+    Parameters
+    ----------
+    aos, los: pd.Timestamp
+        Start and end of the window.
+    passA, passB: Pass
+        Passes over the two ground stations overlapping in the window.
+    """
+
+    def __init__(self, aos, los, passA, passB):
+        self.aos = aos
+        self.los = los
+        self.passA = passA
+        self.passB = passB
+
+    @property
+    def duration(self):
+        """ Duration of the window [s] """
+        return (self.los - self.aos).total_seconds()
+
+    def __repr__(self):
+        return f"CoincidentPass(aos={self.aos}, los={self.los})"
+
+
+def coincidentPasses(passesA, passesB):
+    """ Intersections of two lists of passes sorted by AOS
+
+    Returns
+    -------
+    list of CoincidentPass
+        Windows sorted by AOS.
+    """
+    windows = []
+    j = 0
+    for passA in passesA:
+        # skip the passes of B ending before passA
+        while j < len(passesB) and passesB[j].los <= passA.aos:
+            j += 1
+        k = j
+        while k < len(passesB) and passesB[k].aos < passA.los:
+            passB = passesB[k]
+            aos = max(passA.aos, passB.aos)
+            los = min(passA.los, passB.los)
+            if los > aos:
+                windows.append(CoincidentPass(aos, los, passA, passB))
+            k += 1
+    return windows
+
+
+def _atmosphere(station, transmittance, wl):
+    """ Transmittance of a station at the wavelength wl [m] """
+    if transmittance is None:
+        return siteTransmittance(station.name, wl * 1e9)
+    if isinstance(transmittance, TransmittanceTable):
+        return transmittance.atWavelength(wl * 1e9)
+    return transmittance
+
+
+class DualDownlink:
+    """ Entanglement distribution to two ground stations
+
+    Parameters
+    ----------
+    satellite: Satellite
+        Satellite with a 'tle' or 'keplerian' orbit, carrying the source.
+    stationA, stationB: GroundStation
+        Ground stations receiving the photons.
+    DT, DR: float
+        Diameters of the transmitting and receiving telescopes [m].
+    wl: float
+        Wavelength [m].
+    r0: float
+        Fried parameter [m].
+    repRate: float
+        Pair emission rate of the source [1/s].
+    transmittanceA, transmittanceB: callable, optional
+        Atmospheric transmittance of each station as a function of the
+        elevation [degrees] (e.g. a TransmittanceTable). By default, the table
+        of the site with the name of the station (see siteTransmittance).
+        Tables are restricted to the wavelength wl, and raise a
+        transmittanceTableError if they have no data at wl.
+    minElevation: float
+        Minimum elevation of each link [degrees].
+    minTransmittance: float, optional
+        Minimum atmospheric transmittance of each link.
+    secondSatellite: Satellite, optional
+        If given, stationB is served by this satellite instead.
+    cache: EphemerisCache, optional
+        Persistent cache of the channel parameters.
+    """
+
+    def __init__(self, satellite, stationA, stationB, DT, DR, wl, r0, repRate, transmittanceA=None,
+                 transmittanceB=None, minElevation=0., minTransmittance=None, secondSatellite=None, cache=None):
+        self.channelA = SimpleDownlinkChannel(satellite, stationA, cache)
+        self.channelB = SimpleDownlinkChannel(secondSatellite or satellite, stationB, cache)
+        self.transmittanceA = _atmosphere(stationA, transmittanceA, wl)
+        self.transmittanceB = _atmosphere(stationB, transmittanceB, wl)
+
+        self.DT = DT
+        self.DR = DR
+        self.wl = wl
+        self.r0 = r0
+        self.repRate = repRate
+        self.minElevation = minElevation
+        self.minTransmittance = minTransmittance
+
+    def findWindows(self, start, stop, coarseStep=60.):
+        """ Coincident-pass windows between start and stop
+
+        Parameters
+        ----------
+        start, stop: tuple or datetime
+            Start and end of the search (see passes.findPasses).
+        coarseStep: float
+            Step of the coarse pass search [s].
+
+        Returns
+        -------
+        list of CoincidentPass
+        """
+        passes = [findPasses(channel, start, stop, coarseStep, self.minElevation, transmittance,
+                             self.minTransmittance)
+                  for channel, transmittance in ((self.channelA, self.transmittanceA),
+                                                 (self.channelB, self.transmittanceB))]
+        return coincidentPasses(*passes)
+
+    def pairRates(self, timeList):
+        """ Pair rates at the given times
+
+        Returns
+        -------
+        tuple (np.array, np.array)
+            - rate without quantum memory [pairs/s]
+            - rate with quantum memory [pairs/s]
+        """
+        transmittance = []
+        for channel, atmosphere in ((self.channelA, self.transmittanceA), (self.channelB, self.transmittanceB)):
+            channelLength, elevation, _ = channel.calculateChannelParameters(timeList, bulk=True)
+            transmittance.append(end_to_end(self.DT, self.DR, self.wl, atmosphere(elevation), channelLength, self.r0))
+
+        return (self.repRate * transmittance[0] * transmittance[1],
+                self.repRate * np.minimum(transmittance[0], transmittance[1]))
+
+    def windowTimes(self, window, step=1.):
+        """ Sampling times of a window [int64 ns]: every step from AOS, the LOS
+        and the UTC midnights inside the window """
+        aos, los = window.aos.value, window.los.value
+        times = np.arange(aos, los, int(step * 1e9), dtype=np.int64)
+        midnights = np.arange((aos // DAY + 1) * DAY, los, DAY, dtype=np.int64)
+        return np.unique(np.concatenate((times, midnights, [los])))
+
+    def integrateWindow(self, window, step=1., chunkSize=10000):
+        """ Pairs distributed in a window, per UTC day
+
+        The window is sampled and integrated chunk by chunk.
+
+        Returns
+        -------
+        dict
+            Mapping from the day (pd.Timestamp at midnight) to the number of
+            pairs (noMemory, memory) distributed that day.
+        """
+        times = self.windowTimes(window, step)
+        totals = {}
+        previous = None
+        for k in range(0, len(times), chunkSize):
+            chunk = times[k:k + chunkSize]
+            rates = np.stack(self.pairRates(pd.to_datetime(chunk)), axis=-1)
+            if previous is not None:
+                # segment joining the previous chunk
+                chunk = np.concatenate(([previous[0]], chunk))
+                rates = np.concatenate(([previous[1]], rates))
+            previous = (chunk[-1], rates[-1])
+
+            # trapezoids, attributed to the day of their start (midnights are
+            # on the grid, so no segment spans two days)
+            segments = (rates[1:] + rates[:-1]) / 2 * (np.diff(chunk) / 1e9)[:, None]
+            days = chunk[:-1] // DAY
+            for day in np.unique(days):
+                key = pd.Timestamp(int(day) * DAY)
+                totals[key] = totals.get(key, 0.) + segments[days == day].sum(0)
+
+        return totals
+
+    def accumulate(self, start, stop, step=1., coarseStep=60., searchSpan=7 * 86400., chunkSize=10000):
+        """ Pairs distributed between start and stop, per pass and per day
+
+        The windows are searched span by span (windows crossing the boundary
+        of two spans are joined) and integrated one after the other, so that
+        only the totals are kept in memory.
+
+        Parameters
+        ----------
+        start, stop: tuple or datetime
+            Start and end of the campaign.
+        step: float
+            Sampling step inside the windows [s].
+        coarseStep: float
+            Step of the coarse pass search [s].
+        searchSpan: float
+            Length of the time spans in which the windows are searched [s].
+        chunkSize: int
+            Maximum number of samples computed at once.
+
+        Returns
+        -------
+        tuple (pd.DataFrame, pd.DataFrame)
+            - per pass: aos, los, duration [s], pairsNoMemory, pairsMemory
+            - per UTC day (index): pairsNoMemory, pairsMemory
+        """
+        passRows = []
+        dailyTotals = {}
+        for window in self.iterWindows(start, stop, coarseStep, searchSpan):
+            totals = self.integrateWindow(window, step, chunkSize)
+            pairs = sum(totals.values())
+            passRows.append((window.aos, window.los, window.duration, pairs[0], pairs[1]))
+            for day, value in totals.items():
+                dailyTotals[day] = dailyTotals.get(day, 0.) + value
+
+        columns = ['pairsNoMemory', 'pairsMemory']
+        perPass = pd.DataFrame(passRows, columns=['aos', 'los', 'duration'] + columns)
+        perDay = pd.DataFrame([dailyTotals[day] for day in sorted(dailyTotals)],
+                              index=pd.DatetimeIndex(sorted(dailyTotals), name='day'), columns=columns)
+        return (perPass, perDay)
+
+    def iterWindows(self, start, stop, coarseStep=60., searchSpan=7 * 86400.):
+        """ Generate the coincident-pass windows span by span, joining the
+        windows split at the boundaries of the spans """
+        begin, end = (pd.Timestamp(toDatetime64(t)) for t in (start, stop))
+        span = pd.Timedelta(seconds=searchSpan)
+
+        pending = None
+        while begin < end:
+            spanEnd = min(begin + span, end)
+            for window in self.findWindows(begin, spanEnd, coarseStep):
+                if pending is not None and window.aos <= pending.los:
+                    pending = CoincidentPass(pending.aos, max(pending.los, window.los), pending.passA, window.passB)
+                    continue
+                if pending is not None:
+                    yield pending
+                pending = window
+            begin = spanEnd
+
+        if pending is not None:
+            yield pending
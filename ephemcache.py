@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent ephemeris cache.
+
+Propagated satellite positions (ITRF) and channel parameters (range and
+elevation per ground station) are stored on disk as .npy files, read back
+memory-mapped, so that the same ephemerides are not recomputed across
+sessions and batch jobs.
+
+Each entry is keyed by a hash of the orbit definition (TLE lines or Keplerian
+parameters), of the propagation backend (and dut1 for the 'numpy' backend)
+and, for the channel parameters, of the ground station coordinates and of the
+computation mode of the 'orekit' backend (bulk, frameTolerance), so that
+results of the interpolated-frame path are never returned for exact frames and
+conversely. Inside an entry the samples are indexed by their time stamps: when
+a requested time grid partially overlaps the cached one, only the missing
+times are computed, and the entry is extended with them. Time stamps are
+matched exactly (to the nanosecond), so overlapping grids must share their
+sampling (e.g. the same start and step).
+
+The total size of the cache is capped: the least recently used entries are
+evicted first. The access times of the cache hits are kept in memory and only
+written to the index with the next stored entry or by flush (or close, or at
+the end of a with block). The cache assumes a single writer at a time.
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import propagation
+
+
+class EphemerisCache:
+    """ Ephemeris cache
+
+    Parameters
+    ----------
+    directory: str
+        Directory of the cache, created if needed.
+    maxBytes: int
+        Maximum size of the cache on disk [bytes].
+    """
+
+    def __init__(self, directory, maxBytes=2 ** 30):
+        self.directory = directory
+        self.maxBytes = int(maxBytes)
+        os.makedirs(directory, exist_ok=True)
+
+        self._indexPath = os.path.join(directory, 'index.json')
+        if os.path.isfile(self._indexPath):
+            with open(self._indexPath) as f:
+                self._index = json.load(f)
+        else:
+            self._index = {}
+
+        self._dirty = False
+
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # keys
+    @staticmethod
+    def orbitKey(satellite):
+        """ Hash of the orbit definition and of the propagation backend """
+        if satellite.isTLE():
+            params = [line.strip() for line in satellite.tleList]
+        elif satellite.isKeplerian():
+            params = [str(p) for p in satellite.keplerList]
+        else:
+            raise ValueError("only 'tle' and 'keplerian' orbits can be cached")
+        text = '\n'.join([satellite.simType, satellite.backend] + params)
+        if satellite.isNumpyBackend():
+            text += '\n' + propagation.dut1Key(satellite.dut1)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    @classmethod
+    def channelKey(cls, channel, bulk=False, frameTolerance=None):
+        """ Hash of the orbit, of the backend, of the ground station and of the
+        computation mode (bulk, frameTolerance; only used by the 'orekit'
+        backend) """
+        gs = channel.groundStation
+        if channel.satellite.isNumpyBackend():
+            mode = 'numpy'
+        else:
+            mode = repr((bool(bulk), None if frameTolerance is None else float(frameTolerance)))
+        text = '\n'.join([cls.orbitKey(channel.satellite), 'rangeElevation',
+                          repr((gs.latitude, gs.longitude, gs.altitude)), mode])
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    # public interface
+    def positions(self, satellite, timeList):
+        """ Cached ITRF positions of a satellite, of shape (n_time, 3) [m] """
+        key = hashlib.sha256((self.orbitKey(satellite) + '\nitrf').encode()).hexdigest()
+        return self.fetch(key, timeList, satellite.itrfPositions)
+
+    def channelParameters(self, channel, timeList, bulk=False, frameTolerance=None):
+        """ Cached (length, elevation) of a SimpleDownlinkChannel """
+        def compute(subTimeList):
+            return np.stack(channel._orbitChannelParameters(subTimeList, bulk, frameTolerance), axis=-1)
+
+        values = self.fetch(self.channelKey(channel, bulk, frameTolerance), timeList, compute)
+        return (values[:, 0], values[:, 1])
+
+    def fetch(self, key, timeList, compute):
+        """ Get the values of an entry at the given times
+
+        Parameters
+        ----------
+        key: str
+            Entry key.
+        timeList: list
+            Requested times.
+        compute: callable
+            Function computing the values, of shape (n_time, ...), for a
+            pd.DatetimeIndex of the missing times.
+
+        Returns
+        -------
+        np.array
+            Values at the requested times.
+        """
+        times = propagation.asDatetime64(timeList).astype(np.int64)
+        cachedTimes, cachedValues = self._load(key)
+
+        if cachedTimes is not None and len(cachedTimes):
+            pos = np.clip(np.searchsorted(cachedTimes, times), 0, len(cachedTimes) - 1)
+            hit = cachedTimes[pos] == times
+        else:
+            hit = np.zeros(len(times), dtype=bool)
+
+        missing = ~hit
+        self.hits += int(hit.sum())
+        self.misses += int(missing.sum())
+
+        if not missing.any():
+            self._touch(key)
+            return np.asarray(cachedValues[pos])
+
+        newValues = np.asarray(compute(pd.to_datetime(times[missing])))
+        values = np.empty((len(times),) + newValues.shape[1:])
+        values[missing] = newValues
+        if hit.any():
+            values[hit] = cachedValues[pos[hit]]
+
+        # extend the entry with the newly computed times
+        newTimes, first = np.unique(times[missing], return_index=True)
+        newValues = newValues[first]
+        if cachedTimes is not None:
+            allTimes = np.concatenate((cachedTimes, newTimes))
+            order = np.argsort(allTimes, kind='stable')
+            allValues = np.concatenate((np.asarray(cachedValues), newValues))[order]
+            allTimes = allTimes[order]
+        else:
+            allTimes, allValues = newTimes, newValues
+        self._store(key, allTimes, allValues)
+
+        return values
+
+    def clear(self):
+        """ Remove all the entries """
+        for key in list(self._index):
+            self._remove(key)
+        self._saveIndex()
+
+    def flush(self):
+        """ Write the access times of the cache hits to the index """
+        if self._dirty:
+            self._saveIndex()
+
+    def close(self):
+        """ Flush the cache (it can still be used afterwards) """
+        self.flush()
+
+    @property
+    def size(self):
+        """ Size of the cache on disk [bytes] """
+        return sum(entry['size'] for entry in self._index.values())
+
+    # storage
+    def _paths(self, key):
+        return (os.path.join(self.directory, key + '.times.npy'),
+                os.path.join(self.directory, key + '.values.npy'))
+
+    def _load(self, key):
+        if key not in self._index:
+            return (None, None)
+        timesPath, valuesPath = self._paths(key)
+        try:
+            return (np.load(timesPath, mmap_mode='r'), np.load(valuesPath, mmap_mode='r'))
+        except (OSError, ValueError):
+            # entry removed or corrupted: forget it
+            self._remove(key)
+            self._saveIndex()
+            return (None, None)
+
+    def _store(self, key, times, values):
+        for path, array in zip(self._paths(key), (times, values)):
+            tmpPath = path + '.tmp'
+            with open(tmpPath, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmpPath, path)
+
+        self._index[key] = {'size': int(times.nbytes + values.nbytes), 'lastAccess': time.time()}
+        self._evict(keep=key)
+        self._saveIndex()
+
+    def _touch(self, key):
+        # written with the next _saveIndex (see flush)
+        self._index[key]['lastAccess'] = time.time()
+        self._dirty = True
+
+    def _evict(self, keep):
+        """ Remove the least recently used entries above maxBytes """
+        for key in sorted(self._index, key=lambda k: self._index[k]['lastAccess']):
+            if self.size <= self.maxBytes:
+                break
+            if key != keep:
+                self._remove(key)
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            if os.path.isfile(path):
+                os.remove(path)
+        self._index.pop(key, None)
+
+    def _saveIndex(self):
+        tmpPath = self._indexPath + '.tmp'
+        with open(tmpPath, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmpPath, self._indexPath)
+        self._dirty = False
@@ -0,0 +1,58 @@
+import model as ns
+import numpy as np
+import propagation
+import time
+from datetime import datetime
+from math import radians
+from model import timelistgen
+from orekitcontext import getContext
+
+getContext()
+
+from org.orekit.frames import FramesFactory
+from orekit.pyhelpers import datetime_to_absolutedate
+from org.orekit.orbits import PositionAngleType
+from org.orekit.utils import Constants
+
+# Comparison of the 'numpy' propagation backend with the Orekit one, with the
+# Earth orientation parameters of astropy for the numpy backend (see
+# propagation.py; the accuracy itself is checked by tests/test_propagation.py).
+MAX_LENGTH_ERROR = 10.  # [m]
+MAX_ELEVATION_ERROR = 1e-3  # [degrees]
+
+start = (2024, 1, 23, 23)
+stop = (2024, 1, 24, 1)
+datetime_list = timelistgen(start, stop, step=10**4)
+
+tle_line_1 = "1 41731U 16051A   24016.15735159  .00011450  00000-0  34540-3 0  9998"
+tle_line_2 = "2 41731  97.3167 289.0989 0012522  59.2544 300.9930 15.34373256413200"
+tle = (tle_line_1, tle_line_2)
+
+epoch = datetime(2024, 1, 23, 22)
+kepler_numpy = [6872181.5, 0.00132, radians(97.3699), radians(178.5836), radians(267.45), radians(246.0824),
+                'TRUE', 'EME2000', epoch, Constants.WGS84_EARTH_MU]
+kepler_orekit = kepler_numpy[:6] + [PositionAngleType.TRUE, FramesFactory.getEME2000(),
+                                    datetime_to_absolutedate(epoch), Constants.WGS84_EARTH_MU]
+
+paris = ns.GroundStation(48.8566, 2.3522, 80, "Paris")
+eop = propagation.EopTable.fromAstropy(np.arange('2024-01-22', '2024-01-26', dtype='datetime64[D]'))
+
+for name, orekit_sat, numpy_sat in (
+        ('tle', ns.Satellite(tle, simType='tle'), ns.Satellite(tle, simType='tle', backend='numpy', dut1=eop)),
+        ('keplerian', ns.Satellite(kepler_orekit, simType='keplerian'),
+         ns.Satellite(kepler_numpy, simType='keplerian', backend='numpy', dut1=eop))):
+    t0 = time.perf_counter()
+    length_orekit, elevation_orekit, _ = ns.SimpleDownlinkChannel(orekit_sat, paris).calculateChannelParameters(
+        datetime_list, bulk=True)
+    t1 = time.perf_counter()
+    length_numpy, elevation_numpy, _ = ns.SimpleDownlinkChannel(numpy_sat, paris).calculateChannelParameters(
+        datetime_list)
+    t2 = time.perf_counter()
+
+    length_error = np.abs(length_numpy - length_orekit).max()
+    elevation_error = np.abs(elevation_numpy - elevation_orekit).max()
+    print(f"{name}: max length error {length_error:.1f} m, max elevation error {elevation_error:.2e} deg, "
+          f"orekit {t1 - t0:.2f} s, numpy {t2 - t1:.3f} s")
+
+    assert length_error < MAX_LENGTH_ERROR, "length mismatch between the orekit and numpy backends"
+    assert elevation_error < MAX_ELEVATION_ERROR, "elevation mismatch between the orekit and numpy backends"
@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import pandas as pd
 from model import timelistgen
+from transmittance import siteTransmittance
 
 # Creating a datetime list for the orbit propagator
 start = (2024, 1, 23, 23)
@@ -58,23 +59,13 @@ plt.plot(filtered_timelist_paris, filtered_elevation_paris)
 plt.plot(filtered_timelist_paris, filtered_elevation_nice, color="#710193")
 plt.grid(color="gray")
 
-# Converting elevation to zenith angles for interpolation with atmospheric data
-zenith_to_satellite_paris = 90 - filtered_elevation_paris
-zenith_to_satellite_nice = 90 - filtered_elevation_nice
-
 # Reading pregenerated data for each location, see lowtran branch
-data_paris_1550 = np.genfromtxt('transmission_data_Paris.csv', delimiter=',', skip_header=1)
-data_nice_1550 = np.genfromtxt('transmission_data_Nice.csv', delimiter=',', skip_header=1)
-
-# Extracting data from csv
-zenith_angles_paris = data_paris_1550[:, 0]
-transmittance_values_paris = data_paris_1550[:, 1]
-
-zenith_angles_nice = data_nice_1550[:, 0]
-transmittance_values_nice = data_nice_1550[:, 1]
+table_paris = siteTransmittance("Paris", 1550)
+table_nice = siteTransmittance("Nice", 1550)
 
-transmittance_paris_interpolated = np.interp(zenith_to_satellite_paris, zenith_angles_paris, transmittance_values_paris)
-transmittance_nice_interpolated = np.interp(zenith_to_satellite_nice, zenith_angles_nice, transmittance_values_nice)
+# Interpolating the atmospheric transmittance at the satellite elevation
+transmittance_paris_interpolated = table_paris.interpolate(filtered_elevation_paris)
+transmittance_nice_interpolated = table_nice.interpolate(filtered_elevation_nice)
 
 lgt_paris = 10*np.log10(transmittance_paris_interpolated)
 lgt_nice = 10*np.log10(transmittance_nice_interpolated)
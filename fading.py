@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo fading of the downlink transmittance.
+
+model.end_to_end gives the mean transmittance of the downlink: a Gaussian beam
+broadened by diffraction (2.44 wl / DT) and turbulence (2.1 wl / r0), collected
+by the receiving telescope. FadingModel adds the random fluctuations around
+it:
+    * pointing jitter of the transmitter (angular standard deviation per axis)
+      and beam wander (standard deviation of the beam centroid per axis at the
+      receiver): the beam center is displaced by r, with r^2 exponentially
+      distributed, and the collected fraction drops by exp(-2 r^2 / w^2), w
+      being the beam radius at the receiver (w^2 = L^2 theta^2 / 2, so that
+      the on-axis collected fraction is end_to_end, in the small-aperture
+      approximation DR << w of end_to_end);
+    * scintillation: a log-normal factor of unit mean and aperture-averaged
+      scintillation index sigmaI^2, given at zenith and scaled with the
+      elevation as sec(zenith)^(11/6) (weak turbulence), or given as a function
+      of the elevation.
+Without jitter, wander and scintillation, the samples are exactly end_to_end.
+The mean transmittance with fading is analytic (FadingModel.mean).
+
+The samples are normalized by the mean, so that their distribution only
+depends slowly on the elevation and the range. FadingEngine draws many samples
+per (elevation, range) bin, in vectorized chunks of bounded size, optionally
+on a process pool, and accumulates them into a histogram of the normalized
+transmittance (FadingDistribution). The random streams are derived from one
+seed with np.random.SeedSequence, keyed by the bin and the chunk: the
+distributions do not depend on the number of processes or on the order of the
+requests. The distributions are cached per bin (and can be saved), so that
+repeated passes reuse them: the transmittance of an epoch is then the exact
+mean at its elevation and range times a draw from the distribution of its
+bin.
+"""
+import multiprocessing
+
+import numpy as np
+
+from model import end_to_end
+
+
+# edges of the histograms of the normalized transmittance (log-spaced)
+NORMALIZED_EDGES = np.concatenate(([0.], np.logspace(-8, 2, 2001)))
+
+
+class FadingModel:
+    """ Fading of the downlink transmittance
+
+    Parameters
+    ----------
+    DT, DR, wl, r0: float
+        Link parameters (see model.end_to_end).
+    pointingJitter: float
+        Pointing jitter of the transmitter, standard deviation per axis [rad].
+    beamWander: float
+        Beam wander at the receiver, standard deviation per axis [m].
+    scintillation: float or callable
+        Aperture-averaged scintillation index at zenith, or function of the
+        elevation [degrees] giving the scintillation index.
+    transmittance: callable, optional
+        Atmospheric transmittance as a function of the elevation [degrees]
+        (e.g. a TransmittanceTable); 1 if not given.
+    """
+
+    def __init__(self, DT, DR, wl, r0, pointingJitter=0., beamWander=0., scintillation=0., transmittance=None):
+        self.DT = DT
+        self.DR = DR
+        self.wl = wl
+        self.r0 = r0
+        self.pointingJitter = pointingJitter
+        self.beamWander = beamWander
+        self.scintillation = scintillation
+        self.transmittance = transmittance
+
+    def __repr__(self):
+        return (f"FadingModel(jitter={self.pointingJitter} rad, wander={self.beamWander} m, "
+                f"scintillation={self.scintillation})")
+
+    def beamRadius2(self, length):
+        """ Square of the beam radius at the receiver [m^2] """
+        theta2 = (2.44 * self.wl / self.DT) ** 2 + (2.1 * self.wl / self.r0) ** 2
+        return np.asarray(length) ** 2 * theta2 / 2
+
+    def displacement2(self, length):
+        """ Variance per axis of the beam-center displacement [m^2] """
+        return (np.asarray(length) * self.pointingJitter) ** 2 + self.beamWander ** 2
+
+    def scintillationIndex(self, elevation):
+        """ Aperture-averaged scintillation index at the elevation [degrees] """
+        if callable(self.scintillation):
+            return np.asarray(self.scintillation(elevation), dtype=float)
+        zenith = np.radians(90. - np.asarray(elevation, dtype=float))
+        return self.scintillation / np.cos(zenith) ** (11 / 6)
+
+    def onAxis(self, elevation, length):
+        """ Transmittance without fading (end_to_end) """
+        atmosphere = self.transmittance(elevation) if self.transmittance is not None else 1.
+        return end_to_end(self.DT, self.DR, self.wl, atmosphere, length, self.r0)
+
+    def mean(self, elevation, length):
+        """ Mean transmittance with fading
+
+        E[exp(-2 r^2 / w^2)] = 1 / (1 + 4 sigma^2 / w^2) for the displacement,
+        and the scintillation factor has unit mean.
+        """
+        return self.onAxis(elevation, length) / (1 + 4 * self.displacement2(length) / self.beamRadius2(length))
+
+    def sampleNormalized(self, elevation, length, n, rng):
+        """ n samples of the transmittance divided by its mean
+
+        Parameters
+        ----------
+        elevation, length: float
+            Elevation [degrees] and length of the channel [m].
+        n: int
+            Number of samples.
+        rng: np.random.Generator
+            Random generator.
+        """
+        ratio = self.displacement2(length) / self.beamRadius2(length)
+        samples = np.full(n, 1 + 4 * ratio)
+        if ratio > 0:
+            # r^2 / w^2, with r^2 = x^2 + y^2 and x, y ~ N(0, sigma^2)
+            samples *= np.exp(-2 * rng.exponential(2 * ratio, n))
+
+        sigmaI2 = float(self.scintillationIndex(elevation))
+        if sigmaI2 > 0:
+            sigma2 = np.log1p(sigmaI2)
+            samples *= np.exp(rng.normal(-sigma2 / 2, np.sqrt(sigma2), n))
+        return samples
+
+    def sample(self, elevation, length, n, rng):
+        """ n samples of the transmittance """
+        return self.mean(elevation, length) * self.sampleNormalized(elevation, length, n, rng)
+
+
+class FadingDistribution:
+    """ Distribution of the normalized transmittance (transmittance / mean)
+
+    Parameters
+    ----------
+    counts: np.array
+        Counts of the samples in the bins of NORMALIZED_EDGES.
+    total: float
+        Sum of the samples (for the sample mean).
+    """
+
+    def __init__(self, counts, total=0.):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.total = total
+        self.samples = int(self.counts.sum())
+        cdf = np.cumsum(self.counts) / max(self.samples, 1)
+        self.cdf = np.concatenate(([0.], cdf))
+
+    def __repr__(self):
+        return f"FadingDistribution({self.samples} samples, mean {self.sampleMean:.4f})"
+
+    @property
+    def sampleMean(self):
+        """ Mean of the samples (1 up to the Monte Carlo error) """
+        return self.total / self.samples if self.samples else np.nan
+
+    def probabilityBelow(self, x):
+        """ Probability of a normalized transmittance below x """
+        return np.interp(x, NORMALIZED_EDGES, self.cdf)
+
+    def quantile(self, p):
+        """ Normalized transmittance of cumulative probability p """
+        # the CDF is flat on the empty bins: interpolate on the increasing part
+        keep = np.concatenate(([True], np.diff(self.cdf) > 0))
+        return np.interp(p, self.cdf[keep], NORMALIZED_EDGES[keep])
+
+    def sample(self, n, rng):
+        """ n draws of the normalized transmittance (inverse CDF) """
+        return self.quantile(rng.random(n))
+
+
+def _sampleChunk(task):
+    """ Histogram and sum of the normalized samples of one chunk """
+    model, elevation, length, n, seed = task
+    samples = model.sampleNormalized(elevation, length, n, np.random.default_rng(seed))
+    counts = np.bincount(np.clip(np.searchsorted(NORMALIZED_EDGES, samples, side='right') - 1, 0,
+                                 len(NORMALIZED_EDGES) - 2), minlength=len(NORMALIZED_EDGES) - 1)
+    return (counts, samples.sum())
+
+
+class FadingEngine:
+    """ Fading distributions per elevation and range bin
+
+    Parameters
+    ----------
+    model: FadingModel
+        Fading model.
+    elevationBins: np.array
+        Edges of the elevation bins [degrees].
+    rangeBins: np.array
+        Edges of the range bins [m].
+    samples: int
+        Number of samples per bin.
+    chunkSize: int
+        Number of samples drawn at once.
+    seed: int
+        Seed of the random streams.
+    processes: int
+        Number of worker processes (1 runs in the calling process, None uses
+        all the cores).
+    """
+
+    def __init__(self, model, elevationBins=np.arange(0, 91, 1.), rangeBins=np.arange(2e5, 4e6 + 1, 1e4),
+                 samples=10 ** 6, chunkSize=2 ** 18, seed=0, processes=1):
+        self.model = model
+        self.elevationBins = np.asarray(elevationBins, dtype=float)
+        self.rangeBins = np.asarray(rangeBins, dtype=float)
+        self.samples = samples
+        self.chunkSize = chunkSize
+        self.seed = seed
+        self.processes = processes
+        self._distributions = {}
+
+    def __repr__(self):
+        return f"FadingEngine({len(self._distributions)} bins cached, {self.samples} samples per bin)"
+
+    def binIndex(self, elevation, length):
+        """ (elevation, range) bin indices of the epochs, clipped to the grid """
+        i = np.searchsorted(self.elevationBins, elevation, side='right') - 1
+        j = np.searchsorted(self.rangeBins, length, side='right') - 1
+        return (np.clip(i, 0, len(self.elevationBins) - 2), np.clip(j, 0, len(self.rangeBins) - 2))
+
+    def _tasks(self, cell):
+        """ Chunks of the samples of a bin, with their random streams """
+        i, j = cell
+        elevation = (self.elevationBins[i] + self.elevationBins[i + 1]) / 2
+        length = (self.rangeBins[j] + self.rangeBins[j + 1]) / 2
+        for k, start in enumerate(range(0, self.samples, self.chunkSize)):
+            seed = np.random.SeedSequence(self.seed, spawn_key=(int(i), int(j), k))
+            yield (self.model, elevation, length, min(self.chunkSize, self.samples - start), seed)
+
+    def prepare(self, elevation, length):
+        """ Compute the distributions of the bins of the epochs not yet cached """
+        i, j = self.binIndex(np.atleast_1d(elevation), np.atleast_1d(length))
+        cells = sorted(set(zip(i.tolist(), j.tolist())) - set(self._distributions))
+        if not cells:
+            return
+
+        tasks = [(cell, task) for cell in cells for task in self._tasks(cell)]
+        if self.processes == 1:
+            results = map(_sampleChunk, (task for _, task in tasks))
+        else:
+            pool = multiprocessing.Pool(self.processes)
+            results = pool.imap(_sampleChunk, (task for _, task in tasks))
+
+        try:
+            counts = {cell: [np.zeros(len(NORMALIZED_EDGES) - 1, dtype=np.int64), 0.] for cell in cells}
+            for (cell, _), (chunkCounts, chunkTotal) in zip(tasks, results):
+                counts[cell][0] += chunkCounts
+                counts[cell][1] += chunkTotal
+        finally:
+            if self.processes != 1:
+                pool.close()
+                pool.join()
+
+        for cell, (cellCounts, total) in counts.items():
+            self._distributions[cell] = FadingDistribution(cellCounts, total)
+
+    def distribution(self, elevation, length):
+        """ FadingDistribution of the bin of an epoch """
+        self.prepare(elevation, length)
+        i, j = self.binIndex(elevation, length)
+        return self._distributions[(int(i), int(j))]
+
+    def _perEpoch(self, elevation, length, function):
+        elevation, length = np.broadcast_arrays(np.asarray(elevation, dtype=float), np.asarray(length, dtype=float))
+        self.prepare(elevation, length)
+        i, j = self.binIndex(elevation, length)
+        result = np.empty(elevation.shape)
+        cells = i * (len(self.rangeBins) - 1) + j
+        for cell in np.unique(cells):
+            where = cells == cell
+            result[where] = function(self._distributions[divmod(int(cell), len(self.rangeBins) - 1)], where)
+        return result
+
+    def outageProbability(self, elevation, length, threshold):
+        """ Probability of a transmittance below threshold at each epoch """
+        mean = self.model.mean(elevation, length)
+        normalized = np.broadcast_to(threshold / mean, np.shape(mean))
+        return self._perEpoch(elevation, length, lambda d, where: d.probabilityBelow(normalized[where]))
+
+    def quantile(self, elevation, length, p):
+        """ Transmittance of cumulative probability p at each epoch """
+        return self.model.mean(elevation, length) * self._perEpoch(elevation, length,
+                                                                   lambda d, where: d.quantile(p))
+
+    def sample(self, elevation, length, n=1, rng=None):
+        """ n draws of the transmittance at each epoch, of shape (n_epoch, n)
+
+        The draws come from the cached distributions of the bins, scaled by
+        the exact mean at the elevation and range of each epoch.
+        """
+        rng = np.random.default_rng(rng)
+        elevation = np.atleast_1d(np.asarray(elevation, dtype=float))
+        length = np.broadcast_to(np.asarray(length, dtype=float), elevation.shape)
+        self.prepare(elevation, length)
+        i, j = self.binIndex(elevation, length)
+
+        draws = np.empty((len(elevation), n))
+        for cell in sorted(set(zip(i.tolist(), j.tolist()))):
+            where = (i == cell[0]) & (j == cell[1])
+            draws[where] = self._distributions[cell].sample((int(where.sum()), n), rng)
+        return self.model.mean(elevation, length)[:, None] * draws
+
+    # import / export
+    def save(self, path):
+        """ Save the cached distributions as a .npz file """
+        cells = sorted(self._distributions)
+        np.savez_compressed(path, elevationBins=self.elevationBins, rangeBins=self.rangeBins,
+                            samples=self.samples, seed=self.seed, cells=np.array(cells, dtype=np.int64).reshape(-1, 2),
+                            counts=np.array([self._distributions[c].counts for c in cells]).reshape(len(cells), -1),
+                            totals=np.array([self._distributions[c].total for c in cells]))
+
+    def load(self, path):
+        """ Add the distributions saved with save (same bins, samples and
+        seed) to the cache """
+        with np.load(path) as data:
+            if (not np.array_equal(data['elevationBins'], self.elevationBins)
+                    or not np.array_equal(data['rangeBins'], self.rangeBins)
+                    or int(data['samples']) != self.samples or int(data['seed']) != self.seed):
+                raise ValueError(f"the distributions in {path} were computed with other bins, samples or seed")
+            for cell, counts, total in zip(data['cells'], data['counts'], data['totals']):
+                self._distributions[tuple(int(c) for c in cell)] = FadingDistribution(counts, float(total))
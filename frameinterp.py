@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Interpolated frame rotations for dense time grids.
+
+Evaluating the inertial -> ITRF transform with Orekit at every sample runs the
+full IERS 2010 Earth orientation model each time, although the Earth
+orientation varies smoothly at the time scales of the sampling. Here the
+rotation is evaluated exactly on coarse nodes only, as quaternions, and
+interpolated with piecewise cubic Lagrange polynomials for all the dense
+epochs.
+
+The nodes are refined (the node step halved) until the interpolation error,
+measured against the exact rotation at the midpoint of every node interval
+(where the error of the cubic stencil is largest), is below the requested
+tolerance. The achieved error is reported in maxError; if the tolerance is
+still not met after maxRefinements halvings, frameInterpolationError is
+raised, so that the tolerance always caps the error.
+
+Quaternions follow the Hipparchus convention (q0 scalar, rotation applied with
+Rotation.applyTo), so that the interpolated rotation transforms positions like
+Orekit's Transform.transformPosition for frames with no translation.
+"""
+import numpy as np
+import pandas as pd
+
+
+class frameInterpolationError(Exception):
+    pass
+
+
+class InterpolatedRotation:
+    """ Frame rotation interpolated on uniform nodes
+
+    Parameters
+    ----------
+    start, stop: int
+        Time span to cover, as int64 nanoseconds (np.datetime64 values).
+    exactQuaternions: callable
+        Function returning the exact quaternions, of shape (n, 4), at an int64
+        nanosecond time array.
+    nodeStep: float
+        Initial step between the interpolation nodes [s].
+    tolerance: float
+        Maximum interpolation error, as a rotation angle [rad].
+    maxRefinements: int
+        Maximum number of node step halvings; frameInterpolationError is
+        raised if the tolerance is not met after them.
+    """
+
+    def __init__(self, start, stop, exactQuaternions, nodeStep=600., tolerance=1e-10, maxRefinements=10):
+        self.exactQuaternions = exactQuaternions
+        self.tolerance = tolerance
+        self.start = int(start)
+        self.stop = int(stop)
+
+        step = nodeStep
+        for _ in range(maxRefinements + 1):
+            self._buildNodes(step)
+            checkTimes = self.nodes[:-1] + self.step // 2
+            self.maxError = float(rotationAngle(self.quaternions(checkTimes),
+                                                self.exactQuaternions(checkTimes)).max())
+            if self.maxError <= tolerance:
+                break
+            step /= 2
+        else:
+            raise frameInterpolationError(
+                f"interpolation error {self.maxError:.2e} rad above the tolerance {tolerance:.2e} rad "
+                f"after {maxRefinements} refinements (node step {self.step / 1e9:g} s)")
+
+    def _buildNodes(self, step):
+        """ Uniform nodes covering [start, stop] with one extra node on each side """
+        self.step = int(step * 1e9)
+        nNodes = max(int(np.ceil((self.stop - self.start) / self.step)), 1) + 3
+        self.nodes = self.start - self.step + self.step * np.arange(nNodes, dtype=np.int64)
+
+        q = np.array(self.exactQuaternions(self.nodes), dtype=float)
+        # q and -q are the same rotation: keep the nodes on a continuous branch
+        sign = np.sign(np.einsum('ij,ij->i', q[1:], q[:-1]))
+        sign[sign == 0] = 1
+        q[1:] *= np.cumprod(sign)[:, None]
+        self.nodeQuaternions = q
+
+    def quaternions(self, times):
+        """ Interpolated (normalized) quaternions, of shape (n, 4) """
+        u = (np.asarray(times, dtype=np.int64) - self.nodes[0]) / self.step
+        # stencil of the 4 nodes around each time
+        k = np.clip(np.floor(u).astype(int) - 1, 0, len(self.nodes) - 4)
+        x = u - k
+        weights = np.stack((-(x - 1) * (x - 2) * (x - 3) / 6,
+                            x * (x - 2) * (x - 3) / 2,
+                            -x * (x - 1) * (x - 3) / 2,
+                            x * (x - 1) * (x - 2) / 6), -1)
+        stencil = self.nodeQuaternions[k[:, None] + np.arange(4)]
+        q = np.einsum('nk,nkj->nj', weights, stencil)
+        return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+    def matrices(self, times):
+        """ Interpolated rotation matrices, of shape (n, 3, 3) """
+        return quaternionMatrix(self.quaternions(times))
+
+    def apply(self, times, positions):
+        """ Rotate positions (n, 3) given at times (int64 nanoseconds) """
+        return np.einsum('nij,nj->ni', self.matrices(times), positions)
+
+    def validate(self, times):
+        """ Maximum interpolation error [rad] at the given times, against the
+        exact rotation """
+        times = np.asarray(times, dtype=np.int64)
+        return float(rotationAngle(self.quaternions(times), self.exactQuaternions(times)).max())
+
+
+def quaternionMatrix(q):
+    """ Matrices of the Hipparchus Rotation.applyTo for quaternions (n, 4) """
+    q0, q1, q2, q3 = np.moveaxis(q, -1, 0)
+    return np.stack((
+        np.stack((2 * (q0 * q0 + q1 * q1) - 1, 2 * (q1 * q2 + q0 * q3), 2 * (q1 * q3 - q0 * q2)), -1),
+        np.stack((2 * (q1 * q2 - q0 * q3), 2 * (q0 * q0 + q2 * q2) - 1, 2 * (q2 * q3 + q0 * q1)), -1),
+        np.stack((2 * (q1 * q3 + q0 * q2), 2 * (q2 * q3 - q0 * q1), 2 * (q0 * q0 + q3 * q3) - 1), -1)), -2)
+
+
+def rotationAngle(qa, qb):
+    """ Angle [rad] of the rotation between two sets of unit quaternions """
+    sign = np.where(np.einsum('ij,ij->i', qa, qb) < 0, -1.0, 1.0)[:, None]
+    qb = sign * qb
+    return 4 * np.arctan2(np.linalg.norm(qa - qb, axis=-1), np.linalg.norm(qa + qb, axis=-1))
+
+
+def orekitQuaternions(fromFrame, toFrame, metrics=None):
+    """ Exact quaternions of the Orekit transform between two frames, as a
+    function of int64 nanosecond times (the calls into Orekit are counted in
+    metrics, if given) """
+    from model import absoluteDateList
+
+    def exactQuaternions(times):
+        quaternions = np.zeros((len(times), 4))
+        for i, absDate in enumerate(absoluteDateList(pd.to_datetime(times), metrics)):
+            rotation = fromFrame.getStaticTransformTo(toFrame, absDate).getRotation()
+            quaternions[i] = (rotation.getQ0(), rotation.getQ1(), rotation.getQ2(), rotation.getQ3())
+        if metrics is not None:
+            # getStaticTransformTo, getRotation and the 4 components
+            metrics.count('jvmCalls', 6 * len(times))
+        return quaternions
+
+    return exactQuaternions
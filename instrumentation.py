@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentation of the channel computations.
+
+A ChannelMetrics object accumulates per-stage timers and counters of the
+channel computations:
+    * stages: 'timeGrid' (time conversions, e.g. to Orekit AbsoluteDate),
+      'propagation', 'frameTransform', 'elevation' (range and elevation) and
+      'atmosphere' (transmittance lookups)
+    * counters: 'samples', 'jvmCalls' (Orekit methods called by the channel
+      code, counted at each call site, one per call executed: the calls made
+      inside Orekit are not counted), 'cacheHits' and 'cacheMisses'
+      (EphemerisCache samples)
+
+Metrics are given to a SimpleDownlinkChannel (metrics=...), or activated for
+the whole process with setMetrics(), so that production sweeps can be
+profiled without changing the code that builds the channels. Optionally, a
+callback receives every event, and summaries are written with the standard
+logging module (logger 'instrumentation').
+
+When no metrics are active, the channels use NULL_METRICS, whose stage() and
+count() do nothing: the overhead is one method call per stage, not per sample.
+"""
+import logging
+import time
+from collections import Counter, defaultdict
+
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('timeGrid', 'propagation', 'frameTransform', 'elevation', 'atmosphere')
+COUNTERS = ('samples', 'jvmCalls', 'cacheHits', 'cacheMisses')
+
+
+class _Stage:
+    """ Context manager timing one stage """
+
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.addTime(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class ChannelMetrics:
+    """ Timers and counters of the channel computations
+
+    Parameters
+    ----------
+    callback: callable, optional
+        Function called as callback(kind, name, value) for every event, with
+        kind 'stage' (value: duration [s]) or 'count' (value: increment).
+    logLevel: int, optional
+        If given, every event is also logged at this level.
+    """
+
+    enabled = True
+
+    def __init__(self, callback=None, logLevel=None):
+        self.callback = callback
+        self.logLevel = logLevel
+        self.reset()
+
+    def reset(self):
+        """ Clear the timers and counters """
+        self.timers = defaultdict(float)
+        self.calls = Counter()
+        self.counters = Counter()
+
+    def stage(self, name):
+        """ Context manager timing the stage name """
+        return _Stage(self, name)
+
+    def addTime(self, name, seconds):
+        self.timers[name] += seconds
+        self.calls[name] += 1
+        self._event('stage', name, seconds)
+
+    def count(self, name, n=1):
+        """ Increment the counter name by n """
+        self.counters[name] += n
+        self._event('count', name, n)
+
+    def _event(self, kind, name, value):
+        if self.callback is not None:
+            self.callback(kind, name, value)
+        if self.logLevel is not None:
+            logger.log(self.logLevel, "%s %s: %s", kind, name, value)
+
+    def summary(self):
+        """ Timers [s], numbers of calls of each stage and counters, as a dict """
+        return {'timers': dict(self.timers), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def log(self, level=logging.INFO):
+        """ Write a summary with the logging module """
+        total = sum(self.timers.values())
+        for name, seconds in sorted(self.timers.items(), key=lambda item: -item[1]):
+            logger.log(level, "%-15s %10.4f s %6.1f %% (%d calls)", name, seconds,
+                       100 * seconds / total if total else 0., self.calls[name])
+        for name, value in sorted(self.counters.items()):
+            logger.log(level, "%-15s %10d", name, value)
+
+    def __repr__(self):
+        timers = ', '.join(f"{name}={seconds:.3g}s" for name, seconds in self.timers.items())
+        counters = ', '.join(f"{name}={value}" for name, value in self.counters.items())
+        return f"ChannelMetrics({timers}; {counters})"
+
+
+class _NullStage:
+    """ Context manager doing nothing """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullMetrics:
+    """ Disabled metrics: stage() and count() do nothing """
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+_active = NULL_METRICS
+
+
+def setMetrics(metrics):
+    """ Activate metrics for all the channels without their own (None to
+    disable), and return the previously active ones """
+    global _active
+    previous = _active
+    _active = NULL_METRICS if metrics is None else metrics
+    return previous
+
+
+def activeMetrics():
+    """ Metrics active for the process (NULL_METRICS if disabled) """
+    return _active
@@ -14,54 +14,191 @@ v00     Changes made:
 
 v01     Changes made:
     - added keplerian propagation
-"""
-import pandas as pd
-import orekit
-
-from orekit.pyhelpers import download_orekit_data_curdir, setup_orekit_curdir, datetime_to_absolutedate
 
-import os
+v02     Changes made:
+    - Orekit (VM, data and frames) is initialized lazily on first use, see
+      orekitcontext.py
+"""
+import logging
 
 import numpy as np
 
 from math import radians
 
-from datetime import datetime, timedelta
+import propagation
+
+from orekitcontext import getContext
+
+from instrumentation import activeMetrics
 
-# setup orekit
-vm = orekit.initVM()
+from timegrid import TimeGrid, toDatetime64
 
-if not os.path.isfile('orekit-data.zip'):
-    download_orekit_data_curdir()
+from datetime import timedelta
 
-setup_orekit_curdir()
 
-# Orekit imports
-from org.orekit.propagation.analytical.tle import TLE, TLEPropagator
-from org.orekit.propagation.analytical import KeplerianPropagator
-from org.orekit.orbits import KeplerianOrbit
-from org.orekit.frames import FramesFactory, TopocentricFrame
-from org.orekit.bodies import OneAxisEllipsoid, GeodeticPoint
-from org.orekit.utils import IERSConventions, Constants
+def __getattr__(name):
+    """ Module-level access to the frames and Earth model of the Orekit
+    context (model.ITRF, model.earth, model.inertialFrame), which initializes
+    Orekit on first access """
+    if name in ('ITRF', 'earth', 'inertialFrame'):
+        return getattr(getContext(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Prepare global variables - time and space reference systems
-ITRF = FramesFactory.getITRF(IERSConventions.IERS_2010, True)
-earth = OneAxisEllipsoid(Constants.WGS84_EARTH_EQUATORIAL_RADIUS,
-                         Constants.WGS84_EARTH_FLATTENING, ITRF)
-inertialFrame = FramesFactory.getEME2000()
+
+logger = logging.getLogger(__name__)
 
 
 # Timelist generation
 def timelistgen(start, stop, step = 10**5):
-    begin = pd.Timestamp(datetime(*start))
-    end = pd.Timestamp(datetime(*stop))
-    t = np.linspace(begin.value, end.value, step)
-    datetime_list = pd.to_datetime(t)
-    return datetime_list
+    # exact integer spacing (see timegrid.TimeGrid.linspace)
+    return TimeGrid.linspace(start, stop, step).toDatetimeIndex()
+
+
+def _uniformGrid(start, stop, step):
+    """ First time [ns], step [ns] and number of samples of a uniform grid """
+    begin, end = (int(toDatetime64(t).astype(np.int64)) for t in (start, stop))
+    stepNs = int(round(step * 1e9))
+    return (begin, stepNs, (end - begin) // stepNs + 1)
+
+
+def timeChunks(start, stop, step=1., chunkSize=10000):
+    """ Uniform time grid from start to stop, generated in chunks
+
+    Parameters
+    ----------
+    start, stop : tuple or datetime
+        Start and end (included if on the grid) of the grid, either as
+        datetime or as the tuples used by timelistgen.
+    step : float
+        Step of the grid [s].
+    chunkSize : int
+        Number of samples per chunk (the last one can be shorter).
+
+    Yields
+    ------
+    TimeGrid
+        Consecutive chunks of the grid.
+    """
+    begin, stepNs, nSamples = _uniformGrid(start, stop, step)
+    epoch = np.datetime64(begin, 'ns')
+
+    for k in range(0, nSamples, chunkSize):
+        yield TimeGrid(epoch, np.arange(k, min(k + chunkSize, nSamples), dtype=np.int64) * stepNs)
 
 # utc = TimeScalesFactory.getUTC()
 
 
+def absoluteDateList(timeList, metrics=None):
+    """ Convert a list of times (or a TimeGrid) to a list of Orekit
+    AbsoluteDate, by shifting one reference date (see
+    TimeGrid.absoluteDates) """
+    return TimeGrid.fromTimes(timeList).absoluteDates(metrics)
+
+
+def relativeTime(timeList):
+    """ Time relative to the middle of timeList [s], as a float array """
+    times = propagation.asDatetime64(timeList)
+    return (times - times[len(times) // 2]) / np.timedelta64(1, 's')
+
+
+def polOrbPassParameters(relTime, latitude, incAngle, satAlt):
+    """ Channel parameters of the polar orbit passage model
+
+    Model of [Moll et al., PRA 99, 053830 (2019)], where the satellite
+    culminates at relTime = 0. The orbit and station parameters are arrays
+    broadcasting against each other, and the time is the last axis of the
+    results, so that design-space sweeps are computed in a single call.
+
+    Parameters
+    ----------
+    relTime : np.array
+        Time relative to the culmination [s], of shape (n_time,).
+    latitude : float or np.array
+        Latitude of the ground station [rad].
+    incAngle : float or np.array
+        Inclination angle of the satellite w.r.t. the ground station [rad].
+    satAlt : float or np.array
+        Altitude of the satellite [m].
+
+    Returns
+    -------
+    tuple (np.array, np.array)
+        Arrays of shape broadcast(latitude, incAngle, satAlt).shape + (n_time,):
+        - length [m]
+        - elevation [degrees]
+    """
+    psi, deltaI, hs = (np.asarray(x, dtype=float)[..., None] for x in np.broadcast_arrays(latitude, incAngle, satAlt))
+
+    deltaMin = np.arccos(np.cos(psi) * np.cos(deltaI) / np.sqrt(1 - (np.cos(psi) * np.sin(deltaI)) ** 2))
+
+    # Earth parameters (from Daniele's code)
+    Rt = 6.37e6  # Earth radius
+    M = 5.97e24  # Earth mass
+    G = 6.67e-11  # Gravitational constant
+
+    Omega = np.sqrt(G * M / (Rt + hs) ** 3)
+
+    delta = Omega * np.asarray(relTime, dtype=float) + deltaMin
+
+    Zc = np.arccos(np.sin(psi) * np.sin(delta) + np.cos(psi) * np.cos(delta) * np.cos(deltaI))
+    Z = np.arcsin((Rt + hs) * np.sin(Zc) / np.sqrt(Rt ** 2 + (Rt + hs) ** 2 - 2 * Rt * (Rt + hs) * np.cos(Zc)))
+    elevation = 90 - np.rad2deg(Z)
+
+    channelLength = -Rt * np.cos(Z) + np.sqrt((Rt * np.cos(Z)) ** 2 + 2 * Rt * hs + hs ** 2)
+
+    return (channelLength, elevation)
+
+
+def polOrbPassSweep(timeList, incAngle, satAlt, latitude):
+    """ Polar orbit passage model over a grid of configurations
+
+    Parameters
+    ----------
+    timeList : list
+        List of times; the satellite culminates at the middle of the list.
+    incAngle : float or np.array
+        Inclination angles of the satellite w.r.t. the ground station [deg].
+    satAlt : float or np.array
+        Altitudes of the satellite [km].
+    latitude : float or np.array
+        Latitudes of the ground station [deg].
+
+    Returns
+    -------
+    tuple (np.array, np.array, list)
+        - length [m], of shape broadcast(incAngle, satAlt, latitude).shape + (n_time,)
+        - elevation [degrees], of the same shape
+        - timeList
+    """
+    channelLength, elevation = polOrbPassParameters(relativeTime(timeList), np.radians(latitude),
+                                                    np.radians(incAngle), np.asarray(satAlt) * 1e3)
+    return (channelLength, elevation, timeList)
+
+
+def end_to_end(DT, DR, wl, transmittance_atm, channel_distance, r0):
+    """ End-to-end transmittance of the downlink
+
+    Parameters
+    ----------
+    DT, DR : float or np.array
+        Diameters of the transmitting and receiving telescopes [m].
+    wl : float or np.array
+        Wavelength [m].
+    transmittance_atm : float or np.array
+        Atmospheric transmittance.
+    channel_distance : float or np.array
+        Length of the channel [m].
+    r0 : float or np.array
+        Fried parameter [m].
+
+    All the parameters broadcast against each other.
+    """
+    theta_diff =  2.44 * wl / DT
+    theta_atm = 2.1 * wl / r0
+    return transmittance_atm /( (channel_distance**2) * (theta_atm**2 + theta_diff**2) )* (
+            DR**2)
+
+
 # Define classes for the different objects
 class orbitModelError(Exception):
     pass
@@ -84,29 +221,44 @@ class Satellite:
         * 'polOrbPass': use the model of polar orbit passage described in
             [Moll et al., PRA 99, 053830 (2019)]
 
+    The 'tle' and 'keplerian' orbits are propagated by one of two backends:
+        * 'orekit': Orekit's TLEPropagator / KeplerianPropagator (default)
+        * 'numpy': the vectorized SGP4 / two-body propagators of the
+            propagation module, which propagate whole time arrays without the
+            JVM (see propagation.py for the accuracy of this backend)
+
     Paramters
     ---------
     incAngle: float
         Inclination angle of the satellite w.r.t. the ground station [deg].
     satAlt: float
         Altitude of the satellite [km].
+    backend: str
+        Propagation backend, 'orekit' or 'numpy'.
+    dut1: float or callable
+        UT1 - UTC [s] used by the frame conversions of the 'numpy' backend, or
+        a function of the times giving it (e.g. propagation.EopTable, which
+        also gives the polar motion). The 'orekit' backend uses the Earth
+        orientation parameters of the Orekit data instead.
     """
 
     simTypeAllowed = ('tle', 'polOrbPass', "keplerian", '')
+    backendAllowed = ('orekit', 'numpy')
+
+    def __init__(self, params, simType='tle', incAngle=0, satAlt=0, backend='orekit', dut1=0.):
+        if backend not in self.backendAllowed:
+            raise orbitModelError(f"unknown propagation backend '{backend}'")
 
-    def __init__(self, params, simType='tle', incAngle=0, satAlt=0):
         self.simType = simType
+        self.backend = backend
+        self.dut1 = dut1
 
         if simType == 'tle':
             """ Initializpaation of the satellite orbit from a TLE list """
-            self.tleList = params
-            self.tleObject = TLE(*self.tleList)
-            self.propagator = TLEPropagator.selectExtrapolator(self.tleObject)
+            self.setSimTLE(params)
         elif simType == 'keplerian':
             """ Initialization of the satellite orbit from a Keplerian list """
-            self.keplerList = params
-            self.keplerObject = KeplerianOrbit(*self.keplerList)
-            self.propagator = KeplerianPropagator(self.keplerObject)
+            self.setSimKeplerian(params)
         elif simType == 'polOrbPass':
             self.incAngle = radians(incAngle)
             self.satAlt = satAlt * 1e3
@@ -116,14 +268,27 @@ class Satellite:
     def setSimTLE(self, tle):
         self.simType = 'tle'
         self.tleList = tle
-        self.tleObject = TLE(*self.tleList)
-        self.propagator = TLEPropagator.selectExtrapolator(self.tleObject)
+        if self.isNumpyBackend():
+            self.elements = propagation.TLEElements([self.tleList])
+        else:
+            getContext()
+            from org.orekit.propagation.analytical.tle import TLE, TLEPropagator
+
+            self.tleObject = TLE(*self.tleList)
+            self.propagator = TLEPropagator.selectExtrapolator(self.tleObject)
 
     def setSimKeplerian(self, kepler):
         self.simType = 'keplerian'
         self.keplerList = kepler
-        self.keplerObject = KeplerianOrbit(*self.keplerList)
-        self.propagator = KeplerianPropagator(self.keplerObject)
+        if self.isNumpyBackend():
+            self.elements = propagation.KeplerianElements([self.keplerList])
+        else:
+            getContext()
+            from org.orekit.propagation.analytical import KeplerianPropagator
+            from org.orekit.orbits import KeplerianOrbit
+
+            self.keplerObject = KeplerianOrbit(*self.keplerList)
+            self.propagator = KeplerianPropagator(self.keplerObject)
 
     def setSimPolOrbPass(self, incAngle, satAlt):
         self.simType = 'polOrbPass'
@@ -139,6 +304,40 @@ class Satellite:
     def isKeplerian(self):
         return (self.simType == 'keplerian')
 
+    def isNumpyBackend(self):
+        return (self.backend == 'numpy')
+
+    def itrfPositions(self, timeList, absDateList=None):
+        """ Satellite positions in the ITRF frame
+
+        Parameters
+        ----------
+        timeList : list
+            List of times at which to calculate the positions.
+        absDateList : list, optional
+            The times of timeList already converted to Orekit AbsoluteDate, to
+            share the conversion between satellites (Orekit backend only).
+
+        Returns
+        -------
+        np.array
+            Positions [m], of shape (n_time, 3).
+        """
+        if not (self.isTLE() or self.isKeplerian()):
+            raise orbitModelError("ITRF positions require a 'tle' or 'keplerian' satellite")
+
+        if self.isNumpyBackend():
+            return self.elements.itrfPositions(timeList, self.dut1)[0]
+
+        if absDateList is None:
+            absDateList = absoluteDateList(timeList)
+        itrf = getContext().ITRF
+
+        positions = np.zeros((len(absDateList), 3))
+        for i, absDate in enumerate(absDateList):
+            positions[i] = list(self.propagator.getPVCoordinates(absDate, itrf).getPosition().toArray())
+        return positions
+
 
 class GroundStation:
     """ Ground station
@@ -163,9 +362,23 @@ class GroundStation:
         self.altitude = float(alt)
         self.name = name
 
-        # define the station Topocentric Frame
-        self.geodeticPoint = GeodeticPoint(self.latitude, self.longitude, self.altitude)
-        self.frame = TopocentricFrame(earth, self.geodeticPoint, self.name)
+        # station position and topocentric axes in ITRF, for the numpy backend
+        self.itrfPosition = propagation.geodeticToItrf(self.latitude, self.longitude, self.altitude)
+        self.topocentricRotation = propagation.topocentricMatrix(self.latitude, self.longitude)
+
+        self._frame = None
+
+    @property
+    def frame(self):
+        """ Orekit topocentric frame of the station, created on first use """
+        if self._frame is None:
+            from org.orekit.bodies import GeodeticPoint
+            from org.orekit.frames import TopocentricFrame
+
+            context = getContext()
+            self.geodeticPoint = GeodeticPoint(self.latitude, self.longitude, self.altitude)
+            self._frame = TopocentricFrame(context.earth, self.geodeticPoint, self.name)
+        return self._frame
 
 
 class SimpleDownlinkChannel:
@@ -181,14 +394,26 @@ class SimpleDownlinkChannel:
         Instance of the GroundStation class.
     date_range: Date range
         List containing start and end date for downlink channel
+    cache: EphemerisCache, optional
+        Persistent cache of the channel parameters (see ephemcache.py), used
+        for the 'tle' and 'keplerian' orbits.
+    metrics: ChannelMetrics, optional
+        Timers and counters of the computations (see instrumentation.py). By
+        default, the metrics active for the process.
     """
 
-    def __init__(self, sat, gs):
+    def __init__(self, sat, gs, cache=None, metrics=None):
         self.satellite = sat
         self.groundStation = gs
+        self.cache = cache
+        self._metrics = metrics
         # self.timeList = timeList
 
-    def calculateChannelParameters(self, timeList):
+    @property
+    def metrics(self):
+        return activeMetrics() if self._metrics is None else self._metrics
+
+    def calculateChannelParameters(self, timeList, bulk=False, frameTolerance=None):
         """ Calculate channel paramters
 
         This function calculates the parameters of the channels for the times
@@ -197,7 +422,26 @@ class SimpleDownlinkChannel:
         Parameters
         ----------
         timeList : li
-            List of times at which to calculate satellite parameters.
+            List of times at which to calculate satellite parameters, or a
+            TimeGrid (see timegrid.py).
+        bulk : bool
+            Only used for the 'tle' and 'keplerian' orbits with the 'orekit'
+            backend (the 'numpy' backend always works in bulk). If True, the
+            satellite position is propagated directly in the topocentric frame
+            of the ground station, so that a single frame transform is built
+            per epoch, and range and elevation are computed from it with NumPy
+            (see _bulkChannelParameters). The results agree with the default
+            per-sample computation within 1e-6 m in length and 1e-9 degrees in
+            elevation (tests/test_model.py, run when the Orekit data are
+            available, see orekitcontext.py).
+        frameTolerance : float, optional
+            Only used for the 'tle' and 'keplerian' orbits with the 'orekit'
+            backend. If given, the propagator frame -> ITRF rotation is
+            evaluated by Orekit on coarse nodes only and interpolated for all
+            the epochs (see frameinterp.py), with an error below
+            frameTolerance [rad] (frameinterp.frameInterpolationError is
+            raised if it cannot be reached). The achieved error is stored in
+            self.frameInterpolationError.
 
         Returns
         -------
@@ -207,63 +451,243 @@ class SimpleDownlinkChannel:
             - length [m]
             - elevation [degrees]
         """
-        print(f"isTlE: {self.satellite.isTLE()}")
-        print(f"isKeplerian: {self.satellite.isKeplerian()}")
+        metrics = self.metrics
+        metrics.count('samples', len(timeList))
+        logger.debug("channel parameters: '%s' orbit, '%s' backend, %d samples, station %s",
+                     self.satellite.simType, self.satellite.backend, len(timeList), self.groundStation.name)
 
         if self.satellite.isPolOrbPass():
             # calculate the orbit parameters using the [Moll et al.] model.
-            psi = self.groundStation.latitude
+            with metrics.stage('timeGrid'):
+                relTime = relativeTime(timeList)
+            with metrics.stage('propagation'):
+                channelLength, elevation = polOrbPassParameters(
+                    relTime, self.groundStation.latitude, self.satellite.incAngle, self.satellite.satAlt)
+
+        elif self.satellite.isTLE() or self.satellite.isKeplerian():
+            if self.cache is not None:
+                hits, misses = self.cache.hits, self.cache.misses
+                channelLength, elevation = self.cache.channelParameters(self, timeList, bulk, frameTolerance)
+                metrics.count('cacheHits', self.cache.hits - hits)
+                metrics.count('cacheMisses', self.cache.misses - misses)
+            else:
+                channelLength, elevation = self._orbitChannelParameters(timeList, bulk, frameTolerance)
+
+        # Extracting positive angles
+        #index = np.where(elevation>0)
+
+        return (channelLength, elevation, timeList )
+
+    def streamChannelParameters(self, start, stop, step=1., chunkSize=10000, minElevation=None,
+                                bulk=False, frameTolerance=None):
+        """ Calculate the channel parameters chunk by chunk
+
+        Generator version of calculateChannelParameters for long horizons:
+        the time grid, the channel parameters (and, with the 'orekit' backend,
+        the AbsoluteDate objects) only exist one chunk at a time, so that the
+        memory use does not depend on the length of the horizon.
 
-            deltaI = self.satellite.incAngle
-            hs = self.satellite.satAlt
+        Parameters
+        ----------
+        start, stop : tuple or datetime
+            Start and end of the horizon (see timeChunks).
+        step : float
+            Time step [s].
+        chunkSize : int
+            Number of time samples computed at once.
+        minElevation : float, optional
+            If given, the samples with an elevation below minElevation
+            [degrees] are dropped from the yielded chunks (which can then be
+            empty).
+        bulk, frameTolerance :
+            See calculateChannelParameters.
+
+        Yields
+        ------
+        tuple (TimeGrid, np.array, np.array)
+            - times of the chunk
+            - length [m]
+            - elevation [degrees]
+        """
+        if self.satellite.isPolOrbPass():
+            # the satellite culminates at the middle of the whole horizon
+            begin, stepNs, nSamples = _uniformGrid(start, stop, step)
+            culmination = np.datetime64(begin + (nSamples // 2) * stepNs, 'ns')
 
-            deltaMin = np.arccos(np.cos(psi) * np.cos(deltaI) / np.sqrt(1 - (np.cos(psi) * np.sin(deltaI)) ** 2))
-            tMin = timeList[int(len(timeList) / 2)]
+        for times in timeChunks(start, stop, step, chunkSize):
+            if self.satellite.isPolOrbPass():
+                relTime = (propagation.asDatetime64(times) - culmination) / np.timedelta64(1, 's')
+                channelLength, elevation = polOrbPassParameters(
+                    relTime, self.groundStation.latitude, self.satellite.incAngle, self.satellite.satAlt)
+            else:
+                channelLength, elevation, _ = self.calculateChannelParameters(times, bulk, frameTolerance)
 
-            # Earth parameters (from Daniele's code)
-            Rt = 6.37e6  # Earth radius
-            M = 5.97e24  # Earth mass
-            G = 6.67e-11  # Gravitational constant
+            if minElevation is not None:
+                visible = elevation >= minElevation
+                times, channelLength, elevation = times[visible], channelLength[visible], elevation[visible]
 
-            Omega = np.sqrt(G * M / (Rt + hs) ** 3)
+            yield (times, channelLength, elevation)
 
-            relTime = np.array([(timeList[i] - tMin).total_seconds() for i in range(len(timeList))])
-            delta = Omega * relTime + deltaMin
+    def _orbitChannelParameters(self, timeList, bulk=False, frameTolerance=None):
+        """ Channel parameters for the 'tle' and 'keplerian' orbits
 
-            Zc = np.arccos(np.sin(psi) * np.sin(delta) + np.cos(psi) * np.cos(delta) * np.cos(deltaI))
-            Z = np.arcsin((Rt + hs) * np.sin(Zc) / np.sqrt(Rt ** 2 + (Rt + hs) ** 2 - 2 * Rt * (Rt + hs) * np.cos(Zc)))
-            elevation = 90 - np.rad2deg(Z)
+        Parameters
+        ----------
+        timeList : list
+            List of times at which to calculate satellite parameters.
+        bulk : bool
+            Use the bulk Orekit computation (see calculateChannelParameters).
+        frameTolerance : float, optional
+            Interpolate the frame rotation (see calculateChannelParameters).
 
-            channelLength = -Rt * np.cos(Z) + np.sqrt((Rt * np.cos(Z)) ** 2 + 2 * Rt * hs + hs ** 2)
+        Returns
+        -------
+        tuple (np.array, np.array)
+            - length [m]
+            - elevation [degrees]
+        """
+        metrics = self.metrics
 
+        if self.satellite.isNumpyBackend():
+            # propagate the whole time list at once with the numpy backend
+            elements = self.satellite.elements
+            with metrics.stage('propagation'):
+                position = elements.propagate(timeList)
+            with metrics.stage('frameTransform'):
+                position = elements.toItrf(position, timeList, self.satellite.dut1)[0]
+            with metrics.stage('elevation'):
+                channelLength, elevation = propagation.rangeElevation(
+                    position, self.groundStation.itrfPosition, self.groundStation.topocentricRotation)
 
-        elif self.satellite.isTLE() or self.satellite.isKeplerian():
-            channelLength = np.zeros((len(timeList),))
-            elevation = np.zeros((len(timeList),))
+        elif frameTolerance is not None:
+            channelLength, elevation = self._interpolatedChannelParameters(timeList, frameTolerance)
+
+        elif bulk:
+            channelLength, elevation = self._bulkChannelParameters(timeList)
+
+        else:
+            inertialFrame = getContext().inertialFrame
+            n = len(timeList)
+
+            channelLength = np.zeros((n,))
+            elevation = np.zeros((n,))
 
             # calculate the orbit parameters using the TLE
-            absDateList = [datetime_to_absolutedate(i) for i in timeList]
+            with metrics.stage('timeGrid'):
+                absDateList = absoluteDateList(timeList, metrics)
+
+            with metrics.stage('propagation'):
+                pvList = [self.satellite.propagator.getPVCoordinates(absDate, inertialFrame)
+                          for absDate in absDateList]
+            metrics.count('jvmCalls', n)
+
+            with metrics.stage('frameTransform'):
+                for i in range(n):
+                    frameTrans = inertialFrame.getStaticTransformTo(self.groundStation.frame, absDateList[i])
+                    channelLength[i] = frameTrans.transformPosition(pvList[i].getPosition()).getNorm()
+            # getStaticTransformTo, getPosition, transformPosition, getNorm
+            metrics.count('jvmCalls', 4 * n)
+
+            with metrics.stage('elevation'):
+                for i in range(n):
+                    elevation[i] = np.rad2deg(
+                        self.groundStation.frame.getElevation(pvList[i].getPosition(), inertialFrame, absDateList[i]))
+            # getPosition, getElevation
+            metrics.count('jvmCalls', 2 * n)
+
+        return (channelLength, elevation)
+
+    def _bulkChannelParameters(self, timeList):
+        """ Bulk channel parameters for the Orekit propagators
+
+        The satellite position is requested directly in the topocentric frame
+        of the ground station: Orekit then builds one transform per epoch
+        (propagator frame -> topocentric) instead of the three transforms of
+        the per-sample loop (propagator frame -> EME2000, EME2000 ->
+        topocentric for the range, and again for the elevation).
+        The elevation is the latitude of the topocentric position, which is
+        what TopocentricFrame.getElevation computes internally.
 
-            for i in range(len(absDateList)):
-                pv = self.satellite.propagator.getPVCoordinates(absDateList[i], inertialFrame)
-                pos_tmp = pv.getPosition()
+        Parameters
+        ----------
+        timeList : list
+            List of times at which to calculate satellite parameters.
 
-                frameTrans = inertialFrame.getStaticTransformTo(self.groundStation.frame, absDateList[i])
+        Returns
+        -------
+        tuple (np.array, np.array)
+            - length [m]
+            - elevation [degrees]
+        """
+        metrics = self.metrics
+        with metrics.stage('timeGrid'):
+            absDateList = absoluteDateList(timeList, metrics)
 
-                channelLength[i] = frameTrans.transformPosition(pos_tmp).getNorm()
+        propagator = self.satellite.propagator
+        frame = self.groundStation.frame
 
+        # propagation and transform to the topocentric frame in one call
+        topoPosition = np.zeros((len(absDateList), 3))
+        with metrics.stage('propagation'):
+            for i, absDate in enumerate(absDateList):
+                topoPosition[i] = list(propagator.getPVCoordinates(absDate, frame).getPosition().toArray())
+        # getPVCoordinates, getPosition, toArray
+        metrics.count('jvmCalls', 3 * len(absDateList))
 
-                elevation[i] = np.rad2deg(
-                    self.groundStation.frame.getElevation(pv.getPosition(), inertialFrame, absDateList[i]))
+        with metrics.stage('elevation'):
+            channelLength, elevation = propagation.topocentricRangeElevation(topoPosition)
 
-        # Extracting positive angles
-        #index = np.where(elevation>0)
+        return (channelLength, elevation)
 
-        return (channelLength, elevation, timeList )
+
+    def _interpolatedChannelParameters(self, timeList, frameTolerance):
+        """ Channel parameters with an interpolated Earth orientation
+
+        The satellite is propagated in the frame of its propagator (TEME for
+        the TLEs, the orbit frame for the Keplerian elements), which requires
+        no frame transform. The rotation from this frame to ITRF is evaluated
+        on coarse nodes and interpolated (frameinterp.InterpolatedRotation),
+        and the ITRF -> topocentric conversion is done with NumPy.
+
+        Parameters
+        ----------
+        timeList : list
+            List of times at which to calculate satellite parameters.
+        frameTolerance : float
+            Maximum error of the interpolated rotation [rad].
+
+        Returns
+        -------
+        tuple (np.array, np.array)
+            - length [m]
+            - elevation [degrees]
+        """
+        from frameinterp import InterpolatedRotation, orekitQuaternions
+
+        metrics = self.metrics
+        with metrics.stage('timeGrid'):
+            absDateList = absoluteDateList(timeList, metrics)
+            times = propagation.asDatetime64(timeList).astype(np.int64)
+        propagator = self.satellite.propagator
+
+        position = np.zeros((len(absDateList), 3))
+        with metrics.stage('propagation'):
+            for i, absDate in enumerate(absDateList):
+                position[i] = list(propagator.propagate(absDate).getPVCoordinates().getPosition().toArray())
+        # propagate, getPVCoordinates, getPosition, toArray per sample, and getFrame
+        metrics.count('jvmCalls', 4 * len(absDateList) + 1)
+
+        exactQuaternions = orekitQuaternions(propagator.getFrame(), getContext().ITRF, metrics)
+
+        with metrics.stage('frameTransform'):
+            rotation = InterpolatedRotation(times.min(), times.max(), exactQuaternions, tolerance=frameTolerance)
+            position = rotation.apply(times, position)
+        self.frameInterpolationError = rotation.maxError
+
+        with metrics.stage('elevation'):
+            return propagation.rangeElevation(position, self.groundStation.itrfPosition,
+                                              self.groundStation.topocentricRotation)
 
 
     def end_to_end(self, DT, DR, wl, transmittance_atm, channel_distance, r0):
-        theta_diff =  2.44 * wl / DT
-        theta_atm = 2.1 * wl / r0
-        return transmittance_atm /( (channel_distance**2) * (theta_atm**2 + theta_diff**2) )* (
-                DR**2)
\ No newline at end of file
+        return end_to_end(DT, DR, wl, transmittance_atm, channel_distance, r0)
\ No newline at end of file
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lazy Orekit context.
+
+The Orekit JVM, the Orekit data and the reference frames are created on first
+use, not when model.py is imported, so that code paths which do not need
+Orekit (polOrbPass, numpy backend, transmittance, ...) never pay the JVM
+startup. The context never downloads anything: the Orekit data must already be
+available locally, as a zip file or a directory, at the path given by (in
+order of priority):
+    * configure(dataPath=...) or initWorker(dataPath=...)
+    * the OREKIT_DATA environment variable
+    * 'orekit-data.zip' in the current working directory
+
+One context exists per process. In a process pool, use initWorker as the pool
+initializer so that each worker starts its own JVM once; the JVM does not
+survive a fork, so the parent must not initialize the context before forking
+(or the pool must use the 'spawn' / 'forkserver' start methods).
+"""
+import os
+import threading
+
+
+DEFAULT_DATA_PATH = 'orekit-data.zip'
+
+
+class orekitContextError(Exception):
+    pass
+
+
+class OrekitContext:
+    """ Orekit context
+
+    This class holds the Orekit VM, the location of the Orekit data and the
+    objects shared by all the channels: the ITRF and EME2000 frames and the
+    WGS84 Earth ellipsoid.
+
+    Parameters
+    ----------
+    dataPath: str
+        Path to the Orekit data (zip file or directory).
+    """
+
+    def __init__(self, dataPath=None):
+        if dataPath is None:
+            dataPath = os.environ.get('OREKIT_DATA', DEFAULT_DATA_PATH)
+        self.dataPath = os.path.abspath(dataPath)
+        self.pid = os.getpid()
+
+        if not os.path.exists(self.dataPath):
+            raise orekitContextError(
+                f"Orekit data not found at '{self.dataPath}'. Download it once with "
+                "orekit.pyhelpers.download_orekit_data_curdir() and/or set OREKIT_DATA.")
+
+        import orekit
+        self.vm = orekit.getVMEnv() or orekit.initVM()
+
+        from orekit.pyhelpers import setup_orekit_curdir
+        setup_orekit_curdir(filename=self.dataPath)
+
+        from org.orekit.frames import FramesFactory
+        from org.orekit.bodies import OneAxisEllipsoid
+        from org.orekit.utils import IERSConventions, Constants
+
+        # time and space reference systems
+        self.ITRF = FramesFactory.getITRF(IERSConventions.IERS_2010, True)
+        self.earth = OneAxisEllipsoid(Constants.WGS84_EARTH_EQUATORIAL_RADIUS,
+                                      Constants.WGS84_EARTH_FLATTENING, self.ITRF)
+        self.inertialFrame = FramesFactory.getEME2000()
+
+    def attachCurrentThread(self):
+        """ Attach the calling thread to the JVM (required by JCC for any
+        thread other than the one that started the VM) """
+        self.vm.attachCurrentThread()
+
+
+_context = None
+_dataPath = None
+_lock = threading.Lock()
+
+
+def configure(dataPath):
+    """ Set the Orekit data path used when the context is created """
+    global _dataPath
+    with _lock:
+        if _context is not None and _context.dataPath != os.path.abspath(dataPath):
+            raise orekitContextError("the Orekit context is already initialized with another data path")
+        _dataPath = dataPath
+
+
+def getContext():
+    """ Return the Orekit context of the process, creating it on first use """
+    global _context
+    with _lock:
+        if _context is None:
+            _context = OrekitContext(_dataPath)
+        elif _context.pid != os.getpid():
+            raise orekitContextError(
+                "the Orekit context was initialized before forking: initialize it in the workers only "
+                "(see initWorker) or use the 'spawn' start method")
+
+    if threading.current_thread() is not threading.main_thread():
+        _context.attachCurrentThread()
+
+    return _context
+
+
+def isInitialized():
+    """ True if the Orekit context of the process has been created """
+    return _context is not None and _context.pid == os.getpid()
+
+
+def initWorker(dataPath=None):
+    """ Process pool initializer: create the Orekit context of the worker """
+    if dataPath is not None:
+        configure(dataPath)
+    getContext()
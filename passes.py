@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pass detection for SimpleDownlinkChannel.
+
+Instead of evaluating the channel on a dense uniform grid over the whole time
+span, the passes of the satellite over the ground station are found with a
+coarse scan of the elevation followed by a root-finding on the elevation (or
+on the atmospheric transmittance) to get the acquisition (AOS) and loss of
+signal (LOS) times, and by a maximization to get the culmination. The channel
+can then be sampled densely only inside the passes with samplePasses.
+
+All the refinements are vectorized over the passes: each iteration evaluates
+the channel once, at one epoch per pass. The refinements bypass the
+ephemeris cache of the channel (see ephemcache.py): their epochs are scattered
+and never requested again, and storing them would rewrite the cache entry at
+every iteration. Only the coarse scan goes through the cache.
+"""
+import numpy as np
+import pandas as pd
+
+from model import orbitModelError
+from timegrid import toDatetime64
+
+
+# inverse of the golden ratio, for the culmination search
+_INV_PHI = (np.sqrt(5) - 1) / 2
+
+
+class Pass:
+    """ Satellite pass over a ground station
+
+    Parameters
+    ----------
+    aos: pd.Timestamp
+        Acquisition of signal, when the visibility condition starts to hold.
+    los: pd.Timestamp
+        Loss of signal, when the visibility condition stops holding.
+    culmination: pd.Timestamp
+        Time of the maximum elevation.
+    maxElevation: float
+        Maximum elevation of the pass [degrees].
+    """
+
+    def __init__(self, aos, los, culmination, maxElevation):
+        self.aos = aos
+        self.los = los
+        self.culmination = culmination
+        self.maxElevation = maxElevation
+
+    @property
+    def duration(self):
+        """ Duration of the pass [s] """
+        return (self.los - self.aos).total_seconds()
+
+    def __repr__(self):
+        return (f"Pass(aos={self.aos}, los={self.los}, culmination={self.culmination}, "
+                f"maxElevation={self.maxElevation:.2f})")
+
+
+def _elevation(channel, times):
+    """ Elevation [degrees] at the times given as int64 nanoseconds """
+    return channel.calculateChannelParameters(pd.to_datetime(times), bulk=True)[1]
+
+
+def _refinedElevation(channel, times):
+    """ Elevation [degrees] at the times given as int64 nanoseconds, without
+    the ephemeris cache """
+    channel.metrics.count('samples', len(times))
+    return channel._orbitChannelParameters(pd.to_datetime(times), bulk=True)[1]
+
+
+def findPasses(channel, start, stop, coarseStep=60., minElevation=0., transmittance=None,
+               minTransmittance=None, tolerance=1e-3):
+    """ Find the passes of the satellite over the ground station
+
+    Parameters
+    ----------
+    channel: SimpleDownlinkChannel
+        Channel between a 'tle' or 'keplerian' satellite and a ground station.
+    start, stop: tuple or datetime
+        Start and end of the search, either as datetime or as the tuples used
+        by timelistgen.
+    coarseStep: float
+        Step of the coarse scan [s]. It must be shorter than the shortest pass
+        to be detected (passes whose visibility lasts less than coarseStep may
+        be missed).
+    minElevation: float
+        Minimum elevation defining the visibility [degrees].
+    transmittance: callable, optional
+        Function giving the atmospheric transmittance from an array of
+        elevations [degrees], assumed increasing with the elevation.
+    minTransmittance: float, optional
+        If given with transmittance, the passes are the windows where the
+        transmittance is above minTransmittance (and the elevation above
+        minElevation).
+    tolerance: float
+        Accuracy of the AOS, LOS and culmination times [s].
+
+    Returns
+    -------
+    list of Pass
+        Passes sorted by AOS. Passes in progress at start (stop) have their
+        AOS (LOS) clipped to start (stop).
+    """
+    if not (channel.satellite.isTLE() or channel.satellite.isKeplerian()):
+        raise orbitModelError("pass detection requires a 'tle' or 'keplerian' satellite")
+
+    begin, end = (int(toDatetime64(t).astype(np.int64)) for t in (start, stop))
+    step = int(coarseStep * 1e9)
+
+    def elevationMargin(elevation):
+        value = elevation - minElevation
+        if transmittance is not None and minTransmittance is not None:
+            value = np.minimum(value, transmittance(elevation) - minTransmittance)
+        return value
+
+    def margin(times):
+        return elevationMargin(_refinedElevation(channel, times))
+
+    # coarse scan
+    times = np.append(np.arange(begin, end, step, dtype=np.int64), np.int64(end))
+    elevation = _elevation(channel, times)
+    visible = elevationMargin(elevation) > 0
+
+    edges = np.diff(visible.astype(np.int8))
+    rising = np.nonzero(edges == 1)[0]
+    setting = np.nonzero(edges == -1)[0]
+
+    # refine the crossings by bisection, all the brackets at once
+    aos = _bisect(margin, times[rising], times[rising + 1], tolerance, increasing=True)
+    los = _bisect(margin, times[setting], times[setting + 1], tolerance, increasing=False)
+
+    if visible[0]:
+        aos = np.insert(aos, 0, times[0])
+    if visible[-1]:
+        los = np.append(los, times[-1])
+
+    if len(aos) == 0:
+        return []
+
+    culmination, maxElevation = _culminations(channel, times, elevation, aos, los, tolerance)
+
+    return [Pass(pd.Timestamp(a), pd.Timestamp(l), pd.Timestamp(c), float(m))
+            for a, l, c, m in zip(aos, los, culmination, maxElevation)]
+
+
+def _bisect(margin, lo, hi, tolerance, increasing):
+    """ Vectorized bisection of the sign change of margin in [lo, hi] [ns] """
+    lo = lo.copy()
+    hi = hi.copy()
+    while len(lo) and np.max(hi - lo) > tolerance * 1e9:
+        mid = lo + (hi - lo) // 2
+        above = margin(mid) > 0
+        # the crossing lies before mid if mid is already on the final side
+        before = above if increasing else ~above
+        hi = np.where(before, mid, hi)
+        lo = np.where(before, lo, mid)
+    return hi if increasing else lo
+
+
+def _culminations(channel, times, elevation, aos, los, tolerance):
+    """ Golden-section search of the maximum elevation in each [aos, los] """
+    # bracket the maximum around the best coarse sample of each pass
+    lo = np.empty(len(aos))
+    hi = np.empty(len(los))
+    for k, (a, l) in enumerate(zip(aos, los)):
+        inside = np.nonzero((times >= a) & (times <= l))[0]
+        if len(inside) == 0:
+            lo[k], hi[k] = a, l
+            continue
+        best = inside[np.argmax(elevation[inside])]
+        lo[k] = max(times[max(best - 1, 0)], a)
+        hi[k] = min(times[min(best + 1, len(times) - 1)], l)
+
+    x1 = hi - _INV_PHI * (hi - lo)
+    x2 = lo + _INV_PHI * (hi - lo)
+    f1 = _refinedElevation(channel, x1.astype(np.int64))
+    f2 = _refinedElevation(channel, x2.astype(np.int64))
+    while np.max(hi - lo) > tolerance * 1e9:
+        # keep the sub-bracket containing the best point, and evaluate a
+        # single new point per pass
+        left = f1 > f2
+        hi = np.where(left, x2, hi)
+        lo = np.where(left, lo, x1)
+        x1, x2 = (np.where(left, hi - _INV_PHI * (hi - lo), x2),
+                  np.where(left, x1, lo + _INV_PHI * (hi - lo)))
+        fNew = _refinedElevation(channel, np.where(left, x1, x2).astype(np.int64))
+        f1, f2 = np.where(left, fNew, f2), np.where(left, f1, fNew)
+
+    culmination = ((lo + hi) / 2).astype(np.int64)
+    return culmination, _refinedElevation(channel, culmination)
+
+
+def passTimeList(passes, step=1.):
+    """ Time list covering only the passes
+
+    Parameters
+    ----------
+    passes: list of Pass
+        Passes, as returned by findPasses.
+    step: float
+        Sampling step inside the passes [s]. Each pass is sampled from AOS to
+        LOS included.
+
+    Returns
+    -------
+    tuple (pd.DatetimeIndex, np.array)
+        - times
+        - index of the pass of each time
+    """
+    chunks = []
+    index = []
+    for k, p in enumerate(passes):
+        times = np.arange(p.aos.value, p.los.value, int(step * 1e9), dtype=np.int64)
+        times = np.append(times, np.int64(p.los.value))
+        chunks.append(times)
+        index.append(np.full(len(times), k))
+
+    if not chunks:
+        return (pd.to_datetime(np.array([], dtype=np.int64)), np.array([], dtype=int))
+
+    return (pd.to_datetime(np.concatenate(chunks)), np.concatenate(index))
+
+
+def samplePasses(channel, passes, step=1.):
+    """ Calculate the channel parameters densely, only inside the passes
+
+    Parameters
+    ----------
+    channel: SimpleDownlinkChannel
+        Channel used to find the passes.
+    passes: list of Pass
+        Passes, as returned by findPasses.
+    step: float
+        Sampling step inside the passes [s].
+
+    Returns
+    -------
+    tuple (np.array, np.array, pd.DatetimeIndex, np.array)
+        - length [m]
+        - elevation [degrees]
+        - times
+        - index of the pass of each sample
+    """
+    timeList, passIndex = passTimeList(passes, step)
+    if len(timeList) == 0:
+        return (np.zeros(0), np.zeros(0), timeList, passIndex)
+
+    channelLength, elevation, timeList = channel.calculateChannelParameters(timeList, bulk=True)
+    return (channelLength, elevation, timeList, passIndex)
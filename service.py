@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local channel-computation service.
+
+Short queries (a few hundred passes from a scheduler or a notebook) are
+dominated by the startup of each script: JVM, Orekit data, frames, TLE
+propagators, transmittance tables. The service is a long-lived asyncio server,
+on a Unix socket or on localhost, which keeps all of them warm:
+    * the Orekit context is created once, at startup;
+    * Satellite, GroundStation and SimpleDownlinkChannel objects are built
+      once per description and reused by the following requests;
+    * the transmittance tables are loaded once per site (siteTransmittance);
+    * recent results are kept in an in-memory LRU, bounded by the size of
+      their arrays, and concurrent identical requests are coalesced: they
+      wait for the same computation.
+The computations run one at a time in a worker thread (the Orekit
+propagators are not thread-safe), so that the event loop keeps accepting and
+coalescing requests meanwhile.
+
+Requests and responses are messages made of a 4-byte (big-endian) length, a
+JSON header and the raw bytes of the NumPy arrays listed in the header. No
+pickle is exchanged, so a client cannot run code in the server; the service
+is still meant for local use only (any local user can connect to a TCP port).
+
+Operations:
+    * 'channel': range and elevation of a satellite over a station at the
+      given times (SimpleDownlinkChannel.calculateChannelParameters)
+    * 'passes': passes of a satellite over a station (passes.findPasses)
+    * 'transmittance': atmospheric transmittance of a site at elevations
+    * 'batch': several 'channel' requests in one message; each of them goes
+      through the LRU and the coalescing on its own
+    * 'stats', 'ping'
+
+Satellites are described as JSON (see describeSatellite) and stations as
+[latitude, longitude, altitude, name]. ChannelClient (synchronous) mirrors
+the channel interface:
+    client = ChannelClient('/tmp/satoptlink.sock')
+    link = client.channel(satellite, groundStation)
+    length, elevation, timeList = link.calculateChannelParameters(timeList)
+    results = client.calculateChannelParametersBatch([(satellite, groundStation, timeList), ...])
+
+Usage:
+    python service.py --socket /tmp/satoptlink.sock
+    python service.py --port 8765 --orekit-data /path/to/orekit-data.zip
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import socket
+import struct
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import orekitcontext
+import propagation
+
+from model import Satellite, GroundStation, SimpleDownlinkChannel
+from passes import Pass, findPasses
+from timegrid import toDatetime64
+from transmittance import siteTransmittance
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+_LENGTH = struct.Struct('>I')
+
+
+class serviceError(Exception):
+    pass
+
+
+# messages
+def encodeMessage(header, arrays=()):
+    """ Message of a JSON header and NumPy arrays, as bytes """
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    header = dict(header, arrays=[(a.dtype.str, a.shape) for a in arrays])
+    text = json.dumps(header).encode()
+    return b''.join([_LENGTH.pack(len(text)), text] + [a.tobytes() for a in arrays])
+
+
+def _arraySizes(header):
+    return [np.dtype(dtype).itemsize * int(np.prod(shape)) for dtype, shape in header['arrays']]
+
+
+def _decodeArrays(header, payloads):
+    return [np.frombuffer(payload, dtype=dtype).reshape(shape)
+            for (dtype, shape), payload in zip(header['arrays'], payloads)]
+
+
+async def readMessage(reader):
+    """ Read a message from an asyncio stream, as (header, arrays) """
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    header = json.loads(await reader.readexactly(length))
+    payloads = [await reader.readexactly(size) for size in _arraySizes(header)]
+    return (header, _decodeArrays(header, payloads))
+
+
+def _receive(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 2 ** 20))
+        if not chunk:
+            raise serviceError("connection closed by the service")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def receiveMessage(sock):
+    """ Read a message from a blocking socket, as (header, arrays) """
+    (length,) = _LENGTH.unpack(_receive(sock, _LENGTH.size))
+    header = json.loads(_receive(sock, length))
+    return (header, _decodeArrays(header, [_receive(sock, size) for size in _arraySizes(header)]))
+
+
+# descriptions
+def describeSatellite(satellite):
+    """ JSON description of a Satellite
+
+    * 'tle': {'tle': [line1, line2], 'backend': ...}
+    * 'keplerian': {'keplerian': [a, e, i, omega, Omega, anomaly, anomalyType,
+      epoch (ISO, UTC), mu], 'backend': ...}; the elements are in EME2000
+    * 'polOrbPass': {'polOrbPass': [incAngle [degrees], satAlt [km]]}
+    With the 'numpy' backend, the description also holds 'dut1': UT1 - UTC
+    [s], or the columns [times (int64 ns), dut1, xp, yp] of a
+    propagation.EopTable.
+    """
+    if satellite.isTLE() or satellite.isKeplerian():
+        description = _describeOrbit(satellite)
+        if satellite.isNumpyBackend():
+            if isinstance(satellite.dut1, propagation.EopTable):
+                table = satellite.dut1
+                description['dut1'] = [table.times.astype(np.int64).tolist()] + [
+                    None if c is None else c.tolist() for c in (table.dut1, table.xp, table.yp)]
+            elif callable(satellite.dut1):
+                raise serviceError("only constant dut1 and EopTable sources can be sent to the service")
+            else:
+                description['dut1'] = float(satellite.dut1)
+        return description
+    if satellite.isPolOrbPass():
+        return {'polOrbPass': [float(np.rad2deg(satellite.incAngle)), satellite.satAlt / 1e3]}
+    raise serviceError("the satellite has no orbit")
+
+
+def _describeOrbit(satellite):
+    if satellite.isTLE():
+        return {'tle': [line.strip() for line in satellite.tleList], 'backend': satellite.backend}
+    else:
+        kepler = list(satellite.keplerList) + [propagation.WGS84_EARTH_MU] * (10 - len(satellite.keplerList))
+        epoch = kepler[8]
+        if not isinstance(epoch, datetime):
+            from orekit.pyhelpers import absolutedate_to_datetime
+            epoch = absolutedate_to_datetime(epoch)
+        return {'keplerian': [float(x) for x in kepler[:6]] + [str(kepler[6]), epoch.isoformat(), float(kepler[9])],
+                'backend': satellite.backend}
+
+
+def describeStation(station):
+    """ JSON description of a GroundStation """
+    return [float(np.rad2deg(station.latitude)), float(np.rad2deg(station.longitude)),
+            float(station.altitude), station.name]
+
+
+def buildSatellite(description):
+    """ Satellite of a description (see describeSatellite) """
+    backend = description.get('backend', 'orekit')
+    dut1 = description.get('dut1', 0.)
+    if isinstance(dut1, list):
+        dut1 = propagation.EopTable(np.array(dut1[0], dtype='datetime64[ns]'), *dut1[1:])
+    if 'tle' in description:
+        return Satellite(tuple(description['tle']), simType='tle', backend=backend, dut1=dut1)
+    if 'keplerian' in description:
+        kepler = list(description['keplerian'])
+        epoch = datetime.fromisoformat(kepler[7])
+        if backend == 'numpy':
+            params = kepler[:6] + [kepler[6], 'EME2000', epoch, kepler[8]]
+        else:
+            orekitcontext.getContext()
+            from org.orekit.frames import FramesFactory
+            from org.orekit.orbits import PositionAngleType
+            from orekit.pyhelpers import datetime_to_absolutedate
+
+            params = kepler[:6] + [PositionAngleType.valueOf(kepler[6]), FramesFactory.getEME2000(),
+                                   datetime_to_absolutedate(epoch), kepler[8]]
+        return Satellite(params, simType='keplerian', backend=backend, dut1=dut1)
+    if 'polOrbPass' in description:
+        incAngle, satAlt = description['polOrbPass']
+        return Satellite(None, simType='polOrbPass', incAngle=incAngle, satAlt=satAlt)
+    raise serviceError(f"invalid satellite description: {description}")
+
+
+class ChannelService:
+    """ Warm channel-computation service
+
+    Parameters
+    ----------
+    dataPath: str, optional
+        Orekit data path (see orekitcontext).
+    directory: str
+        Directory of the transmittance tables (see siteTransmittance).
+    cacheBytes: int
+        Size of the results kept in the LRU [bytes], as the sum of the nbytes
+        of their arrays.
+    ephemerisCache: EphemerisCache, optional
+        Persistent cache of the channels.
+    warm: bool
+        Create the Orekit context at startup.
+    """
+
+    def __init__(self, dataPath=None, directory='.', cacheBytes=2 ** 28, ephemerisCache=None, warm=True):
+        self.dataPath = dataPath
+        self.directory = directory
+        self.cacheBytes = cacheBytes
+        self.ephemerisCache = ephemerisCache
+        self.warm = warm
+
+        self._satellites = {}
+        self._stations = {}
+        self._channels = {}
+        self._results = OrderedDict()
+        self._resultBytes = 0
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='channel')
+        self.statistics = dict(requests=0, batches=0, computed=0, lruHits=0, coalesced=0, errors=0)
+
+    def __repr__(self):
+        return (f"ChannelService({len(self._satellites)} satellites, {len(self._stations)} stations, "
+                f"{len(self._results)} results)")
+
+    # warm objects (worker thread only)
+    def _warmUp(self):
+        if self.dataPath is not None:
+            orekitcontext.configure(self.dataPath)
+        try:
+            orekitcontext.getContext()
+        except (ImportError, orekitcontext.orekitContextError) as error:
+            logger.warning("Orekit not available, only the 'numpy' and 'polOrbPass' models work: %s", error)
+
+    def _channel(self, satellite, station):
+        satKey = json.dumps(satellite, sort_keys=True)
+        gsKey = json.dumps(station)
+        if satKey not in self._satellites:
+            self._satellites[satKey] = buildSatellite(satellite)
+        if gsKey not in self._stations:
+            self._stations[gsKey] = GroundStation(*station)
+        if (satKey, gsKey) not in self._channels:
+            self._channels[(satKey, gsKey)] = SimpleDownlinkChannel(
+                self._satellites[satKey], self._stations[gsKey], cache=self.ephemerisCache)
+        return self._channels[(satKey, gsKey)]
+
+    # operations (worker thread only)
+    def _compute(self, header, arrays):
+        operation = header.get('op')
+        if operation == 'channel':
+            channel = self._channel(header['satellite'], header['station'])
+            timeList = pd.to_datetime(arrays[0])
+            length, elevation, _ = channel.calculateChannelParameters(
+                timeList, bulk=header.get('bulk', False), frameTolerance=header.get('frameTolerance'))
+            return ({}, [np.asarray(length, dtype=float), np.asarray(elevation, dtype=float)])
+
+        if operation == 'passes':
+            channel = self._channel(header['satellite'], header['station'])
+            transmittance = header.get('site')
+            if transmittance is not None:
+                transmittance = siteTransmittance(transmittance, header.get('wavelength'), self.directory)
+            passes = findPasses(channel, pd.Timestamp(header['start']), pd.Timestamp(header['stop']),
+                                header.get('coarseStep', 60.), header.get('minElevation', 0.), transmittance,
+                                header.get('minTransmittance'), header.get('tolerance', 1e-3))
+            times = np.array([(p.aos.value, p.los.value, p.culmination.value) for p in passes],
+                             dtype=np.int64).reshape(-1, 3)
+            return ({}, [times, np.array([p.maxElevation for p in passes], dtype=float)])
+
+        if operation == 'transmittance':
+            table = siteTransmittance(header['site'], header.get('wavelength'), self.directory)
+            return ({}, [np.asarray(table(arrays[0]), dtype=float)])
+
+        raise serviceError(f"unknown operation '{operation}'")
+
+    # request handling
+    @staticmethod
+    def requestKey(header, arrays):
+        """ Hash of a request (header and arrays); a 'channel' request of a
+        batch has the key of the same request sent alone """
+        header = {k: v for k, v in header.items() if k != 'arrays'}
+        digest = hashlib.sha256(json.dumps(header, sort_keys=True).encode())
+        for a in arrays:
+            a = np.ascontiguousarray(a)
+            digest.update(f"{a.dtype.str}{a.shape}".encode())
+            digest.update(a.tobytes())
+        return digest.hexdigest()
+
+    async def handle(self, header, arrays):
+        """ Response (header, arrays) to a request """
+        self.statistics['requests'] += 1
+        operation = header.get('op')
+        if operation == 'ping':
+            return ({'ok': True}, [])
+        if operation == 'stats':
+            return (dict(self.statistics, results=len(self._results), resultBytes=self._resultBytes,
+                         satellites=len(self._satellites), stations=len(self._stations)), [])
+        if operation == 'batch':
+            return await self._batch(header, arrays)
+
+        key = self.requestKey(header, arrays)
+        if key in self._results:
+            self.statistics['lruHits'] += 1
+            self._results.move_to_end(key)
+            return self._results[key]
+        if key in self._pending:
+            self.statistics['coalesced'] += 1
+            return await asyncio.shield(self._pending[key])
+
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._compute, header, arrays)
+        self._pending[key] = future
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            del self._pending[key]
+
+        self.statistics['computed'] += 1
+        self._store(key, result)
+        return result
+
+    async def _batch(self, header, arrays):
+        """ 'channel' requests of a batch, as one response with the length
+        and elevation arrays of every request, in order """
+        requests = header.get('requests', [])
+        if len(requests) != len(arrays):
+            raise serviceError(f"batch of {len(requests)} requests with {len(arrays)} time arrays")
+        self.statistics['batches'] += 1
+        results = await asyncio.gather(*(self.handle(dict(request, op='channel'), [times])
+                                         for request, times in zip(requests, arrays)))
+        return ({}, [a for _, channelArrays in results for a in channelArrays])
+
+    def _store(self, key, result):
+        size = sum(a.nbytes for a in result[1])
+        if size > self.cacheBytes:
+            return
+        self._results[key] = result
+        self._resultBytes += size
+        while self._resultBytes > self.cacheBytes:
+            _, (_, evicted) = self._results.popitem(last=False)
+            self._resultBytes -= sum(a.nbytes for a in evicted)
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    header, arrays = await readMessage(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    response, results = await self.handle(header, arrays)
+                except Exception as error:
+                    self.statistics['errors'] += 1
+                    logger.exception("request '%s' failed", header.get('op'))
+                    response, results = ({'error': f"{type(error).__name__}: {error}"}, [])
+                writer.write(encodeMessage(response, results))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, path=None, host='127.0.0.1', port=DEFAULT_PORT):
+        """ Serve forever on the Unix socket path, or on host:port """
+        if self.warm:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._warmUp)
+        if path is not None:
+            server = await asyncio.start_unix_server(self._connection, path)
+            logger.info("channel service listening on %s", path)
+        else:
+            server = await asyncio.start_server(self._connection, host, port)
+            logger.info("channel service listening on %s:%d", host, port)
+        async with server:
+            await server.serve_forever()
+
+
+class ChannelClient:
+    """ Synchronous client of a ChannelService
+
+    Parameters
+    ----------
+    path: str, optional
+        Unix socket of the service.
+    host, port:
+        TCP address of the service, if path is not given.
+    timeout: float, optional
+        Timeout of the requests [s].
+    """
+
+    def __init__(self, path=None, host='127.0.0.1', port=DEFAULT_PORT, timeout=None):
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port), timeout)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, header, arrays=()):
+        """ Send a request and return the response (header, arrays) """
+        self.sock.sendall(encodeMessage(header, arrays))
+        response, results = receiveMessage(self.sock)
+        if 'error' in response:
+            raise serviceError(response['error'])
+        return (response, results)
+
+    def ping(self):
+        return self.request({'op': 'ping'})[0].get('ok', False)
+
+    def stats(self):
+        """ Counters of the service """
+        response, _ = self.request({'op': 'stats'})
+        del response['arrays']
+        return response
+
+    def channel(self, satellite, groundStation):
+        """ RemoteChannel between a Satellite and a GroundStation """
+        return RemoteChannel(self, satellite, groundStation)
+
+    def calculateChannelParameters(self, satellite, groundStation, timeList, bulk=False, frameTolerance=None):
+        """ Range [m] and elevation [degrees] at the times of timeList """
+        header = {'op': 'channel', 'satellite': _description(satellite, describeSatellite),
+                  'station': _description(groundStation, describeStation), 'bulk': bulk,
+                  'frameTolerance': frameTolerance}
+        _, (length, elevation) = self.request(header, [propagation.asDatetime64(timeList).astype(np.int64)])
+        return (length, elevation)
+
+    def calculateChannelParametersBatch(self, requests, bulk=False, frameTolerance=None):
+        """ Range [m] and elevation [degrees] of several channels, in one message
+
+        Parameters
+        ----------
+        requests: list of tuple
+            (satellite, groundStation, timeList) of each channel; satellite and
+            groundStation may be descriptions.
+        bulk, frameTolerance:
+            See SimpleDownlinkChannel.calculateChannelParameters.
+
+        Returns
+        -------
+        list of tuple (np.array, np.array)
+            Length [m] and elevation [degrees] of each request.
+        """
+        header = {'op': 'batch', 'requests': [
+            {'satellite': _description(satellite, describeSatellite),
+             'station': _description(groundStation, describeStation), 'bulk': bulk,
+             'frameTolerance': frameTolerance} for satellite, groundStation, _ in requests]}
+        _, results = self.request(header, [propagation.asDatetime64(timeList).astype(np.int64)
+                                           for _, _, timeList in requests])
+        return list(zip(results[0::2], results[1::2]))
+
+    def findPasses(self, satellite, groundStation, start, stop, coarseStep=60., minElevation=0., site=None,
+                   wavelength=None, minTransmittance=None, tolerance=1e-3):
+        """ Passes of a satellite over a station (see passes.findPasses); the
+        transmittance is the table of site """
+        header = {'op': 'passes', 'satellite': _description(satellite, describeSatellite),
+                  'station': _description(groundStation, describeStation),
+                  'start': _isoformat(start), 'stop': _isoformat(stop), 'coarseStep': coarseStep,
+                  'minElevation': minElevation, 'site': site, 'wavelength': wavelength,
+                  'minTransmittance': minTransmittance, 'tolerance': tolerance}
+        _, (times, maxElevation) = self.request(header)
+        return [Pass(*(pd.Timestamp(int(t)) for t in row), float(e)) for row, e in zip(times, maxElevation)]
+
+    def transmittance(self, site, elevation, wavelength=None):
+        """ Atmospheric transmittance of a site at elevations [degrees] """
+        header = {'op': 'transmittance', 'site': site, 'wavelength': wavelength}
+        _, (values,) = self.request(header, [np.asarray(elevation, dtype=float)])
+        return values
+
+
+class RemoteChannel:
+    """ SimpleDownlinkChannel computed by a ChannelService
+
+    Parameters
+    ----------
+    client: ChannelClient
+        Client of the service.
+    satellite: Satellite or dict
+        Satellite, or its description.
+    groundStation: GroundStation or list
+        Ground station, or its description.
+    """
+
+    def __init__(self, client, satellite, groundStation):
+        self.client = client
+        self.satellite = _description(satellite, describeSatellite)
+        self.groundStation = _description(groundStation, describeStation)
+
+    def calculateChannelParameters(self, timeList, bulk=False, frameTolerance=None):
+        """ See SimpleDownlinkChannel.calculateChannelParameters """
+        length, elevation = self.client.calculateChannelParameters(self.satellite, self.groundStation, timeList,
+                                                                   bulk, frameTolerance)
+        return (length, elevation, timeList)
+
+
+def _description(obj, describe):
+    return obj if isinstance(obj, (dict, list, tuple)) else describe(obj)
+
+
+def _isoformat(date):
+    return pd.Timestamp(toDatetime64(date)).isoformat()
+
+
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--socket', help="Unix socket of the service")
+    parser.add_argument('--host', default='127.0.0.1', help="TCP host (without --socket)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="TCP port (without --socket)")
+    parser.add_argument('--orekit-data', help="Orekit data path")
+    parser.add_argument('--directory', default='.', help="directory of the transmittance tables")
+    parser.add_argument('--cache-mb', type=float, default=256., help="size of the results kept in memory [MiB]")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parseArguments()
+    logging.basicConfig(level=logging.INFO)
+    service = ChannelService(args.orekit_data, args.directory, int(args.cache_mb * 2 ** 20))
+    asyncio.run(service.serve(args.socket, args.host, args.port))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Link-budget sweeps.
+
+linkBudgetSweep evaluates the end-to-end transmittance (model.end_to_end) for
+grids of telescope diameters, wavelengths and Fried parameters against the
+range and atmospheric transmittance time series of one or several passes.
+The (configuration x time) cube is never materialized: it is computed in
+chunks of bounded size and reduced on the fly to per-configuration (and
+per-pass) quantities.
+
+Available reductions:
+    * 'mean', 'min', 'max': statistics of the end-to-end transmittance over
+      the samples;
+    * 'integral': time integral of the transmittance [s], with the trapezoidal
+      rule on the (possibly non-uniform) time grid of each pass;
+    * 'photons': number of received photons, repRate * 'integral'.
+"""
+import numpy as np
+
+import propagation
+
+from model import end_to_end
+
+
+reductionsAllowed = ('mean', 'min', 'max', 'integral', 'photons')
+
+
+def trapezoidWeights(timeList, passIndex):
+    """ Trapezoidal integration weights [s] of each sample within its pass """
+    t = propagation.asDatetime64(timeList).astype(np.int64) / 1e9
+    weights = np.zeros(len(t))
+    if len(t) < 2:
+        return weights
+    dt = np.diff(t)
+    samePass = passIndex[1:] == passIndex[:-1]
+    half = np.where(samePass, dt / 2, 0.)
+    weights[1:] += half
+    weights[:-1] += half
+    return weights
+
+
+def linkBudgetSweep(channelLength, transmittanceAtm, DT, DR, wl, r0, timeList=None, passIndex=None,
+                    reductions=('mean',), repRate=1., chunkBytes=2 ** 26):
+    """ End-to-end transmittance reductions over a grid of link parameters
+
+    Parameters
+    ----------
+    channelLength : np.array
+        Length of the channel [m], of shape (n_time,).
+    transmittanceAtm : np.array
+        Atmospheric transmittance, of shape (n_time,) or, when it depends on
+        the configuration (e.g. on the wavelength), broadcastable to
+        config_shape + (n_time,).
+    DT, DR, wl, r0 : float or np.array
+        Transmitter and receiver diameters [m], wavelength [m] and Fried
+        parameter [m]. They broadcast against each other to config_shape.
+    timeList : list, optional
+        Times of the samples, required by the 'integral' and 'photons'
+        reductions.
+    passIndex : np.array, optional
+        Index of the pass of each sample (see passes.samplePasses); the
+        reductions are then computed per pass.
+    reductions : tuple of str
+        Reductions to compute, among reductionsAllowed.
+    repRate : float
+        Photon emission rate of the source [1/s], for 'photons'.
+    chunkBytes : int
+        Approximate size of the cube chunks evaluated at once [bytes].
+
+    Returns
+    -------
+    dict
+        For each reduction, an array of shape config_shape + (n_pass,), or
+        config_shape without passIndex.
+    """
+    for name in reductions:
+        if name not in reductionsAllowed:
+            raise ValueError(f"unknown reduction '{name}'")
+
+    channelLength = np.asarray(channelLength, dtype=float)
+    nTime = len(channelLength)
+    configShape = np.broadcast_shapes(np.shape(DT), np.shape(DR), np.shape(wl), np.shape(r0),
+                                      np.shape(transmittanceAtm)[:-1])
+    nConfig = int(np.prod(configShape))
+    DT, DR, wl, r0 = (np.broadcast_to(x, configShape).ravel() for x in (DT, DR, wl, r0))
+    transmittanceAtm = np.broadcast_to(transmittanceAtm, configShape + (nTime,))
+
+    grouped = passIndex is not None
+    if passIndex is None:
+        passIndex = np.zeros(nTime, dtype=int)
+    passIndex = np.asarray(passIndex)
+    nPass = int(passIndex.max()) + 1 if nTime else 0
+
+    needIntegral = 'integral' in reductions or 'photons' in reductions
+    if needIntegral:
+        if timeList is None:
+            raise ValueError("the 'integral' and 'photons' reductions require the timeList")
+        weights = trapezoidWeights(timeList, passIndex)
+
+    # accumulators
+    total = np.zeros((nConfig, nPass))
+    integral = np.zeros((nConfig, nPass))
+    minimum = np.full((nConfig, nPass), np.inf)
+    maximum = np.full((nConfig, nPass), -np.inf)
+    count = np.bincount(passIndex, minlength=nPass)
+
+    # chunk sizes: configurations x times of about chunkBytes
+    timeChunk = max(1, min(nTime, chunkBytes // 8))
+    configChunk = max(1, min(nConfig, chunkBytes // (8 * timeChunk)))
+
+    for c0 in range(0, nConfig, configChunk):
+        c1 = min(c0 + configChunk, nConfig)
+        configs = np.arange(c0, c1)
+        configIndex = np.unravel_index(configs, configShape) if configShape else ()
+        params = [x[configs, None] for x in (DT, DR, wl, r0)]
+
+        for t0 in range(0, nTime, timeChunk):
+            t1 = min(t0 + timeChunk, nTime)
+            atm = np.broadcast_to(transmittanceAtm[configIndex + (slice(t0, t1),)], (len(configs), t1 - t0))
+            cube = end_to_end(params[0], params[1], params[2], atm, channelLength[None, t0:t1], params[3])
+
+            # reduce the contiguous runs of each pass in the chunk
+            ids = passIndex[t0:t1]
+            starts = np.concatenate(([0], np.nonzero(np.diff(ids))[0] + 1))
+            runIds = ids[starts]
+            np.add.at(total[c0:c1].T, runIds, np.add.reduceat(cube, starts, axis=1).T)
+            np.minimum.at(minimum[c0:c1].T, runIds, np.minimum.reduceat(cube, starts, axis=1).T)
+            np.maximum.at(maximum[c0:c1].T, runIds, np.maximum.reduceat(cube, starts, axis=1).T)
+            if needIntegral:
+                np.add.at(integral[c0:c1].T, runIds, np.add.reduceat(cube * weights[t0:t1], starts, axis=1).T)
+
+    results = {}
+    for name in reductions:
+        if name == 'mean':
+            value = total / np.maximum(count, 1)
+        elif name == 'min':
+            value = minimum
+        elif name == 'max':
+            value = maximum
+        elif name == 'integral':
+            value = integral
+        else:
+            value = repRate * integral
+        value = value.reshape(configShape + (nPass,))
+        results[name] = value if grouped else value[..., 0]
+
+    return results
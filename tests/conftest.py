@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TLE = ("1 41731U 16051A   24016.15735159  .00011450  00000-0  34540-3 0  9998",
+       "2 41731  97.3167 289.0989 0012522  59.2544 300.9930 15.34373256413200")
+
+
+@pytest.fixture(scope='session')
+def orekitContext():
+    """ Orekit context, or skip if Orekit or its data are not available """
+    orekitcontext = pytest.importorskip('orekitcontext')
+    pytest.importorskip('orekit')
+    try:
+        return orekitcontext.getContext()
+    except orekitcontext.orekitContextError as error:
+        pytest.skip(str(error))
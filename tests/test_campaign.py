@@ -0,0 +1,57 @@
+from datetime import datetime
+from math import radians
+
+import pytest
+
+import model
+from campaign import Campaign
+from conftest import TLE
+
+
+KEPLER = [6872181.5, 0.00132, radians(97.3699), radians(178.5836), radians(267.45), radians(246.0824),
+          'TRUE', 'EME2000', datetime(2024, 1, 16), 3.986004418e14]
+STATIONS = [model.GroundStation(48.8566, 2.3522, 80, "Paris"), model.GroundStation(-33.8688, 151.2093, 50, "Sydney")]
+START = (2024, 1, 16)
+STOP = (2024, 1, 19)
+
+
+@pytest.fixture(scope='module')
+def reference():
+    return _run(3 * 86400., 1)
+
+
+def _run(sliceLength, processes):
+    satellites = [model.Satellite(TLE, simType='tle', backend='numpy'),
+                  model.Satellite(KEPLER, simType='keplerian', backend='numpy')]
+    campaign = Campaign(satellites, STATIONS, START, STOP, sliceLength=sliceLength, minElevation=10.)
+    return campaign.run(processes=processes)
+
+
+@pytest.mark.parametrize('sliceLength, processes', [(3 * 86400., 2), (86400., 1), (0.7 * 86400., 2),
+                                                    (5000., 1)])
+def test_slicing_and_processes(reference, sliceLength, processes):
+    for expected, stats in zip(reference, _run(sliceLength, processes)):
+        assert expected.passes > 0
+        assert stats.passes == expected.passes
+        assert stats.passesPerSatellite == expected.passesPerSatellite
+        assert stats.nightPasses == expected.nightPasses
+        # AOS and LOS within the pass tolerance (1 ms) of the unsliced search
+        assert stats.contactTime == pytest.approx(expected.contactTime, abs=2e-3 * stats.passes)
+        assert stats.maxElevationHistogram.sum() == expected.maxElevationHistogram.sum()
+
+
+def test_statistics_match_find_passes(reference):
+    from passes import findPasses
+
+    for gs, stats in zip(STATIONS, reference):
+        contactTime = 0.
+        passes = 0
+        for sat in (model.Satellite(TLE, simType='tle', backend='numpy'),
+                    model.Satellite(KEPLER, simType='keplerian', backend='numpy')):
+            found = findPasses(model.SimpleDownlinkChannel(sat, gs), START, STOP, minElevation=10.)
+            passes += len(found)
+            contactTime += sum(p.duration for p in found)
+        assert stats.passes == passes
+        # Pass.duration has a microsecond resolution
+        assert stats.contactTime == pytest.approx(contactTime, abs=1e-6 * passes)
+        assert sum(stats.passesPerNight()) <= passes
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from catalog import TLECatalog, catalogError, parseCatalogNumber
+from conftest import TLE
+
+
+def _elementSet(number, day):
+    """ TLE with the catalog number field number and the epoch 24<day> """
+    epoch = f"24{day:012.8f}"
+    return (TLE[0][:2] + number + TLE[0][7:18] + epoch + TLE[0][32:], TLE[1][:2] + number + TLE[1][7:])
+
+
+def _catalog(tmp_path=None):
+    sets = [_elementSet(n, d) for n, d in (('41731', 16.5), ('41731', 14.), ('41731', 18.), ('00005', 10.),
+                                           ('A0001', 16.), ('Z9999', 20.), ('41731', 16.5))]
+    path = tmp_path / 'catalog.tle'
+    with open(path, 'w') as f:
+        for k, (line1, line2) in enumerate(sets):
+            f.write(f"OBJECT {k}\n{line1}\n{line2}\n")
+    return TLECatalog.fromFiles(str(path))
+
+
+def test_alpha5_and_duplicates(tmp_path):
+    catalog = _catalog(tmp_path)
+    assert parseCatalogNumber('A0001') == 100001
+    assert parseCatalogNumber('Z9999') == 339999
+    np.testing.assert_array_equal(catalog.numbers, [5, 41731, 100001, 339999])
+    # the duplicated (41731, day 16.5) element set is kept once
+    assert len(catalog) == 6
+    expected = pd.to_datetime(['2024-01-14 00:00', '2024-01-16 12:00', '2024-01-18 00:00'])
+    np.testing.assert_array_equal(catalog.epochs(41731), expected)
+    with pytest.raises(catalogError):
+        catalog.nearest([41731, 12345], pd.Timestamp('2024-01-15'))
+
+
+# epochs of 41731: 2024-01-14, 2024-01-16 12:00 and 2024-01-18 (ties go to the earlier one)
+@pytest.mark.parametrize('time, day', [('2024-01-01', 14.), ('2024-01-15 06:00', 14.), ('2024-01-15 06:01', 16.5),
+                                       ('2024-01-16 12:00', 16.5), ('2024-01-17 06:00', 16.5),
+                                       ('2024-01-17 06:01', 18.), ('2024-02-01', 18.)])
+def test_nearest_at_the_boundaries(tmp_path, time, day):
+    catalog = _catalog(tmp_path)
+    (line1, _), = catalog.elementSets([41731], pd.Timestamp(time))
+    assert line1[18:32] == f"24{day:012.8f}"
+
+
+def test_save_load_round_trip(tmp_path):
+    catalog = _catalog(tmp_path)
+    catalog.save(tmp_path / 'store')
+    loaded = TLECatalog.load(tmp_path / 'store')
+    assert isinstance(loaded.line1, np.memmap)
+    for name in ('catalogNumber', 'epoch', 'line1', 'line2'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(catalog, name))
+    time = pd.Timestamp('2024-01-16')
+    assert loaded.elementSets([5, 41731, 100001], time) == catalog.elementSets([5, 41731, 100001], time)
+
+
+def test_satellites_are_bounded(tmp_path):
+    catalog = _catalog(tmp_path)
+    catalog.maxSatellites = 2
+    first = catalog.satellites([41731, 100001], pd.Timestamp('2024-01-14'), backend='numpy')
+    assert catalog.satellites([41731, 100001], pd.Timestamp('2024-01-14'), backend='numpy') == first
+
+    chunks = list(catalog.satelliteChunks([5, 41731, 100001], (2024, 1, 13), (2024, 1, 19), step=3600.,
+                                          chunkSize=24, backend='numpy'))
+    assert len(chunks) == 7
+    # a call keeps its own satellites, then the cache is trimmed to them
+    assert len(catalog._satellites) == 3
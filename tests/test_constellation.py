@@ -0,0 +1,40 @@
+from datetime import datetime
+from math import radians
+
+import numpy as np
+
+import model
+from conftest import TLE
+from constellation import MultiLinkChannel
+from ephemcache import EphemerisCache
+
+
+KEPLER = [6872181.5, 0.00132, radians(97.3699), radians(178.5836), radians(267.45), radians(246.0824),
+          'TRUE', 'EME2000', datetime(2024, 1, 23, 22), 3.986004418e14]
+STATIONS = [model.GroundStation(48.8566, 2.3522, 80, "Paris"), model.GroundStation(43.6274, 7.2991, 1200, "Nice"),
+            model.GroundStation(-33.8688, 151.2093, 50, "Sydney")]
+
+
+def _satellites():
+    return [model.Satellite(TLE, simType='tle', backend='numpy'),
+            model.Satellite(KEPLER, simType='keplerian', backend='numpy'),
+            model.Satellite(TLE, simType='tle', backend='numpy', dut1=0.3)]
+
+
+def test_matches_simple_downlink_channels(tmp_path):
+    timeList = model.timelistgen((2024, 1, 23, 23), (2024, 1, 24, 5), 2000)
+    satellites = _satellites()
+
+    length, elevation, _ = MultiLinkChannel(satellites, STATIONS).calculateChannelParameters(timeList)
+    assert length.shape == elevation.shape == (3, 3, 2000)
+    for i, sat in enumerate(satellites):
+        for j, gs in enumerate(STATIONS):
+            expectedLength, expectedElevation, _ = model.SimpleDownlinkChannel(sat, gs).calculateChannelParameters(
+                timeList)
+            np.testing.assert_allclose(length[i, j], expectedLength, rtol=1e-12)
+            np.testing.assert_allclose(elevation[i, j], expectedElevation, rtol=0, atol=1e-9)
+
+    # the cached positions give the same channels
+    cached = MultiLinkChannel(satellites, STATIONS, EphemerisCache(str(tmp_path)))
+    for _ in range(2):
+        np.testing.assert_allclose(cached.calculateChannelParameters(timeList)[0], length, rtol=1e-12)
@@ -0,0 +1,82 @@
+from datetime import datetime
+from math import radians
+
+import numpy as np
+import pytest
+
+import model
+from conftest import TLE
+from coverage import CoverageMap, coverageMap
+
+
+LATITUDES = np.array([30., 48.8566, 65.])
+LONGITUDES = np.array([-20., 2.3522, 25.])
+ALTITUDE = 80.
+
+
+@pytest.fixture(scope='module')
+def satellites():
+    kepler = [6872181.5, 0.00132, radians(97.3699), radians(178.5836), radians(267.45), radians(100.),
+              'TRUE', 'EME2000', datetime(2024, 1, 23, 22), 3.986004418e14]
+    return [model.Satellite(TLE, simType='tle', backend='numpy'),
+            model.Satellite(kepler, simType='keplerian', backend='numpy')]
+
+
+def _reference(satellites, timeList, latitude, longitude, minElevation, transmittance, link, repRate):
+    """ Statistics of one site from the per-satellite SimpleDownlinkChannel """
+    seconds = (np.asarray(timeList, dtype='datetime64[ns]') - np.datetime64(timeList[0], 'ns')) / np.timedelta64(1, 's')
+    weights = np.zeros(len(seconds))
+    weights[1:] += np.diff(seconds) / 2
+    weights[:-1] += np.diff(seconds) / 2
+
+    station = model.GroundStation(latitude, longitude, ALTITUDE, "site")
+    elevations, photons = [], np.zeros(len(timeList))
+    for satellite in satellites:
+        length, elevation, _ = model.SimpleDownlinkChannel(satellite, station).calculateChannelParameters(timeList)
+        visible = elevation >= minElevation
+        DT, DR, wl, r0 = link
+        value = repRate * model.end_to_end(DT, DR, wl, transmittance(elevation), length, r0)
+        photons += np.where(visible, value, 0.)
+        elevations.append(elevation)
+    elevations = np.array(elevations)
+    contact = (elevations >= minElevation).any(0)
+    return elevations.max(), (contact * weights).sum(), (photons * weights).sum()
+
+
+@pytest.mark.parametrize('chunkBytes', [2 ** 26, 50000])
+def test_matches_simple_downlink_channel(satellites, chunkBytes):
+    timeList = model.timelistgen((2024, 1, 23, 22), (2024, 1, 24, 4), 2000)
+
+    def transmittance(elevation):
+        return np.sin(np.radians(np.clip(elevation, 0., 90.))) ** 0.3
+
+    DT, DR, wl, r0, repRate = 0.3, 0.8, 810e-9, 0.1, 1e6
+    minElevation = 10.
+    result = coverageMap(satellites, timeList, LATITUDES, LONGITUDES, ALTITUDE, minElevation, transmittance,
+                         DT, DR, wl, r0, repRate, chunkBytes=chunkBytes)
+    assert result.maxElevation.shape == result.contactTime.shape == result.throughput.shape == (3, 3)
+    assert result.duration == pytest.approx(6 * 3600)
+    assert result.contactTime.max() > 0
+
+    for i, j in np.ndindex(3, 3):
+        maxElevation, contactTime, throughput = _reference(satellites, timeList, LATITUDES[i], LONGITUDES[j],
+                                                           minElevation, transmittance, (DT, DR, wl, r0), repRate)
+        assert result.maxElevation[i, j] == pytest.approx(maxElevation, abs=1e-9)
+        assert result.contactTime[i, j] == pytest.approx(contactTime, rel=1e-9)
+        assert result.throughput[i, j] == pytest.approx(throughput, rel=1e-9, abs=1e-12)
+
+
+def test_save_load_round_trip(satellites, tmp_path):
+    timeList = model.timelistgen((2024, 1, 23, 22), (2024, 1, 23, 23), 100)
+    for transmittance in (None, np.cos):
+        result = coverageMap(satellites, timeList, LATITUDES, LONGITUDES, ALTITUDE, transmittance=transmittance)
+        path = str(tmp_path / 'map.npz')
+        result.save(path)
+        loaded = CoverageMap.load(path)
+        for quantity in CoverageMap.quantities:
+            expected = getattr(result, quantity)
+            if expected is None:
+                assert getattr(loaded, quantity) is None
+            else:
+                np.testing.assert_array_equal(getattr(loaded, quantity), expected)
+        assert loaded.duration == result.duration
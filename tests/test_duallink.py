@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model
+import transmittance
+from conftest import TLE
+from duallink import DualDownlink, coincidentPasses
+from passes import Pass
+from transmittance import TransmittanceTable, transmittanceTableError
+
+
+PARIS = model.GroundStation(48.8566, 2.3522, 80, "Paris")
+NICE = model.GroundStation(43.6274, 7.2991, 1200, "Nice")
+
+
+@pytest.fixture
+def satellite(monkeypatch):
+    # the site tables are read from the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(transmittance.__file__)))
+    return model.Satellite(TLE, simType='tle', backend='numpy')
+
+
+def test_site_tables_at_the_channel_wavelength(satellite):
+    link = DualDownlink(satellite, PARIS, NICE, 0.3, 0.8, 1550e-9, 1.5, 1e6)
+    np.testing.assert_array_equal(link.transmittanceA.axes['wavelength'], [1550.])
+
+    # the bundled Paris and Nice tables have no 810 nm data
+    with pytest.raises(transmittanceTableError):
+        DualDownlink(satellite, PARIS, NICE, 0.3, 0.8, 810e-9, 1.5, 1e6)
+
+
+def test_explicit_tables_are_checked(satellite):
+    table = TransmittanceTable({'zenith': [0., 90.], 'wavelength': [810., 1550.]}, np.array([[0.9, 0.8], [0., 0.]]))
+    link = DualDownlink(satellite, PARIS, NICE, 0.3, 0.8, 1550e-9, 1.5, 1e6, table, lambda elevation: 0.5)
+    np.testing.assert_allclose(link.transmittanceA(90.), 0.8)
+    assert link.transmittanceB(90.) == 0.5
+
+    withoutAxis = TransmittanceTable({'zenith': [0., 90.]}, np.array([0.9, 0.]))
+    with pytest.raises(transmittanceTableError):
+        DualDownlink(satellite, PARIS, NICE, 0.3, 0.8, 1550e-9, 1.5, 1e6, withoutAxis, table)
+
+
+def test_coincident_passes():
+    def p(aos, los):
+        aos, los = pd.Timestamp(aos, unit='s'), pd.Timestamp(los, unit='s')
+        return Pass(aos, los, aos, 10.)
+
+    windows = coincidentPasses([p(0, 100), p(200, 300)], [p(50, 250), p(260, 400)])
+    assert [(w.aos.timestamp(), w.los.timestamp()) for w in windows] == [(50, 100), (200, 250), (260, 300)]
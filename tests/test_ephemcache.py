@@ -0,0 +1,86 @@
+import json
+import types
+
+import numpy as np
+import pandas as pd
+
+import model
+from conftest import TLE
+from ephemcache import EphemerisCache
+
+
+class ModeChannel:
+    """ Channel whose parameters reveal the computation mode """
+
+    def __init__(self):
+        self.satellite = model.Satellite(TLE, simType='tle', backend='numpy')
+        # the mode only matters for the 'orekit' backend
+        self.satellite.backend = 'orekit'
+        self.groundStation = types.SimpleNamespace(latitude=0.85, longitude=0.04, altitude=80.)
+
+    def _orbitChannelParameters(self, timeList, bulk, frameTolerance):
+        n = len(timeList)
+        return (np.full(n, 1. if bulk else 0.), np.full(n, frameTolerance or 0.))
+
+
+def test_channel_key_depends_on_mode(tmp_path):
+    cache = EphemerisCache(str(tmp_path))
+    channel = ModeChannel()
+    times = pd.date_range('2024-01-16', periods=10, freq='s')
+
+    length, elevation = cache.channelParameters(channel, times, bulk=False, frameTolerance=1e-9)
+    assert np.all(length == 0.) and np.all(elevation == 1e-9)
+
+    # other modes are computed, not read from the entry of the first one
+    length, _ = cache.channelParameters(channel, times, bulk=True, frameTolerance=1e-9)
+    assert np.all(length == 1.)
+    _, elevation = cache.channelParameters(channel, times, bulk=False, frameTolerance=None)
+    assert np.all(elevation == 0.)
+    assert cache.hits == 0
+
+    # same mode: read back
+    length, elevation = cache.channelParameters(channel, times, bulk=False, frameTolerance=1e-9)
+    assert np.all(length == 0.) and np.all(elevation == 1e-9)
+    assert cache.hits == len(times)
+
+
+def test_numpy_backend_ignores_mode(tmp_path):
+    cache = EphemerisCache(str(tmp_path))
+    channel = model.SimpleDownlinkChannel(model.Satellite(TLE, simType='tle', backend='numpy'),
+                                          model.GroundStation(48.8566, 2.3522, 80, "Paris"), cache=cache)
+    times = pd.date_range('2024-01-16', periods=10, freq='min')
+    reference = channel.calculateChannelParameters(times)
+    cached = channel.calculateChannelParameters(times, bulk=True, frameTolerance=1e-9)
+    assert cache.hits == len(times)
+    np.testing.assert_array_equal(reference[0], cached[0])
+
+
+def test_hits_do_not_rewrite_the_index(tmp_path):
+    times = pd.date_range('2024-01-16', periods=100, freq='s')
+    values = np.arange(300.).reshape(100, 3)
+
+    def compute(subTimeList):
+        return values[times.get_indexer(subTimeList)]
+
+    entryBytes = times.values.nbytes + values.nbytes
+    cache = EphemerisCache(str(tmp_path), maxBytes=2 * entryBytes)
+    cache.fetch('a', times, compute)
+    cache.fetch('b', times, compute)
+    indexPath = tmp_path / 'index.json'
+    stored = indexPath.read_text()
+
+    for _ in range(10):
+        np.testing.assert_array_equal(cache.fetch('a', times, compute), values)
+    assert cache.hits == 10 * len(times)
+    assert indexPath.read_text() == stored
+
+    # the in-memory access times drive the eviction: 'b' is now the least recently used
+    cache.fetch('c', times, compute)
+    assert sorted(json.loads(indexPath.read_text())) == ['a', 'c']
+
+    # flush writes the access times of the hits
+    with cache:
+        cache.fetch('a', times, compute)
+        assert indexPath.read_text() != json.dumps(cache._index)
+    assert json.loads(indexPath.read_text()) == cache._index
+    assert sorted(EphemerisCache(str(tmp_path))._index) == ['a', 'c']
@@ -0,0 +1,72 @@
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+
+import model
+from fading import FadingEngine, FadingModel
+
+
+LINK = (0.3, 0.8, 810e-9, 0.1)  # DT, DR, wl, r0
+SIGMA_I2 = 0.2
+
+
+def _engine(fadingModel, processes=1, samples=2 * 10 ** 5):
+    return FadingEngine(fadingModel, elevationBins=[0., 45., 90.], rangeBins=[5e5, 1e6, 2e6], samples=samples,
+                        chunkSize=2 ** 15, seed=3, processes=processes)
+
+
+def test_without_fading_the_samples_are_end_to_end():
+    fadingModel = FadingModel(*LINK)
+    expected = model.end_to_end(*LINK[:3], 1., 8e5, LINK[3])
+    assert fadingModel.mean(60., 8e5) == pytest.approx(expected)
+    np.testing.assert_allclose(fadingModel.sample(60., 8e5, 100, np.random.default_rng(0)), expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('jitter, wander, scintillation', [(2e-6, 0., 0.), (0., 0.5, 0.), (0., 0., SIGMA_I2),
+                                                           (2e-6, 0.5, SIGMA_I2)])
+def test_sample_mean_matches_mean(jitter, wander, scintillation):
+    fadingModel = FadingModel(*LINK, jitter, wander, scintillation)
+    samples = fadingModel.sample(50., 8e5, 10 ** 6, np.random.default_rng(1))
+    # within 5 standard errors
+    assert abs(samples.mean() - fadingModel.mean(50., 8e5)) < 5 * samples.std() / np.sqrt(len(samples))
+
+
+def test_distributions_do_not_depend_on_the_processes():
+    fadingModel = FadingModel(*LINK, 2e-6, 0.5, SIGMA_I2)
+    elevation, length = np.array([20., 70., 70.]), np.array([1.5e6, 6e5, 1.2e6])
+    serial, parallel = _engine(fadingModel, 1), _engine(fadingModel, 2)
+    parallel.prepare(elevation[::-1], length[::-1])
+    for e, l in zip(elevation, length):
+        np.testing.assert_array_equal(serial.distribution(e, l).counts, parallel.distribution(e, l).counts)
+        assert serial.distribution(e, l).total == pytest.approx(parallel.distribution(e, l).total, rel=1e-12)
+
+
+def test_log_normal_closed_form():
+    # scintillation only: the normalized transmittance is log-normal
+    fadingModel = FadingModel(*LINK, scintillation=lambda elevation: np.full(np.shape(elevation), SIGMA_I2))
+    engine = _engine(fadingModel)
+    elevation, length = np.array([30., 80.]), np.array([1.5e6, 7e5])
+    mean = fadingModel.mean(elevation, length)
+    sigma = np.sqrt(np.log1p(SIGMA_I2))
+    normal = NormalDist(-sigma ** 2 / 2, sigma)
+
+    for p in (0.01, 0.1, 0.5, 0.9):
+        expected = mean * np.exp(normal.inv_cdf(p))
+        np.testing.assert_allclose(engine.quantile(elevation, length, p), expected, rtol=0.02)
+        np.testing.assert_allclose(engine.outageProbability(elevation, length, expected), p, atol=0.005)
+
+    draws = engine.sample(elevation, length, 10 ** 4, rng=0)
+    np.testing.assert_allclose(draws.mean(1), mean, rtol=0.02)
+
+
+def test_save_load(tmp_path):
+    engine = _engine(FadingModel(*LINK, 2e-6, 0.5, SIGMA_I2), samples=10 ** 4)
+    engine.prepare([20., 70.], [1.5e6, 6e5])
+    engine.save(tmp_path / 'fading.npz')
+
+    loaded = _engine(engine.model, samples=10 ** 4)
+    loaded.load(tmp_path / 'fading.npz')
+    np.testing.assert_array_equal(loaded.distribution(20., 1.5e6).counts, engine.distribution(20., 1.5e6).counts)
+    with pytest.raises(ValueError):
+        _engine(engine.model, samples=10 ** 5).load(tmp_path / 'fading.npz')
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import model
+from conftest import TLE
+from frameinterp import InterpolatedRotation, frameInterpolationError, quaternionMatrix, rotationAngle
+
+
+EARTH_RATE = 7.2921150e-5  # [rad/s]
+START = np.datetime64('2024-01-23T23:00', 'ns').astype(np.int64)
+STOP = np.datetime64('2024-01-24T01:00', 'ns').astype(np.int64)
+
+
+def _product(a, b):
+    a0, a1, a2, a3 = np.moveaxis(a, -1, 0)
+    b0, b1, b2, b3 = np.moveaxis(b, -1, 0)
+    return np.stack((a0 * b0 - a1 * b1 - a2 * b2 - a3 * b3, a0 * b1 + a1 * b0 + a2 * b3 - a3 * b2,
+                     a0 * b2 - a1 * b3 + a2 * b0 + a3 * b1, a0 * b3 + a1 * b2 - a2 * b1 + a3 * b0), -1)
+
+
+def earthQuaternions(times):
+    """ Earth rotation with a slow nutation-like wobble of the axis """
+    t = (np.asarray(times, dtype=np.int64) - START) / 1e9
+    spin = EARTH_RATE * t + 1e-5 * np.sin(2 * np.pi * t / 86400)
+    tilt = 4e-5 * np.sin(2 * np.pi * t / (13.66 * 86400))
+    zero = np.zeros_like(t)
+    qz = np.stack((np.cos(spin / 2), zero, zero, np.sin(spin / 2)), -1)
+    qx = np.stack((np.cos(tilt / 2), np.sin(tilt / 2), zero, zero), -1)
+    return _product(qz, qx)
+
+
+@pytest.mark.parametrize('tolerance', [1e-8, 1e-10, 1e-12])
+def test_interpolation_error_below_tolerance(tolerance):
+    rotation = InterpolatedRotation(START, STOP, earthQuaternions, tolerance=tolerance)
+    assert rotation.maxError <= tolerance
+
+    times = np.sort(np.random.default_rng(0).integers(START, STOP, 20000))
+    assert rotation.validate(times) <= tolerance
+
+    # matrices rotate positions like the exact rotation, within tolerance * |r|
+    positions = np.random.default_rng(1).normal(size=(len(times), 3)) * 7e6
+    exact = np.einsum('nij,nj->ni', quaternionMatrix(earthQuaternions(times)), positions)
+    error = np.linalg.norm(rotation.apply(times, positions) - exact, axis=-1)
+    assert np.all(error <= tolerance * np.linalg.norm(positions, axis=-1) * (1 + 1e-6) + 1e-9)
+
+
+def test_unreachable_tolerance_raises():
+    with pytest.raises(frameInterpolationError):
+        InterpolatedRotation(START, STOP, earthQuaternions, nodeStep=3600., tolerance=1e-12, maxRefinements=1)
+
+
+def test_rotation_angle():
+    q = earthQuaternions(np.array([START, STOP]))
+    assert rotationAngle(q, -q).max() < 1e-12
+    np.testing.assert_allclose(rotationAngle(q[:1], q[1:]), EARTH_RATE * (STOP - START) / 1e9, rtol=1e-3)
+
+
+def test_orekit_interpolated_frames(orekitContext):
+    tolerance = 1e-9
+    timeList = model.timelistgen((2024, 1, 23, 23), (2024, 1, 24, 1), 10 ** 4)
+    channel = model.SimpleDownlinkChannel(model.Satellite(TLE, simType='tle'),
+                                          model.GroundStation(48.8566, 2.3522, 80, "Paris"))
+    length, elevation, _ = channel.calculateChannelParameters(timeList, bulk=True)
+    lengthInterp, elevationInterp, _ = channel.calculateChannelParameters(timeList, frameTolerance=tolerance)
+
+    assert channel.frameInterpolationError <= tolerance
+    # a rotation error eps moves a LEO satellite by at most eps * |r| < 1 cm,
+    # seen under at most eps * |r| / range from the station (range > 400 km)
+    assert np.abs(lengthInterp - length).max() < 1e-2
+    assert np.abs(elevationInterp - elevation).max() < np.degrees(tolerance * 7.2e6 / 4e5)
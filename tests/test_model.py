@@ -0,0 +1,137 @@
+from datetime import datetime
+from math import radians
+
+import numpy as np
+import pytest
+
+import model
+import propagation
+from conftest import TLE
+from instrumentation import ChannelMetrics
+
+
+PARIS = (48.8566, 2.3522, 80, "Paris")
+START = (2024, 1, 23, 23)
+STOP = (2024, 1, 24, 1)
+
+
+@pytest.fixture(scope='module')
+def orekitSatellites(orekitContext):
+    from org.orekit.frames import FramesFactory
+    from org.orekit.orbits import PositionAngleType
+    from orekit.pyhelpers import datetime_to_absolutedate
+
+    kepler = [6872181.5, 0.00132, radians(97.3699), radians(178.5836), radians(267.45), radians(246.0824),
+              PositionAngleType.TRUE, FramesFactory.getEME2000(), datetime_to_absolutedate(datetime(2024, 1, 23, 22)),
+              3.986004418e14]
+    return [model.Satellite(TLE, simType='tle'), model.Satellite(kepler, simType='keplerian')]
+
+
+def test_bulk_matches_per_sample(orekitSatellites):
+    # needs Orekit and its data (orekit-data.zip in the working directory or OREKIT_DATA)
+    timeList = model.timelistgen(START, STOP, 2000)
+    for satellite in orekitSatellites:
+        channel = model.SimpleDownlinkChannel(satellite, model.GroundStation(*PARIS))
+        length, elevation, _ = channel.calculateChannelParameters(timeList)
+        lengthBulk, elevationBulk, _ = channel.calculateChannelParameters(timeList, bulk=True)
+
+        # tolerances stated in the calculateChannelParameters docstring
+        assert np.abs(lengthBulk - length).max() < 1e-6
+        assert np.abs(elevationBulk - elevation).max() < 1e-9
+
+
+def test_jvm_calls_are_counted(orekitSatellites):
+    n = 100
+    timeList = model.timelistgen(START, STOP, n)
+    fractional = np.any(np.asarray(timeList, dtype='datetime64[ns]').astype(np.int64) % 10 ** 9)
+    dates = 1 + n * (2 if fractional else 1)
+
+    for bulk, perSample in ((False, 7), (True, 3)):
+        metrics = ChannelMetrics()
+        channel = model.SimpleDownlinkChannel(orekitSatellites[0], model.GroundStation(*PARIS), metrics=metrics)
+        channel.calculateChannelParameters(timeList, bulk=bulk)
+        assert metrics.counters['jvmCalls'] == dates + perSample * n
+
+
+def test_numpy_backend_makes_no_jvm_calls():
+    metrics = ChannelMetrics()
+    channel = model.SimpleDownlinkChannel(model.Satellite(TLE, simType='tle', backend='numpy'),
+                                          model.GroundStation(*PARIS), metrics=metrics)
+    channel.calculateChannelParameters(model.timelistgen(START, STOP, 100))
+    assert metrics.counters['jvmCalls'] == 0
+    assert metrics.counters['samples'] == 100
+
+
+def _mollReference(timeList, latitude, incAngle, satAlt):
+    """ Scalar polOrbPass model, as in the original per-channel implementation """
+    psi, deltaI, hs = radians(latitude), radians(incAngle), satAlt * 1e3
+    deltaMin = np.arccos(np.cos(psi) * np.cos(deltaI) / np.sqrt(1 - (np.cos(psi) * np.sin(deltaI)) ** 2))
+    tMin = timeList[int(len(timeList) / 2)]
+    Rt, M, G = 6.37e6, 5.97e24, 6.67e-11
+    Omega = np.sqrt(G * M / (Rt + hs) ** 3)
+    relTime = np.array([(t - tMin).total_seconds() for t in timeList])
+    delta = Omega * relTime + deltaMin
+    Zc = np.arccos(np.sin(psi) * np.sin(delta) + np.cos(psi) * np.cos(delta) * np.cos(deltaI))
+    Z = np.arcsin((Rt + hs) * np.sin(Zc) / np.sqrt(Rt ** 2 + (Rt + hs) ** 2 - 2 * Rt * (Rt + hs) * np.cos(Zc)))
+    return (-Rt * np.cos(Z) + np.sqrt((Rt * np.cos(Z)) ** 2 + 2 * Rt * hs + hs ** 2), 90 - np.rad2deg(Z))
+
+
+def test_pol_orb_pass_sweep_matches_scalar_model():
+    timeList = model.timelistgen((2024, 1, 23, 23), (2024, 1, 23, 23, 20), 301)
+    incAngle = np.array([0., 10., 25.])[:, None, None]
+    satAlt = np.array([400., 800.])[None, :, None]
+    latitude = np.array([0., 48.8566, 70.])
+
+    length, elevation, _ = model.polOrbPassSweep(timeList, incAngle, satAlt, latitude)
+    assert length.shape == elevation.shape == (3, 2, 3, 301)
+    for i, j, k in np.ndindex(3, 2, 3):
+        expectedLength, expectedElevation = _mollReference(timeList, latitude[k], incAngle[i, 0, 0], satAlt[0, j, 0])
+        np.testing.assert_allclose(length[i, j, k], expectedLength, rtol=1e-12)
+        np.testing.assert_allclose(elevation[i, j, k], expectedElevation, rtol=0, atol=1e-9)
+
+        # and the channel of one configuration
+        satellite = model.Satellite(None, simType='polOrbPass', incAngle=incAngle[i, 0, 0], satAlt=satAlt[0, j, 0])
+        channel = model.SimpleDownlinkChannel(satellite, model.GroundStation(latitude[k], 0., 0., "site"))
+        np.testing.assert_allclose(channel.calculateChannelParameters(timeList)[0], expectedLength, rtol=1e-12)
+
+
+def _denseGrid(start, stop, step):
+    """ The whole uniform grid of streamChannelParameters, as a list of datetime """
+    times = np.arange(np.datetime64(datetime(*start), 'ns'), np.datetime64(datetime(*stop), 'ns') + 1,
+                      np.timedelta64(int(step * 1e9), 'ns'))
+    return [t.astype('datetime64[us]').item() for t in times]
+
+
+@pytest.mark.parametrize('satellite', [model.Satellite(TLE, simType='tle', backend='numpy'),
+                                       model.Satellite(None, simType='polOrbPass', incAngle=10., satAlt=500.)],
+                         ids=['tle', 'polOrbPass'])
+def test_stream_matches_dense_computation(satellite):
+    channel = model.SimpleDownlinkChannel(satellite, model.GroundStation(*PARIS))
+    timeList = _denseGrid(START, STOP, 7.)
+    length, elevation, _ = channel.calculateChannelParameters(timeList)
+
+    chunks = list(channel.streamChannelParameters(START, STOP, step=7., chunkSize=100))
+    assert len(chunks) == -(-len(timeList) // 100)
+    times = np.concatenate([np.asarray(propagation.asDatetime64(c[0])) for c in chunks])
+    np.testing.assert_array_equal(times, np.array(timeList, dtype='datetime64[ns]'))
+    np.testing.assert_allclose(np.concatenate([c[1] for c in chunks]), length, rtol=1e-12)
+    np.testing.assert_allclose(np.concatenate([c[2] for c in chunks]), elevation, rtol=0, atol=1e-9)
+
+    # the minElevation filter keeps the same samples as the dense computation
+    minElevation = np.percentile(elevation, 75)
+    visible = elevation >= minElevation
+    chunks = list(channel.streamChannelParameters(START, STOP, step=7., chunkSize=100, minElevation=minElevation))
+    times = np.concatenate([np.asarray(propagation.asDatetime64(c[0])) for c in chunks])
+    np.testing.assert_array_equal(times, np.array(timeList, dtype='datetime64[ns]')[visible])
+    np.testing.assert_allclose(np.concatenate([c[1] for c in chunks]), length[visible], rtol=1e-12)
+
+
+def test_numpy_backend_bulk_matches_per_sample():
+    # the numpy backend always works in bulk: bulk=True must not change the results
+    channel = model.SimpleDownlinkChannel(model.Satellite(TLE, simType='tle', backend='numpy'),
+                                          model.GroundStation(*PARIS))
+    timeList = model.timelistgen(START, STOP, 2000)
+    length, elevation, _ = channel.calculateChannelParameters(timeList)
+    lengthBulk, elevationBulk, _ = channel.calculateChannelParameters(timeList, bulk=True)
+    np.testing.assert_array_equal(lengthBulk, length)
+    np.testing.assert_array_equal(elevationBulk, elevation)
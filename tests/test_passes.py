@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import model
+from conftest import TLE
+from ephemcache import EphemerisCache
+from passes import findPasses, samplePasses
+
+
+PARIS = model.GroundStation(48.8566, 2.3522, 80, "Paris")
+START = (2024, 1, 16)
+STOP = (2024, 1, 18)
+
+
+def _channel(cache=None):
+    return model.SimpleDownlinkChannel(model.Satellite(TLE, simType='tle', backend='numpy'), PARIS, cache)
+
+
+def _denseWindows(channel, minElevation):
+    """ Windows above minElevation on a 1 s grid, as (first, last) visible samples """
+    times = pd.date_range(datetime(*START), datetime(*STOP), freq='1s')
+    elevation = channel.calculateChannelParameters(times)[1]
+    visible = np.concatenate(([False], elevation > minElevation, [False]))
+    edges = np.diff(visible.astype(np.int8))
+    first, last = np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0] - 1
+    return [(times[a], times[b], elevation[a:b + 1].max()) for a, b in zip(first, last)]
+
+
+@pytest.mark.parametrize('minElevation', [0., 20.])
+def test_passes_match_dense_scan(minElevation):
+    channel = _channel()
+    passes = findPasses(channel, START, STOP, minElevation=minElevation)
+    dense = _denseWindows(channel, minElevation)
+    assert len(dense) > 0
+    assert len(passes) == len(dense)
+
+    second = pd.Timedelta(seconds=1)
+    for p, (first, last, maxElevation) in zip(passes, dense):
+        # the crossings lie between the last invisible and the first visible dense samples
+        assert first - second <= p.aos <= first
+        assert last <= p.los <= last + second
+        assert p.aos <= p.culmination <= p.los
+        # the refined maximum is at least the dense one, and not far above it
+        assert maxElevation - 1e-9 <= p.maxElevation < maxElevation + 1e-3
+
+
+def test_refinements_bypass_the_cache(tmp_path):
+    cache = EphemerisCache(str(tmp_path))
+    passes = findPasses(_channel(cache), START, STOP, coarseStep=60.)
+    # only the coarse scan (every 60 s, plus the end) is stored
+    assert cache.misses == 2 * 86400 // 60 + 1
+    assert [(p.aos, p.los) for p in passes] == [(p.aos, p.los) for p in findPasses(_channel(), START, STOP)]
+
+
+def test_sample_passes():
+    channel = _channel()
+    passes = findPasses(channel, START, STOP, minElevation=10.)
+    length, elevation, times, index = samplePasses(channel, passes, step=10.)
+    assert len(length) == len(elevation) == len(times) == len(index)
+    assert np.all(elevation >= 10. - 1e-6)
+    np.testing.assert_array_equal(np.unique(index), np.arange(len(passes)))
@@ -0,0 +1,150 @@
+from datetime import datetime
+from math import radians
+
+import numpy as np
+import pytest
+
+import model
+import propagation
+from conftest import TLE
+
+
+KEPLER = [6872181.5, 0.00132, radians(97.3699), radians(178.5836), radians(267.45), radians(246.0824),
+          'TRUE', 'EME2000', datetime(2024, 1, 23, 22), 3.986004418e14]
+PARIS = (48.8566, 2.3522, 80, "Paris")
+
+# dates with large (2016, 2019) and small (2024) UT1 - UTC
+DATES = ('2016-12-20', '2019-06-01', '2024-01-16')
+
+
+@pytest.fixture(scope='module')
+def astropy():
+    """ astropy frames with the IERS data bundled with astropy (no download) """
+    pytest.importorskip('astropy')
+    from astropy.utils import iers
+    iers.conf.auto_download = False
+    import astropy.coordinates
+    return astropy.coordinates
+
+
+def _grid(date, step=900):
+    return np.datetime64(date, 'ns') + np.arange(0, 86400, step).astype('timedelta64[s]')
+
+
+def _positions(n):
+    """ Positions at LEO radius, spread over the sphere [m] """
+    angle = np.linspace(0, 20, n)
+    return 6.9e6 * np.stack((np.cos(angle) * np.cos(angle / 7), np.sin(angle) * np.cos(angle / 7),
+                             np.sin(angle / 7)), -1)
+
+
+def _astropyItrf(astropy, frame, positions, times):
+    from astropy.time import Time
+    import astropy.units as u
+
+    t = Time(times, scale='utc')
+    inertial = getattr(astropy, frame)(astropy.CartesianRepresentation(positions.T * u.m), obstime=t)
+    return inertial.transform_to(astropy.ITRS(obstime=t)).cartesian.xyz.to_value(u.m).T
+
+
+def _eop(date):
+    return propagation.EopTable.fromAstropy(np.datetime64(date) + np.arange(-1, 3).astype('timedelta64[D]'))
+
+
+def test_sgp4_matches_reference():
+    sgp4 = pytest.importorskip('sgp4.api')
+
+    elements = propagation.TLEElements([TLE])
+    times = elements.epoch[0] + np.arange(-86400, 3 * 86400, 300).astype('timedelta64[s]')
+    positions = elements.propagate(times)[0]
+
+    satrec = sgp4.Satrec.twoline2rv(*TLE, sgp4.WGS72)
+    minutes = (times - elements.epoch[0]) / np.timedelta64(1, 'm')
+    reference = np.array([satrec.sgp4_tsince(m)[1] for m in minutes]) * 1e3
+
+    np.testing.assert_allclose(positions, reference, rtol=0, atol=1e-5)
+
+
+@pytest.mark.parametrize('date', DATES)
+@pytest.mark.parametrize('frame, convert, tolerance', [('TEME', propagation.temeToItrf, 1e-3),
+                                                       ('GCRS', propagation.eme2000ToItrf, 2.)])
+def test_itrf_with_eop_table(astropy, date, frame, convert, tolerance):
+    times = _grid(date)
+    positions = _positions(len(times))
+    reference = _astropyItrf(astropy, frame, positions, times)
+
+    error = np.linalg.norm(convert(positions[None], times, _eop(date))[0] - reference, axis=-1)
+    assert error.max() < tolerance
+
+
+@pytest.mark.parametrize('date', DATES)
+def test_itrf_with_dut1(astropy, date):
+    times = _grid(date)
+    positions = _positions(len(times))
+    reference = _astropyItrf(astropy, 'TEME', positions, times)
+    dut1 = _eop(date)(times)
+
+    # polar motion neglected
+    error = np.linalg.norm(propagation.temeToItrf(positions[None], times, dut1)[0] - reference, axis=-1)
+    assert error.max() < 20.
+
+    # without dut1, ~0.5 m per millisecond of UT1 - UTC
+    error = np.linalg.norm(propagation.temeToItrf(positions[None], times)[0] - reference, axis=-1)
+    assert error.max() > 0.4 * abs(dut1).max() * 1e3
+
+
+def test_satellite_passes_dut1_down(astropy):
+    times = _grid('2016-12-20', 60)
+    eop = _eop('2016-12-20')
+    gs = model.GroundStation(*PARIS)
+
+    for params, simType, elementsClass in ((TLE, 'tle', propagation.TLEElements),
+                                           (KEPLER, 'keplerian', propagation.KeplerianElements)):
+        satellite = model.Satellite(params, simType=simType, backend='numpy', dut1=eop)
+        expected = elementsClass([params]).itrfPositions(times, eop)[0]
+        np.testing.assert_array_equal(satellite.itrfPositions(times), expected)
+
+        # channel parameters and constellations use the same positions
+        length, _, _ = model.SimpleDownlinkChannel(satellite, gs).calculateChannelParameters(times)
+        np.testing.assert_allclose(length, np.linalg.norm(expected - gs.itrfPosition, axis=-1), rtol=1e-12)
+        from constellation import MultiLinkChannel
+        other = model.Satellite(params, simType=simType, backend='numpy')
+        positions = MultiLinkChannel([satellite, other], [gs]).satellitePositions(times)
+        np.testing.assert_array_equal(positions[0], expected)
+        assert np.linalg.norm(positions[1] - expected, axis=-1).max() > 50.
+
+
+def test_orekit_backend(orekitContext, astropy):
+    from org.orekit.frames import FramesFactory
+    from org.orekit.orbits import PositionAngleType
+    from orekit.pyhelpers import datetime_to_absolutedate
+
+    keplerOrekit = KEPLER[:6] + [PositionAngleType.TRUE, FramesFactory.getEME2000(),
+                                 datetime_to_absolutedate(KEPLER[8]), KEPLER[9]]
+    times = model.timelistgen((2024, 1, 23, 23), (2024, 1, 24, 1), 2000)
+    eop = _eop('2024-01-23')
+    gs = model.GroundStation(*PARIS)
+
+    for simType, orekitParams, numpyParams in (('tle', TLE, TLE), ('keplerian', keplerOrekit, KEPLER)):
+        reference = model.SimpleDownlinkChannel(model.Satellite(orekitParams, simType=simType), gs)
+        numpy = model.SimpleDownlinkChannel(model.Satellite(numpyParams, simType=simType, backend='numpy',
+                                                            dut1=eop), gs)
+        length, elevation, _ = numpy.calculateChannelParameters(times)
+        lengthOrekit, elevationOrekit, _ = reference.calculateChannelParameters(times)
+        assert np.abs(length - lengthOrekit).max() < 10.
+        assert np.abs(elevation - elevationOrekit).max() < 1e-3
+
+
+def test_topocentric_range_elevation():
+    topo = np.array([[0., 0., 5e5], [3e5, 4e5, 0.], [1e5, 0., 1e5], [0., 2e5, -2e5]])
+    length, elevation = propagation.topocentricRangeElevation(topo)
+    np.testing.assert_allclose(length, [5e5, 5e5, np.sqrt(2) * 1e5, np.sqrt(2) * 2e5], rtol=1e-15)
+    np.testing.assert_allclose(elevation, [90., 0., 45., -45.], rtol=0, atol=1e-12)
+
+    # rangeElevation is the same computation after the ITRF -> topocentric change
+    latitude, longitude = radians(48.8566), radians(2.3522)
+    station = propagation.geodeticToItrf(latitude, longitude, 80.)
+    matrix = propagation.topocentricMatrix(latitude, longitude)
+    length, elevation = propagation.rangeElevation(station + topo @ matrix, station, matrix)
+    np.testing.assert_allclose(length, [5e5, 5e5, np.sqrt(2) * 1e5, np.sqrt(2) * 2e5], rtol=1e-12)
+    np.testing.assert_allclose(elevation, [90., 0., 45., -45.], rtol=0, atol=1e-9)
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import model
+import service
+from conftest import TLE
+
+
+PARIS = (48.8566, 2.3522, 80, "Paris")
+VIENNA = (48.2082, 16.3738, 190, "Vienna")
+START = (2024, 1, 23, 23)
+STOP = (2024, 1, 24, 1)
+
+
+@pytest.fixture
+def server(tmp_path):
+    """ ChannelService (numpy backend only) on a Unix socket, and its socket path """
+    path = str(tmp_path / 'service.sock')
+    channelService = service.ChannelService(warm=False)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(channelService.serve(path))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            service.ChannelClient(path).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+    yield channelService, path
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+
+
+def _satellite():
+    return model.Satellite(TLE, simType='tle', backend='numpy')
+
+
+def test_batch_matches_single_requests(server):
+    channelService, path = server
+    satellite = _satellite()
+    requests = [(satellite, model.GroundStation(*PARIS), model.timelistgen(START, STOP, 500)),
+                (satellite, model.GroundStation(*VIENNA), model.timelistgen(START, STOP, 300))]
+
+    with service.ChannelClient(path) as client:
+        results = client.calculateChannelParametersBatch(requests)
+        assert len(results) == 2
+        for (sat, gs, timeList), (length, elevation) in zip(requests, results):
+            expected, expectedElevation, _ = model.SimpleDownlinkChannel(sat, gs).calculateChannelParameters(timeList)
+            np.testing.assert_allclose(length, expected, rtol=1e-12)
+            np.testing.assert_allclose(elevation, expectedElevation, rtol=1e-12)
+
+        # the requests of the batch are cached as the same requests sent alone
+        client.calculateChannelParameters(*requests[0])
+        stats = client.stats()
+    assert stats['batches'] == 1
+    assert stats['computed'] == 2
+    assert stats['lruHits'] == 1
+
+
+def test_lru_is_bounded_by_bytes(server):
+    channelService, path = server
+    n = 1000
+    entryBytes = 2 * n * 8
+    channelService.cacheBytes = 3 * entryBytes
+    gs = model.GroundStation(*PARIS)
+
+    with service.ChannelClient(path) as client:
+        for hour in range(5):
+            client.calculateChannelParameters(_satellite(), gs, model.timelistgen((2024, 1, 24, hour),
+                                                                                  (2024, 1, 24, hour + 1), n))
+        stats = client.stats()
+        assert stats['results'] == 3
+        assert stats['resultBytes'] == 3 * entryBytes
+
+        # a result larger than the whole cache is not kept
+        client.calculateChannelParameters(_satellite(), gs, model.timelistgen(START, STOP, 4 * n))
+        assert client.stats()['resultBytes'] == 3 * entryBytes
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import model
+from conftest import TLE
+from passes import findPasses, samplePasses
+from sweep import linkBudgetSweep
+
+
+@pytest.fixture(scope='module')
+def passSamples():
+    channel = model.SimpleDownlinkChannel(model.Satellite(TLE, simType='tle', backend='numpy'),
+                                          model.GroundStation(48.8566, 2.3522, 80, "Paris"))
+    passes = findPasses(channel, (2024, 1, 16), (2024, 1, 17), minElevation=10.)
+    length, elevation, times, passIndex = samplePasses(channel, passes, step=7.)
+    return (length, np.sin(np.radians(elevation)) ** 0.3, times, passIndex)
+
+
+@pytest.mark.parametrize('chunkBytes', [2 ** 26, 4096])
+def test_matches_end_to_end_per_pass(passSamples, chunkBytes):
+    length, atmosphere, times, passIndex = passSamples
+    DT = np.array([0.1, 0.3])[:, None, None]
+    wl = np.array([810e-9, 1550e-9])[None, :, None]
+    r0 = np.array([0.05, 0.1, 0.2])
+    DR, repRate = 0.8, 1e6
+
+    results = linkBudgetSweep(length, atmosphere, DT, DR, wl, r0, times, passIndex,
+                              reductions=('mean', 'min', 'max', 'integral', 'photons'), repRate=repRate,
+                              chunkBytes=chunkBytes)
+    nPass = passIndex.max() + 1
+    assert nPass > 1
+    assert results['mean'].shape == (2, 2, 3, nPass)
+
+    seconds = (np.asarray(times, dtype='datetime64[ns]').astype(np.int64) - times[0].value) / 1e9
+    for i, j, k in np.ndindex(2, 2, 3):
+        for p in range(nPass):
+            inPass = passIndex == p
+            transmittance = model.end_to_end(DT[i, 0, 0], DR, wl[0, j, 0], atmosphere[inPass], length[inPass], r0[k])
+            integral = ((transmittance[1:] + transmittance[:-1]) / 2 * np.diff(seconds[inPass])).sum()
+            assert results['mean'][i, j, k, p] == pytest.approx(transmittance.mean(), rel=1e-12)
+            assert results['min'][i, j, k, p] == transmittance.min()
+            assert results['max'][i, j, k, p] == transmittance.max()
+            assert results['integral'][i, j, k, p] == pytest.approx(integral, rel=1e-12)
+            assert results['photons'][i, j, k, p] == pytest.approx(repRate * integral, rel=1e-12)
+
+
+def test_without_passes(passSamples):
+    length, atmosphere, _, _ = passSamples
+    results = linkBudgetSweep(length, atmosphere, [0.1, 0.3], 0.8, 810e-9, 0.1, reductions=('mean', 'max'))
+    for k, DT in enumerate((0.1, 0.3)):
+        transmittance = model.end_to_end(DT, 0.8, 810e-9, atmosphere, length, 0.1)
+        assert results['mean'][k] == pytest.approx(transmittance.mean(), rel=1e-12)
+        assert results['max'][k] == transmittance.max()
+    with pytest.raises(ValueError):
+        linkBudgetSweep(length, atmosphere, 0.1, 0.8, 810e-9, 0.1, reductions=('integral',))
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from timegrid import TimeGrid, toDatetime64
+
+
+EXPECTED = np.datetime64('2024-01-23T23:00:00', 'ns')
+
+
+@pytest.mark.parametrize('date', [(2024, 1, 23, 23), datetime(2024, 1, 23, 23), pd.Timestamp('2024-01-23 23:00'),
+                                  np.datetime64('2024-01-23T23:00'), '2024-01-23T23:00:00'])
+def test_to_datetime64(date):
+    value = toDatetime64(date)
+    assert value == EXPECTED
+    assert value.dtype == np.dtype('datetime64[ns]')
+
+
+def test_linspace_is_exact():
+    grid = TimeGrid.linspace((2024, 1, 23, 23), (2024, 1, 24, 1), 7)
+    assert grid[0] == pd.Timestamp(EXPECTED)
+    assert grid[6] == pd.Timestamp('2024-01-24 01:00')
+    np.testing.assert_array_equal(np.diff(grid.offsets), 1200 * 10 ** 9)
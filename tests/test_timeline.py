@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import model
+from timegrid import TimeGrid
+from timeline import ChannelTimeline
+
+
+START = (2024, 1, 23, 23)
+STOP = (2024, 1, 24, 1)
+ORIGIN = np.datetime64('2024-01-23T23:00', 'ns')
+
+
+def _timeline(timeList):
+    seconds = (np.asarray(timeList, dtype='datetime64[ns]') - ORIGIN) / np.timedelta64(1, 's')
+    return ChannelTimeline(timeList, 1e6 + seconds, np.sin(seconds / 600.), np.cos(seconds / 900.) ** 2,
+                           origin=ORIGIN), seconds
+
+
+def test_timelistgen_grid_is_uniform():
+    timeList = model.timelistgen(START, STOP, 10 ** 5)
+    steps = np.diff(timeList.asi8)
+    assert steps.min() != steps.max()  # rounded to the nanosecond
+
+    timeline, seconds = _timeline(timeList)
+    assert timeline.isUniform
+    assert timeline.step == pytest.approx(7200 / (10 ** 5 - 1), rel=1e-12)
+
+    t = np.random.default_rng(0).uniform(0, 7200, 1000)
+    np.testing.assert_allclose(timeline.lookup(t, 'length'), 1e6 + t, rtol=0, atol=0.2)
+    np.testing.assert_allclose(timeline.lookup(t, 'elevation'),
+                               np.interp(t, seconds, timeline.elevation.astype(float)), atol=1e-6)
+
+
+def test_irregular_grid_is_indexed():
+    offsets = np.cumsum(np.random.default_rng(1).uniform(1, 60, 500)) * 1e9
+    timeList = TimeGrid(ORIGIN, offsets)
+    timeline, seconds = _timeline(timeList)
+    assert not timeline.isUniform
+
+    t = np.linspace(seconds[0], seconds[-1], 3000)
+    for quantity in ('length', 'elevation', 'transmittance'):
+        values = getattr(timeline, quantity).astype(float)
+        np.testing.assert_allclose(timeline.lookup(t, quantity), np.interp(t, seconds, values), rtol=1e-12)
+
+
+@pytest.mark.parametrize('uniform', [True, False])
+def test_outside_and_round_trip(tmp_path, uniform):
+    timeList = model.timelistgen(START, STOP, 101)
+    if not uniform:
+        timeList = timeList.delete(50)
+    timeline, _ = _timeline(timeList)
+    assert timeline.isUniform == uniform
+
+    assert np.isnan(timeline.lookup(-1., 'length'))
+    assert timeline.lookup(7201.) == 0.
+    assert timeline.lookupAt([pd.Timestamp('2024-01-23 23:30')], 'length')[0] == pytest.approx(1e6 + 1800)
+
+    timeline.save(tmp_path / 'timeline.npz')
+    loaded = ChannelTimeline.load(tmp_path / 'timeline.npz')
+    t = np.linspace(-10, 7210, 999)
+    np.testing.assert_array_equal(loaded.lookupAll(t), timeline.lookupAll(t))
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import pytest
+
+import transmittance
+from transmittance import TransmittanceTable, siteTransmittance, transmittanceTableError
+
+
+DIRECTORY = os.path.dirname(os.path.abspath(transmittance.__file__))
+
+
+@pytest.mark.parametrize('site, wavelength', [('Paris', 1550.), ('Nice', 1550.), ('corrected1', 810.)])
+def test_bundled_site_wavelength(site, wavelength):
+    table = siteTransmittance(site, directory=DIRECTORY)
+    np.testing.assert_array_equal(table.axes['wavelength'], [wavelength])
+
+    data = np.genfromtxt(os.path.join(DIRECTORY, f'transmission_data_{site}.csv'), delimiter=',', skip_header=1)
+    np.testing.assert_allclose(siteTransmittance(site, wavelength, DIRECTORY)(90 - data[:, 0]), data[:, 1])
+
+
+def test_site_wavelength_not_on_the_grid():
+    with pytest.raises(transmittanceTableError):
+        siteTransmittance('Paris', 810., DIRECTORY)
+
+
+def test_csv_header_is_not_parsed():
+    path = os.path.join(DIRECTORY, 'transmission_data_Paris.csv')
+    assert 'wavelength' not in TransmittanceTable.fromCsv(path).axes
+    np.testing.assert_array_equal(TransmittanceTable.fromCsv(path, wavelength=1550).axes['wavelength'], [1550.])
+
+
+def test_save_load_round_trip(tmp_path):
+    table = TransmittanceTable({'zenith': [0., 30., 60.], 'wavelength': [810., 1550.]},
+                               np.array([[0.9, 0.8], [0.85, 0.75], [0.6, 0.5]]))
+    table.save(tmp_path / 'table.ttab')
+    loaded = TransmittanceTable.load(tmp_path / 'table.ttab')
+    np.testing.assert_allclose(loaded(75., wavelength=1180.), 0.825, rtol=1e-6)
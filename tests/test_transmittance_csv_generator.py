@@ -0,0 +1,86 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import transmittance_csv_generator as generator
+
+
+ZENITH = np.arange(0, 60.1, 10.)
+
+
+def stubLoopangle(context):
+    """ Stand-in for lowtran.loopangle, a function of every parameter of the cell """
+    zenith = np.radians(context["angle"])
+    value = np.exp(-(0.1 + 1e-4 * context["wlshort"] + 0.01 * context["model"] + 0.001 * context["ihaze"]
+                     - 0.05 * context["h1"]) / np.cos(zenith))
+    return {"transmission": SimpleNamespace(values=value)}
+
+
+def failingLoopangle(context):
+    raise AssertionError(f"cell recomputed: {context}")
+
+
+def _expected(obsalt, wavelength, model, ihaze):
+    return stubLoopangle(generator.lowtranContext(obsalt, wavelength, model, ihaze, ZENITH))["transmission"].values
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_grid_values(tmp_path, processes):
+    table = generator.generateGrid([0, 1.5], [1550, 810], (5, 6), (5,), ZENITH, output=None,
+                                   checkpointDir=str(tmp_path), processes=processes, loopangle=stubLoopangle)
+    assert table.values.shape == (len(ZENITH), 2, 2, 2, 1)
+    np.testing.assert_allclose(table.values[:, 0, 1, 1, 0], _expected(1.5, 810., 6, 5))
+    np.testing.assert_allclose(table.values[:, 1, 0, 0, 0], _expected(0., 1550., 5, 5))
+    assert len([f for f in os.listdir(tmp_path) if f.startswith('cell_')]) == 8
+
+
+def test_resume(tmp_path):
+    checkpointDir = str(tmp_path)
+    full = generator.generateGrid([0, 1], [810, 1550], (5,), (5,), ZENITH, output=None,
+                                  checkpointDir=checkpointDir, processes=2, loopangle=stubLoopangle)
+
+    # same values with floats instead of ints: every cell comes from the checkpoints
+    resumed = generator.generateGrid([0., 1.], [810., 1550.], (5.,), (5,), ZENITH, output=None,
+                                     checkpointDir=checkpointDir, processes=2, loopangle=failingLoopangle)
+    np.testing.assert_array_equal(resumed.values, full.values)
+
+    # an interrupted run: only the missing cell is computed
+    os.remove(os.path.join(checkpointDir, generator._cellName((1., 1550., 5, 5))))
+    calls = []
+
+    def countingLoopangle(context):
+        calls.append((context["h1"], context["wlshort"]))
+        return stubLoopangle(context)
+
+    resumed = generator.generateGrid([0, 1], [810, 1550], (5,), (5,), ZENITH, output=None,
+                                     checkpointDir=checkpointDir, processes=1, loopangle=countingLoopangle)
+    assert calls == [(1., 1550.)]
+    np.testing.assert_array_equal(resumed.values, full.values)
+
+
+@pytest.mark.parametrize('saved, zenang', [(ZENITH, ZENITH[:-1]), (ZENITH, ZENITH + 0.05), ([10.], [10., 10.])])
+def test_checkpoints_of_another_zenith_grid(tmp_path, saved, zenang):
+    generator.generateGrid([0], [810], output=None, zenang=saved, checkpointDir=str(tmp_path), processes=1,
+                           loopangle=stubLoopangle)
+    with pytest.raises(ValueError, match='another zenith grid'):
+        generator.generateGrid([0], [810], output=None, zenang=zenang, checkpointDir=str(tmp_path),
+                               processes=1, loopangle=stubLoopangle)
+
+
+def test_main_labels_the_wavelength(tmp_path, monkeypatch):
+    pytest.importorskip('matplotlib')
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(generator, 'computeCell', lambda *cell: _expected(*cell[:4])[:1].repeat(601))
+    monkeypatch.setattr(plt, 'show', lambda: None)
+    generator.main(target_wl=1550)
+
+    with open(tmp_path / 'transmission_data.csv') as f:
+        assert f.readline().strip() == 'Zenith Angle (degrees),Transmission at 1550 nm'
+    assert plt.gca().get_ylabel() == 'Transmission at 1550 nm'
+    plt.close('all')
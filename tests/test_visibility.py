@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from visibility import linkGraph, visible
+
+
+R = 6450e3
+
+
+def _positions(nSat=40, nTime=7, seed=1):
+    """ Two shells (plus a few satellites crossing R) moving randomly """
+    rng = np.random.default_rng(seed)
+    direction = rng.normal(size=(nSat, nTime, 3)).cumsum(1)
+    direction /= np.linalg.norm(direction, axis=-1, keepdims=True)
+    radius = np.where(np.arange(nSat) % 2, 6.9e6, 7.8e6)[:, None] + rng.normal(0, 2e4, (nSat, nTime))
+    radius[:3] = rng.uniform(6.3e6, 6.6e6, (3, nTime))
+    return direction * radius[..., None]
+
+
+def _bruteForce(positions, maxRange):
+    nSat, nTime = positions.shape[:2]
+    links = []
+    for k in range(nTime):
+        for i in range(nSat):
+            for j in range(i + 1, nSat):
+                a, b = positions[i, k], positions[j, k]
+                distance = np.linalg.norm(a - b)
+                with np.errstate(invalid='ignore'):
+                    if visible(a, b, R) and (maxRange is None or distance < maxRange):
+                        links.append((k, i, j, distance))
+    return links
+
+
+@pytest.mark.parametrize('maxRange', [None, 8e5, 2e6, 5e6])
+@pytest.mark.parametrize('timeChunk, blockSize', [(64, 256), (3, 7), (1, 1)])
+def test_link_graph_matches_visible(maxRange, timeChunk, blockSize):
+    positions = _positions()
+    graph = linkGraph(positions, R, maxRange, timeChunk, blockSize)
+    expected = _bruteForce(positions, maxRange)
+    assert len(expected) > 0
+
+    links = [(k, i, j, d) for k in range(len(graph)) for i, j, d in zip(*graph.links(k))]
+    assert [link[:3] for link in links] == [link[:3] for link in expected]
+    np.testing.assert_allclose([link[3] for link in links], [link[3] for link in expected], rtol=1e-12)
+
+
+def test_adjacency_is_symmetric():
+    graph = linkGraph(_positions(), R, 5e6)
+    indptr, indices = graph.adjacency(0)
+    source, target, _ = graph.links(0)
+    assert indptr[-1] == 2 * len(source)
+    for i, j in zip(source, target):
+        assert j in indices[indptr[i]:indptr[i + 1]]
+        assert i in indices[indptr[j]:indptr[j + 1]]
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact time grids.
+
+A TimeGrid is one reference epoch (np.datetime64[ns], UTC) plus an int64 array
+of offsets [ns]. It is exact to the nanosecond on any span (unlike float
+nanosecond timestamps, whose resolution is ~256 ns today), costs 8 bytes per
+sample, and converts without per-sample Python objects:
+    * to np.datetime64[ns] / pd.DatetimeIndex (np.asarray(grid) and
+      propagation.asDatetime64 accept a TimeGrid directly);
+    * to seconds from the epoch (float64), e.g. for the polOrbPass model;
+    * to Orekit AbsoluteDate, by shifting one reference date by the offsets
+      (no Python datetime per sample).
+
+TimeGrid can be used wherever a time list is accepted (channels, caches,
+passes, sweeps): it has a length, and indexing returns pd.Timestamp for
+integers and TimeGrid for slices and arrays.
+
+toDatetime64 converts a single date, in any of the forms accepted by the
+package (timelistgen tuple, datetime, pd.Timestamp, np.datetime64, ISO
+string, Orekit AbsoluteDate), to np.datetime64[ns].
+
+Note: the offsets are elapsed seconds. Like pandas, the grid ignores leap
+seconds, while AbsoluteDate.shiftedBy counts them: dates of a grid spanning a
+leap second differ by one second from the UTC labels after it.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+class TimeGrid:
+    """ Time grid: reference epoch plus offsets
+
+    Parameters
+    ----------
+    epoch: datetime, np.datetime64 or pd.Timestamp
+        Reference epoch (UTC).
+    offsets: np.array
+        Offsets from the epoch [int64 ns].
+    """
+
+    __slots__ = ('epoch', 'offsets')
+
+    def __init__(self, epoch, offsets):
+        self.epoch = np.datetime64(pd.Timestamp(epoch).to_datetime64(), 'ns')
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    # construction
+    @classmethod
+    def uniform(cls, start, stop, step):
+        """ Grid from start to stop (included if on the grid) every step [s];
+        start and stop are datetimes or the tuples used by timelistgen """
+        begin, end = (toDatetime64(t) for t in (start, stop))
+        stepNs = int(round(step * 1e9))
+        return cls(begin, np.arange(0, int((end - begin) / np.timedelta64(1, 'ns')) + 1, stepNs, dtype=np.int64))
+
+    @classmethod
+    def linspace(cls, start, stop, n):
+        """ Grid of n times evenly spaced from start to stop (both included),
+        rounded to the nanosecond """
+        begin, end = (toDatetime64(t) for t in (start, stop))
+        span = int((end - begin) / np.timedelta64(1, 'ns'))
+        k = np.arange(n, dtype=np.int64)
+        if n < 2:
+            return cls(begin, np.zeros(n, dtype=np.int64))
+        # exact integer arithmetic: span * k / (n - 1) without overflow
+        quotient, remainder = divmod(span, n - 1)
+        return cls(begin, quotient * k + (remainder * k) // (n - 1))
+
+    @classmethod
+    def fromSeconds(cls, epoch, seconds):
+        """ Grid of float offsets [s] from epoch """
+        return cls(epoch, np.round(np.asarray(seconds, dtype=float) * 1e9).astype(np.int64))
+
+    @classmethod
+    def fromTimes(cls, timeList):
+        """ Grid of a time list (TimeGrid, pd.DatetimeIndex, datetimes, ...),
+        with the first time as epoch """
+        if isinstance(timeList, cls):
+            return timeList
+        times = np.asarray(timeList, dtype='datetime64[ns]')
+        if len(times) == 0:
+            return cls(np.datetime64(0, 'ns'), np.zeros(0, dtype=np.int64))
+        return cls(times[0], (times - times[0]).astype(np.int64))
+
+    # sequence interface
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return pd.Timestamp(self.epoch + np.timedelta64(int(self.offsets[index]), 'ns'))
+        return TimeGrid(self.epoch, self.offsets[index])
+
+    def __iter__(self):
+        return iter(self.toDatetimeIndex())
+
+    def __array__(self, dtype=None, copy=None):
+        times = self.epoch + self.offsets.astype('timedelta64[ns]')
+        return times if dtype is None else times.astype(dtype)
+
+    def __repr__(self):
+        if len(self) == 0:
+            return "TimeGrid([])"
+        return f"TimeGrid({self[0]} ... {self[len(self) - 1]}, {len(self)} samples)"
+
+    # conversions
+    @property
+    def seconds(self):
+        """ Offsets from the epoch [s], as float64 """
+        return self.offsets / 1e9
+
+    def toDatetime64(self):
+        """ Times as a np.datetime64[ns] array """
+        return self.__array__()
+
+    def toDatetimeIndex(self):
+        """ Times as a pd.DatetimeIndex """
+        return pd.DatetimeIndex(self.__array__())
+
+    def int64(self):
+        """ Times as int64 nanoseconds since 1970 """
+        return self.epoch.astype(np.int64) + self.offsets
+
+    def absoluteDates(self, metrics=None):
+        """ Orekit AbsoluteDate of each time
+
+        One reference date is built from the epoch, and shifted by the
+        integer seconds and the remaining fraction of each offset, which keeps
+        the nanosecond resolution on any span. This avoids a Python datetime
+        per sample, but not the JVM: each date is still one shiftedBy call
+        (two with a fractional offset), so the cost stays linear in the
+        number of samples. The calls into Orekit are counted as 'jvmCalls' in
+        metrics (see instrumentation.py), if given.
+        """
+        from orekitcontext import getContext
+        getContext()
+        from orekit.pyhelpers import datetime_to_absolutedate
+
+        # reference on a whole second, exactly representable as a datetime
+        second = self.epoch.astype('datetime64[s]')
+        reference = datetime_to_absolutedate(pd.Timestamp(second).to_pydatetime())
+        offsets = self.offsets + (self.epoch - second).astype(np.int64)
+
+        whole, fraction = np.divmod(offsets, 10 ** 9)
+        whole = whole.astype(float)
+        fraction = fraction / 1e9
+
+        if metrics is not None:
+            metrics.count('jvmCalls', 1 + len(self) * (2 if fraction.any() else 1))
+        if not fraction.any():
+            return [reference.shiftedBy(w) for w in whole.tolist()]
+        return [reference.shiftedBy(w).shiftedBy(f) for w, f in zip(whole.tolist(), fraction.tolist())]
+
+
+def toDatetime64(date):
+    """ Convert a date to np.datetime64[ns]
+
+    Parameters
+    ----------
+    date: tuple, datetime, pd.Timestamp, np.datetime64, str or AbsoluteDate
+        Date (UTC); tuples are the ones used by timelistgen, e.g.
+        (2024, 1, 23, 23).
+
+    Returns
+    -------
+    np.datetime64
+        Date [ns].
+    """
+    if isinstance(date, tuple):
+        date = datetime(*date)
+    elif hasattr(date, 'durationFrom'):
+        from orekit.pyhelpers import absolutedate_to_datetime
+        date = absolutedate_to_datetime(date)
+    return np.datetime64(pd.Timestamp(date).to_datetime64(), 'ns')
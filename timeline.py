@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Precomputed channel timelines.
+
+Discrete-event simulations (e.g. NetSquid with FixedSatelliteLossModel) query
+the channel at their own event times, many more times than the channel
+changes. A ChannelTimeline stores the range, the elevation and the total
+transmittance of a channel on a time base, as float32 arrays, and interpolates
+them linearly at any time:
+    * on a uniform time base, the lookup is O(1) (index = time / step); a
+      base counts as uniform when every sample is within 1 ns of the regular
+      grid through its ends, so that timelistgen / TimeGrid.linspace grids
+      (exact to the nanosecond, with +-1 ns rounding of the steps) qualify;
+    * on an arbitrary (increasing) time base, it is a binary search.
+Bulk lookups take arrays of event times, and timelines are saved to / loaded
+from .npz files, so that the propagator never runs in the simulation loop.
+
+Times are given in seconds from the origin of the timeline (by default its
+first sample), which is the natural clock of a simulation starting at the
+origin; absolute times (datetime, np.datetime64) are accepted by lookupAt.
+"""
+import numpy as np
+import pandas as pd
+
+import propagation
+
+from model import end_to_end
+from timegrid import TimeGrid
+
+
+quantities = ('length', 'elevation', 'transmittance')
+
+
+class ChannelTimeline:
+    """ Channel parameters on a time base
+
+    Parameters
+    ----------
+    timeList: list
+        Increasing times of the samples (list of times or TimeGrid).
+    length: np.array
+        Length of the channel [m].
+    elevation: np.array
+        Elevation [degrees].
+    transmittance: np.array
+        Total (end-to-end) transmittance.
+    origin: datetime, optional
+        Origin of the time axis of the lookups (default: the first time).
+    outside: float
+        Value returned for the times outside the timeline (default NaN); the
+        transmittance is 0 outside.
+    """
+
+    def __init__(self, timeList, length, elevation, transmittance, origin=None, outside=np.nan):
+        times = propagation.asDatetime64(timeList)
+        if len(times) < 2:
+            raise ValueError("a channel timeline needs at least two samples")
+        self.origin = times[0] if origin is None else np.datetime64(pd.Timestamp(origin).to_datetime64(), 'ns')
+        self.outside = outside
+
+        offsets = (times - self.origin).astype(np.int64)
+        if np.any(np.diff(offsets) <= 0):
+            raise ValueError("the times of a channel timeline must be increasing")
+
+        # uniform time base (within the 1 ns rounding of the grids): keep only
+        # the start and the step
+        step = (offsets[-1] - offsets[0]) / (len(offsets) - 1)
+        regular = offsets[0] + step * np.arange(len(offsets))
+        if np.abs(offsets - regular).max() <= 1.:
+            self.start = offsets[0] / 1e9
+            self.step = step / 1e9
+            self.seconds = None
+        else:
+            self.start = offsets[0] / 1e9
+            self.step = None
+            self.seconds = offsets / 1e9
+
+        self.length = np.asarray(length, dtype=np.float32)
+        self.elevation = np.asarray(elevation, dtype=np.float32)
+        self.transmittance = np.asarray(transmittance, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.length)
+
+    def __repr__(self):
+        base = f"step {self.step} s" if self.isUniform else "indexed"
+        return f"ChannelTimeline({len(self)} samples, {base}, origin {pd.Timestamp(self.origin)})"
+
+    @property
+    def isUniform(self):
+        return self.step is not None
+
+    @property
+    def timeList(self):
+        """ Times of the samples, as a TimeGrid """
+        if self.isUniform:
+            seconds = self.start + self.step * np.arange(len(self))
+        else:
+            seconds = self.seconds
+        return TimeGrid.fromSeconds(self.origin, seconds)
+
+    # construction
+    @classmethod
+    def fromChannel(cls, channel, timeList, DT, DR, wl, r0, transmittance=None, minElevation=0., **kwargs):
+        """ Timeline of a SimpleDownlinkChannel
+
+        Parameters
+        ----------
+        channel: SimpleDownlinkChannel
+            Channel.
+        timeList: list
+            Time base (a uniform TimeGrid gives O(1) lookups).
+        DT, DR, wl, r0: float
+            Link parameters (see model.end_to_end).
+        transmittance: callable, optional
+            Atmospheric transmittance as a function of the elevation [degrees]
+            (e.g. a TransmittanceTable); 1 if not given.
+        minElevation: float
+            The total transmittance is 0 below this elevation [degrees].
+        kwargs:
+            Passed to calculateChannelParameters (bulk, frameTolerance).
+        """
+        length, elevation, timeList = channel.calculateChannelParameters(timeList, **kwargs)
+        atmosphere = transmittance(elevation) if transmittance is not None else 1.
+        total = np.where(elevation >= minElevation, end_to_end(DT, DR, wl, atmosphere, length, r0), 0.)
+        return cls(timeList, length, elevation, total)
+
+    # lookups
+    def _locate(self, t):
+        """ Index of the lower sample and interpolation weight of the upper one,
+        and mask of the times inside the timeline """
+        t = np.asarray(t, dtype=float)
+        if self.isUniform:
+            x = (t - self.start) / self.step
+            index = np.floor(x)
+            inside = (x >= 0) & (x <= len(self) - 1)
+        else:
+            index = np.searchsorted(self.seconds, t, side='right') - 1.
+            inside = (t >= self.seconds[0]) & (t <= self.seconds[-1])
+        index = np.clip(index, 0, len(self) - 2).astype(np.intp)
+
+        if self.isUniform:
+            weight = x - index
+        else:
+            weight = (t - self.seconds[index]) / (self.seconds[index + 1] - self.seconds[index])
+        return (index, weight, inside)
+
+    def lookup(self, t, quantity='transmittance'):
+        """ Interpolated quantity at the times t [s from the origin]
+
+        Parameters
+        ----------
+        t: float or np.array
+            Times of the events [s from the origin].
+        quantity: str
+            'length', 'elevation' or 'transmittance'.
+
+        Returns
+        -------
+        float or np.array
+            Interpolated values (float64), of the shape of t.
+        """
+        values = getattr(self, quantity)
+        index, weight, inside = self._locate(t)
+        lower = values[index].astype(float)
+        result = lower + weight * (values[index + 1] - lower)
+        outside = 0. if quantity == 'transmittance' else self.outside
+        result = np.where(inside, result, outside)
+        return result if result.ndim else float(result)
+
+    def lookupAll(self, t):
+        """ Length, elevation and transmittance at the times t, sharing the
+        location of the times """
+        index, weight, inside = self._locate(t)
+        results = []
+        for quantity in quantities:
+            values = getattr(self, quantity)
+            lower = values[index].astype(float)
+            outside = 0. if quantity == 'transmittance' else self.outside
+            results.append(np.where(inside, lower + weight * (values[index + 1] - lower), outside))
+        return tuple(results)
+
+    def lookupAt(self, times, quantity='transmittance'):
+        """ Interpolated quantity at absolute times (datetimes, TimeGrid, ...) """
+        seconds = (propagation.asDatetime64(times) - self.origin) / np.timedelta64(1, 's')
+        return self.lookup(seconds, quantity)
+
+    def __call__(self, t):
+        """ Total transmittance at the time t [s from the origin] """
+        return self.lookup(t)
+
+    # import / export
+    def save(self, path):
+        """ Save the timeline as a .npz file """
+        arrays = dict(origin=self.origin.astype(np.int64), start=self.start, outside=self.outside,
+                      length=self.length, elevation=self.elevation, transmittance=self.transmittance)
+        if self.isUniform:
+            arrays['step'] = self.step
+        else:
+            arrays['seconds'] = self.seconds
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """ Load a timeline saved with save """
+        with np.load(path) as data:
+            timeline = cls.__new__(cls)
+            timeline.origin = np.datetime64(int(data['origin']), 'ns')
+            timeline.start = float(data['start'])
+            timeline.outside = float(data['outside'])
+            timeline.step = float(data['step']) if 'step' in data else None
+            timeline.seconds = data['seconds'] if 'seconds' in data else None
+            for quantity in quantities:
+                setattr(timeline, quantity, data[quantity])
+        return timeline
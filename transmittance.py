@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Atmospheric transmittance tables.
+
+A TransmittanceTable holds the atmospheric transmittance on a grid whose first
+axis is the zenith angle [degrees], optionally followed by other axes such as
+the wavelength [nm], the site altitude [km] and the LOWTRAN atmospheric model.
+Tables are imported from the CSV files generated with lowtran (see
+transmittance_csv_generator.py), and saved to / loaded from a compact binary
+format (.ttab) which is memory-mapped when read.
+
+The interpolation is multilinear on the numerical axes and exact on the
+categorical ones (model, ihaze), and takes the elevation arrays returned by
+SimpleDownlinkChannel.calculateChannelParameters directly. Like np.interp,
+coordinates outside the grid are clamped to its edges.
+
+The .ttab format is: the 8-byte magic b'TTAB0001', the length of the header
+as a little-endian uint64, a JSON header (axes, dtype, shape, metadata), zero
+padding to a multiple of 64 bytes, and the values in C order.
+"""
+import functools
+import json
+import os
+import struct
+
+import numpy as np
+
+from instrumentation import activeMetrics
+
+
+MAGIC = b'TTAB0001'
+
+# axes on which the values are not interpolated
+categoricalAxes = ('model', 'ihaze')
+
+# wavelength [nm] of the bundled site CSV files. Their header always reads
+# "Transmission at 810 nm" (the old generator wrote it whatever the
+# wavelength), so it cannot be trusted: Paris and Nice are the 1550 nm data of
+# exampleTLEMiciusParis.py, corrected1 the 0-60 degrees grid of the generator
+# default (810 nm).
+siteWavelengths = {'Paris': 1550., 'Nice': 1550., 'corrected1': 810.}
+
+
+class transmittanceTableError(Exception):
+    pass
+
+
+class TransmittanceTable:
+    """ Transmittance table
+
+    Parameters
+    ----------
+    axes: dict
+        Ordered mapping from the axis names to their (increasing) grid
+        values. The first axis must be 'zenith' [degrees].
+    values: np.array
+        Transmittance, of shape (len(axis) for axis in axes).
+    metadata: dict, optional
+        Free-form description of the table (site, source, ...).
+    """
+
+    def __init__(self, axes, values, metadata=None):
+        self.axes = {name: np.asarray(grid, dtype=float) for name, grid in axes.items()}
+        self.values = values
+        self.metadata = dict(metadata or {})
+
+        if next(iter(self.axes)) != 'zenith':
+            raise transmittanceTableError("the first axis of a transmittance table must be 'zenith'")
+        if tuple(len(grid) for grid in self.axes.values()) != self.values.shape:
+            raise transmittanceTableError("the shape of the values does not match the axes")
+
+    def __repr__(self):
+        axes = ', '.join(f"{name}[{len(grid)}]" for name, grid in self.axes.items())
+        return f"TransmittanceTable({axes})"
+
+    # import / export
+    @classmethod
+    def fromCsv(cls, path, wavelength=None, **coordinates):
+        """ Import a lowtran CSV file (zenith angle, transmission)
+
+        Parameters
+        ----------
+        path: str
+            CSV file with a one-line header (ignored).
+        wavelength: float, optional
+            Wavelength [nm] of the file; without it, the table has no
+            wavelength axis. It is not read from the header, which is not
+            reliable (see siteWavelengths).
+        coordinates:
+            Values of the other axes for this file, e.g. altitude=0.08,
+            model=5.
+        """
+        data = np.genfromtxt(path, delimiter=',', skip_header=1)
+        if wavelength is not None:
+            coordinates = dict(wavelength=float(wavelength), **coordinates)
+
+        axes = {'zenith': data[:, 0]}
+        axes.update({name: [value] for name, value in coordinates.items()})
+        values = data[:, 1].reshape((len(data),) + (1,) * len(coordinates))
+
+        return cls(axes, values, metadata={'source': os.path.basename(path)})
+
+    @classmethod
+    def stack(cls, tables, axis):
+        """ Stack tables with the same zenith grid along a (new or length-1)
+        axis, sorted by its coordinate """
+        tables = sorted(tables, key=lambda table: float(table.axes[axis][0]))
+        reference = tables[0]
+        for table in tables[1:]:
+            if list(table.axes) != list(reference.axes) or not all(
+                    np.array_equal(table.axes[name], reference.axes[name]) for name in reference.axes if name != axis):
+                raise transmittanceTableError("stacked tables must share their other axes")
+
+        position = list(reference.axes).index(axis)
+        axes = dict(reference.axes)
+        axes[axis] = np.concatenate([table.axes[axis] for table in tables])
+        values = np.concatenate([np.asarray(table.values) for table in tables], axis=position)
+        return cls(axes, values, metadata=reference.metadata)
+
+    def save(self, path):
+        """ Save the table in the binary .ttab format """
+        values = np.ascontiguousarray(self.values, dtype=np.float32)
+        header = json.dumps({
+            'axes': {name: grid.tolist() for name, grid in self.axes.items()},
+            'dtype': values.dtype.str,
+            'shape': list(values.shape),
+            'metadata': self.metadata,
+        }).encode()
+        offset = len(MAGIC) + 8 + len(header)
+        padding = -offset % 64
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header) + padding))
+            f.write(header + b' ' * padding)
+            f.write(values.tobytes())
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ Load a .ttab table, memory-mapping the values by default """
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise transmittanceTableError(f"'{path}' is not a transmittance table")
+            (length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(length))
+        offset = len(MAGIC) + 8 + length
+        shape = tuple(header['shape'])
+
+        if mmap:
+            values = np.memmap(path, dtype=header['dtype'], mode='r', offset=offset, shape=shape)
+        else:
+            values = np.fromfile(path, dtype=header['dtype'], offset=offset).reshape(shape)
+
+        return cls(header['axes'], values, metadata=header['metadata'])
+
+    # interpolation
+    def interpolate(self, elevation=None, zenith=None, **coordinates):
+        """ Interpolate the transmittance
+
+        Parameters
+        ----------
+        elevation: array_like
+            Elevation [degrees] (alternatively, give the zenith angle).
+        zenith: array_like
+            Zenith angle [degrees].
+        coordinates:
+            Coordinates on the other axes (scalars or arrays broadcasting with
+            the elevation). They can be omitted for axes of length 1.
+
+        Returns
+        -------
+        np.array
+            Transmittance, with the broadcast shape of the coordinates.
+
+        The lookups are timed as the 'atmosphere' stage of the active metrics
+        (see instrumentation.py).
+        """
+        with activeMetrics().stage('atmosphere'):
+            return self._interpolate(elevation, zenith, **coordinates)
+
+    def _interpolate(self, elevation, zenith, **coordinates):
+        if zenith is None:
+            if elevation is None:
+                raise transmittanceTableError("give either the elevation or the zenith angle")
+            zenith = 90 - np.asarray(elevation, dtype=float)
+        coordinates['zenith'] = zenith
+
+        for name in coordinates:
+            if name not in self.axes:
+                raise transmittanceTableError(f"unknown axis '{name}'")
+
+        names = list(self.axes)
+        arrays = np.broadcast_arrays(*[np.asarray(coordinates.get(name, self.axes[name][0]), dtype=float)
+                                       for name in names])
+        shape = arrays[0].shape
+
+        # index of the lower corner and weight of the upper one along each axis
+        lower = []
+        weights = []
+        for name, x in zip(names, arrays):
+            grid = self.axes[name]
+            if len(grid) == 1:
+                lower.append(np.zeros(shape, dtype=int))
+                weights.append(None)
+            elif name in categoricalAxes:
+                index = np.searchsorted(grid, x)
+                index = np.clip(index, 0, len(grid) - 1)
+                if np.any(grid[index] != x):
+                    raise transmittanceTableError(f"'{name}' values must be on the grid {grid.tolist()}")
+                lower.append(index)
+                weights.append(None)
+            else:
+                x = np.clip(x, grid[0], grid[-1])
+                index = np.clip(np.searchsorted(grid, x, side='right') - 1, 0, len(grid) - 2)
+                lower.append(index)
+                weights.append((x - grid[index]) / (grid[index + 1] - grid[index]))
+
+        interpolated = [k for k, w in enumerate(weights) if w is not None]
+        result = np.zeros(shape)
+        for corner in range(2 ** len(interpolated)):
+            index = list(lower)
+            weight = np.ones(shape)
+            for bit, k in enumerate(interpolated):
+                if corner >> bit & 1:
+                    index[k] = lower[k] + 1
+                    weight = weight * weights[k]
+                else:
+                    weight = weight * (1 - weights[k])
+            result += weight * self.values[tuple(index)]
+
+        return result
+
+    def __call__(self, elevation, **coordinates):
+        return self.interpolate(elevation, **coordinates)
+
+    def atWavelength(self, wavelength):
+        """ Table restricted to one point of the wavelength axis
+
+        Parameters
+        ----------
+        wavelength: float
+            Wavelength [nm]; it must be on the wavelength axis (the
+            transmittance is not interpolated between wavelengths here).
+
+        Returns
+        -------
+        TransmittanceTable
+        """
+        if 'wavelength' not in self.axes:
+            raise transmittanceTableError(f"the table of {self.metadata.get('site', 'the site')} "
+                                          f"has no wavelength axis, cannot check {wavelength} nm")
+        grid = self.axes['wavelength']
+        match = np.nonzero(np.isclose(grid, wavelength, rtol=1e-9, atol=0))[0]
+        if len(match) == 0:
+            raise transmittanceTableError(f"no {wavelength} nm data for {self.metadata.get('site', 'the table')} "
+                                          f"(available: {grid.tolist()})")
+        index = int(match[0])
+        axes = dict(self.axes)
+        axes['wavelength'] = grid[index:index + 1]
+        values = np.take(self.values, [index], axis=list(self.axes).index('wavelength'))
+        return TransmittanceTable(axes, values, self.metadata)
+
+
+@functools.lru_cache(maxsize=None)
+def siteTransmittance(site, wavelength=None, directory='.'):
+    """ Transmittance table of a site, loaded once per site/wavelength
+
+    The table is read from '<directory>/transmission_data_<site>.ttab' if it
+    exists, from the lowtran CSV 'transmission_data_<site>.csv' otherwise,
+    with the wavelength of siteWavelengths.
+
+    Parameters
+    ----------
+    site: str
+        Name of the site, e.g. 'Paris'.
+    wavelength: float, optional
+        Wavelength [nm]; if given, the table is restricted to it (see
+        TransmittanceTable.atWavelength), and it must be on its grid.
+
+    Returns
+    -------
+    TransmittanceTable
+    """
+    base = os.path.join(directory, f'transmission_data_{site}')
+    if os.path.isfile(base + '.ttab'):
+        table = TransmittanceTable.load(base + '.ttab')
+    else:
+        table = TransmittanceTable.fromCsv(base + '.csv', siteWavelengths.get(site))
+    table.metadata.setdefault('site', site)
+
+    if wavelength is not None:
+        table = table.atWavelength(wavelength)
+    return table
@@ -1,79 +1,207 @@
-#Used the https://github.com/francescopiccia/lowtran-piccia/tree/main code 
-
-#!/usr/bin/env python
-# coding: utf-8
-
-
-import numpy as np
-import csv
-import matplotlib.pyplot as plt
-import lowtran
-
-def main(obsalt=0.0, target_wl=810, model=5): 
-    """
-This script interacts with the LOWTRAN atmospheric model to compute and visualize the transmission data for a specific wavelength across a range of zenith angles. The focus is on providing detailed insights into ground-to-space transmission at a single wavelength, particularly useful for applications in atmospheric sciences and satellite communications.
-
-Functions:
-    main(obsalt=0.0, target_wl=810, model=5):
-        Runs the LOWTRAN model for a specific wavelength (default 810 nm) across a range of zenith angles. It generates a CSV file with the calculated transmission data and plots the transmission versus zenith angles.
-
-        Parameters:
-            obsalt (float): The altitude of the observer/ground station in kilometers. Default is 0.0 km.
-            target_wl (float): The target wavelength in nanometers for which the transmission data is to be calculated. Default is 810 nm.
-            model (int): The LOWTRAN atmospheric model to be used for calculations. Default is model 5 (subarctic winter).
-
-        The function computes the transmission data using LOWTRAN, focusing on the target wavelength over a range of zenith angles from 0 to 60 degrees (with a step of 0.1 degrees). It then writes this data to a CSV file named 'transmission_data.csv'. Additionally, it plots the transmission data against the zenith angles, providing a visual representation of how atmospheric transmission varies with the angle at the specified wavelength.
-
-        The script ensures that the data for the specific wavelength is accurately extracted and correctly aligned with each zenith angle, thus providing precise and reliable results suitable for further analysis in atmospheric transmission studies.
-
-Example Usage:
-    To run the script for an observer altitude of 1 km, target wavelength of 810 nm, and using LOWTRAN model 5, simply call:
-    
-    main(obsalt=1.0, target_wl=810, model=5)
-
-    This will generate the CSV file and display the plot for the specified parameters.
-"""
-
-    zenang = np.arange(0, 60.1, 0.1)  #we generate angles from 0 to 60 with a step of 0.1
-
-    #context for specific wavelength (810 nm)
-    context = {
-        "wlshort": target_wl,
-        "wllong": target_wl,
-        "wlstep": 20,  # minimum step size
-        "model": model,
-        "itype": 3,
-        "iemsct": 0,
-        "im": 0,
-        "ihaze": 5,
-        "h1": obsalt,
-        "angle": zenang,
-    }
-
-    TR = lowtran.loopangle(context).squeeze()
-
-    #we extract transmission data for 810 nm at each zenith angle
-    transmission_at_target_wl = TR['transmission'].values.flatten()
-
-    #we prepare the data for CSV
-    csv_data = [['Zenith Angle (degrees)', 'Transmission at 810 nm']]
-    csv_data.extend(zip(zenang, transmission_at_target_wl))
-
-    #we write the data to CSV
-    with open('transmission_data.csv', 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerows(csv_data)
-
-    print("CSV file 'transmission_data.csv' created.")
-    
-    print(np.size(zenang))
-    print(np.size(transmission_at_target_wl))
-    plt.figure()
-    plt.plot(zenang, transmission_at_target_wl)
-    plt.xlabel('Zenith Angle (degrees)')
-    plt.ylabel('Transmission at 810 nm')
-    plt.title('Ground to Space Transmission')
-    plt.show()
-
-# Test the function
-main()
+#Used the https://github.com/francescopiccia/lowtran-piccia/tree/main code 
+
+#!/usr/bin/env python
+# coding: utf-8
+
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from transmittance import TransmittanceTable
+
+
+DEFAULT_ZENITH = np.arange(0, 60.1, 0.1)
+
+
+def lowtranContext(obsalt, target_wl, model, ihaze, zenang):
+    """Context of a lowtran.loopangle call for one wavelength and a zenith grid."""
+    return {
+        "wlshort": target_wl,
+        "wllong": target_wl,
+        "wlstep": 20,  # minimum step size
+        "model": model,
+        "itype": 3,
+        "iemsct": 0,
+        "im": 0,
+        "ihaze": ihaze,
+        "h1": obsalt,
+        "angle": zenang,
+    }
+
+
+def computeCell(obsalt, target_wl, model, ihaze, zenang, loopangle=None):
+    """
+Runs LOWTRAN for one cell of the grid (observer altitude [km], wavelength [nm], atmospheric model, haze model) over the zenith angles zenang [degrees], and returns the transmission at each zenith angle.
+
+loopangle stands in for lowtran.loopangle (e.g. a stub without the Fortran dependency); it must be a picklable function taking the lowtran context and returning an object whose ['transmission'].values hold the transmission.
+"""
+    if loopangle is None:
+        import lowtran
+        loopangle = lowtran.loopangle
+
+    TR = loopangle(lowtranContext(obsalt, target_wl, model, ihaze, np.asarray(zenang)))
+    return np.asarray(TR['transmission'].values, dtype=float).reshape(-1)
+
+
+def _cellName(cell):
+    # cells are normalized by generateGrid (floats and ints), so that e.g. 0 and 0.0 share a checkpoint
+    return "cell_alt{!r}_wl{!r}_model{:d}_ihaze{:d}.npy".format(*cell)
+
+
+def _runCell(args):
+    cell, zenang, checkpointDir, loopangle = args
+    transmission = computeCell(*cell, zenang, loopangle)
+    if checkpointDir is not None:
+        path = os.path.join(checkpointDir, _cellName(cell))
+        np.save(path + ".tmp.npy", transmission)
+        os.replace(path + ".tmp.npy", path)
+    return cell, transmission
+
+
+def generateGrid(altitudes, wavelengths, models=(5,), ihazes=(5,), zenang=DEFAULT_ZENITH,
+                 output="transmission_grid.ttab", checkpointDir=None, processes=None, loopangle=None):
+    """
+Computes the LOWTRAN transmission on the cartesian product of (observer altitude, wavelength, model, ihaze) over the zenith grid, and writes it as a single TransmittanceTable (see transmittance.py).
+
+The cells are computed in parallel over a process pool. If checkpointDir is given, every finished cell is saved there, and the cells already present are not recomputed, so that an interrupted run can be resumed by calling the function again with the same arguments. Altitudes and wavelengths are taken as floats and models as ints (duplicates removed), so that e.g. 0 and 0.0 resume the same checkpoint.
+
+Parameters:
+    altitudes (list): observer altitudes in kilometers.
+    wavelengths (list): wavelengths in nanometers.
+    models (list): LOWTRAN atmospheric models.
+    ihazes (list): LOWTRAN aerosol (haze) models.
+    zenang (array): zenith angles in degrees.
+    output (str): path of the .ttab table to write (None to skip writing).
+    checkpointDir (str): directory of the per-cell checkpoints.
+    processes (int): number of worker processes (default: number of cores; 1 runs serially).
+    loopangle (function): replacement for lowtran.loopangle, for tests.
+
+Returns:
+    TransmittanceTable with the axes zenith, wavelength, altitude, model and ihaze.
+"""
+    zenang = np.asarray(zenang, dtype=float)
+    grid = {"altitude": sorted({float(a) for a in altitudes}), "wavelength": sorted({float(w) for w in wavelengths}),
+            "model": sorted({int(m) for m in models}), "ihaze": sorted({int(i) for i in ihazes})}
+    cells = list(itertools.product(grid["altitude"], grid["wavelength"], grid["model"], grid["ihaze"]))
+
+    results = {}
+    if checkpointDir is not None:
+        os.makedirs(checkpointDir, exist_ok=True)
+        # the checkpoints are only valid for the same zenith grid
+        gridPath = os.path.join(checkpointDir, "zenith.json")
+        if os.path.isfile(gridPath):
+            with open(gridPath) as f:
+                saved = np.asarray(json.load(f), dtype=float)
+            if saved.shape != zenang.shape or not np.allclose(saved, zenang):
+                raise ValueError(f"the checkpoints in '{checkpointDir}' use another zenith grid")
+        else:
+            with open(gridPath, "w") as f:
+                json.dump(zenang.tolist(), f)
+
+        for cell in cells:
+            path = os.path.join(checkpointDir, _cellName(cell))
+            if os.path.isfile(path):
+                results[cell] = np.load(path)
+
+    todo = [(cell, zenang, checkpointDir, loopangle) for cell in cells if cell not in results]
+    if todo:
+        if processes == 1:
+            results.update(map(_runCell, todo))
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                results.update(pool.imap_unordered(_runCell, todo))
+
+    values = np.zeros((len(zenang), len(grid["wavelength"]), len(grid["altitude"]),
+                       len(grid["model"]), len(grid["ihaze"])))
+    for (obsalt, target_wl, model, ihaze), transmission in results.items():
+        values[:, grid["wavelength"].index(target_wl), grid["altitude"].index(obsalt),
+               grid["model"].index(model), grid["ihaze"].index(ihaze)] = transmission
+
+    table = TransmittanceTable({"zenith": zenang, "wavelength": grid["wavelength"], "altitude": grid["altitude"],
+                                "model": grid["model"], "ihaze": grid["ihaze"]}, values,
+                               metadata={"source": "lowtran"})
+    if output is not None:
+        table.save(output)
+    return table
+
+
+def main(obsalt=0.0, target_wl=810, model=5): 
+    """
+This script interacts with the LOWTRAN atmospheric model to compute and visualize the transmission data for a specific wavelength across a range of zenith angles. The focus is on providing detailed insights into ground-to-space transmission at a single wavelength, particularly useful for applications in atmospheric sciences and satellite communications.
+
+Functions:
+    main(obsalt=0.0, target_wl=810, model=5):
+        Runs the LOWTRAN model for a specific wavelength (default 810 nm) across a range of zenith angles. It generates a CSV file with the calculated transmission data and plots the transmission versus zenith angles.
+
+        Parameters:
+            obsalt (float): The altitude of the observer/ground station in kilometers. Default is 0.0 km.
+            target_wl (float): The target wavelength in nanometers for which the transmission data is to be calculated. Default is 810 nm.
+            model (int): The LOWTRAN atmospheric model to be used for calculations. Default is model 5 (subarctic winter).
+
+        The function computes the transmission data using LOWTRAN, focusing on the target wavelength over a range of zenith angles from 0 to 60 degrees (with a step of 0.1 degrees). It then writes this data to a CSV file named 'transmission_data.csv'. Additionally, it plots the transmission data against the zenith angles, providing a visual representation of how atmospheric transmission varies with the angle at the specified wavelength.
+
+        The script ensures that the data for the specific wavelength is accurately extracted and correctly aligned with each zenith angle, thus providing precise and reliable results suitable for further analysis in atmospheric transmission studies.
+
+Example Usage:
+    To run the script for an observer altitude of 1 km, target wavelength of 810 nm, and using LOWTRAN model 5, simply call:
+    
+    main(obsalt=1.0, target_wl=810, model=5)
+
+    This will generate the CSV file and display the plot for the specified parameters.
+"""
+
+    zenang = np.arange(0, 60.1, 0.1)  #we generate angles from 0 to 60 with a step of 0.1
+
+    import matplotlib.pyplot as plt
+
+    #we extract transmission data for the target wavelength at each zenith angle
+    transmission_at_target_wl = computeCell(obsalt, target_wl, model, 5, zenang)
+    label = f'Transmission at {target_wl:g} nm'
+
+    #we prepare the data for CSV
+    csv_data = [['Zenith Angle (degrees)', label]]
+    csv_data.extend(zip(zenang, transmission_at_target_wl))
+
+    #we write the data to CSV
+    with open('transmission_data.csv', 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerows(csv_data)
+
+    print("CSV file 'transmission_data.csv' created.")
+    
+    print(np.size(zenang))
+    print(np.size(transmission_at_target_wl))
+    plt.figure()
+    plt.plot(zenang, transmission_at_target_wl)
+    plt.xlabel('Zenith Angle (degrees)')
+    plt.ylabel(label)
+    plt.title('Ground to Space Transmission')
+    plt.show()
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="Generate a LOWTRAN transmittance grid (headless).")
+    parser.add_argument("--altitudes", type=float, nargs="+", default=[0.0], help="observer altitudes [km]")
+    parser.add_argument("--wavelengths", type=float, nargs="+", default=[810.0, 1550.0], help="wavelengths [nm]")
+    parser.add_argument("--models", type=int, nargs="+", default=[5], help="LOWTRAN atmospheric models")
+    parser.add_argument("--ihaze", type=int, nargs="+", default=[5], help="LOWTRAN haze models")
+    parser.add_argument("--zenith-max", type=float, default=60.0, help="maximum zenith angle [degrees]")
+    parser.add_argument("--zenith-step", type=float, default=0.1, help="zenith angle step [degrees]")
+    parser.add_argument("--output", default="transmission_grid.ttab", help="output table")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint directory, to resume interrupted runs")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseArguments()
+    zenang = np.arange(0, args.zenith_max + args.zenith_step / 2, args.zenith_step)
+    table = generateGrid(args.altitudes, args.wavelengths, args.models, args.ihaze, zenang, args.output,
+                         args.checkpoint, args.processes)
+    print(f"{table} written to '{args.output}'.")
@@ -13,6 +13,8 @@ Acoord and Bcoord ar either length 3 iterable, or arrays of
 
 The default value correspond to the earth with a slightly too 
 thick atmosphere
+
+This per-pair function is the reference for linkGraph.
 """
   def v2(npv): return (npv**2).sum(0)
   Acoord=np.array(Acoord)
@@ -20,5 +22,132 @@ thick atmosphere
   R2=R*R
   
   return (np.sqrt(v2(Acoord-Bcoord)) <
-    np.sqrt(v2(Acoord)-R2) + np.sqrt(v2(Acoord) -R2))
+    np.sqrt(v2(Acoord)-R2) + np.sqrt(v2(Bcoord) -R2))
+
+
+
+class LinkGraph:
+  """Time-indexed inter-satellite link graph, as returned by linkGraph.
+
+The links of epoch k are the entries epochPtr[k]:epochPtr[k+1] of the
+source, target (source < target) and distance [m] arrays, sorted by
+(source, target): a CSR layout over the epochs.
+"""
+  def __init__(self, nSatellites, epochPtr, source, target, distance):
+    self.nSatellites = nSatellites
+    self.epochPtr = epochPtr
+    self.source = source
+    self.target = target
+    self.distance = distance
+
+  def __len__(self):
+    return len(self.epochPtr) - 1
+
+  def __repr__(self):
+    return "LinkGraph(%d satellites, %d epochs, %d links)" % (
+      self.nSatellites, len(self), len(self.source))
+
+  def links(self, k):
+    """(source, target, distance) of the links at epoch k"""
+    sl = slice(self.epochPtr[k], self.epochPtr[k+1])
+    return (self.source[sl], self.target[sl], self.distance[sl])
+
+  def counts(self):
+    """Number of links per epoch"""
+    return np.diff(self.epochPtr)
+
+  def adjacency(self, k):
+    """Symmetric CSR adjacency (indptr, indices) of epoch k"""
+    src, tgt, _ = self.links(k)
+    rows = np.concatenate((src, tgt))
+    cols = np.concatenate((tgt, src))
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(self.nSatellites+1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=self.nSatellites), out=indptr[1:])
+    return (indptr, cols[order])
+
+
+def linkGraph(positions, R=6450e3, maxRange=None, timeChunk=64, blockSize=256):
+  """Computes the line-of-sight graph of a constellation over time, with
+the same criterion as visible.
+
+positions is an array of shape (n_sat, n_time, 3) of cartesian coordinates
+(in meters, centered on the planet, in any frame), as returned by
+propagation.TLEElements.propagate / itrfPositions or
+MultiLinkChannel.satellitePositions. It may be memory-mapped: it is read
+timeChunk epochs at a time. Pairs are further restricted to a distance below
+maxRange [m] if given.
+
+The pairs are evaluated by blocks of blockSize x blockSize satellites, so
+that the temporary arrays hold at most blockSize**2 * timeChunk * 3 floats
+(~100 MB with the defaults) whatever the size of the constellation.
+Satellites below the radius R are discarded. The satellites are sorted by
+radius and, with maxRange, the columns of each row block stop at the first
+satellite whose minimum radius exceeds the maximum radius of the block by
+maxRange (found with np.searchsorted). This only saves work when the
+constellation spans several shells; a single shell evaluates all the pairs.
+
+Returns a LinkGraph.
+"""
+  positions = np.asarray(positions)
+  nSat, nTime = positions.shape[:2]
+  R2 = R*R
+
+  epochPtr = np.zeros(nTime+1, dtype=np.int64)
+  sources, targets, distances = [], [], []
+
+  for t0 in range(0, nTime, timeChunk):
+    t1 = min(t0+timeChunk, nTime)
+    pos = np.asarray(positions[:, t0:t1], dtype=float)
+    r2 = (pos**2).sum(-1)
+    # tangent length to the sphere, nan below R
+    with np.errstate(invalid='ignore'):
+      tangent = np.sqrt(r2-R2)
+    tangent[r2 <= R2] = np.nan
+
+    # radius bounds over the chunk, and order of the candidates by radius
+    radius = np.sqrt(r2)
+    rMin = radius.min(1)
+    rMax = radius.max(1)
+    alive = np.nonzero(np.isfinite(tangent).any(1))[0]
+    alive = alive[np.argsort(rMin[alive], kind='stable')]
+
+    chunkEdges = []
+    sortedMin = rMin[alive]
+    for b0 in range(0, len(alive), blockSize):
+      # pairs (p, q) of positions in alive with p in the row block and q > p
+      rowPos = np.arange(b0, min(b0+blockSize, len(alive)))
+      rows = alive[rowPos]
+      colEnd = len(alive)
+      if maxRange is not None:
+        # |rA - rB| is a lower bound of the distance
+        colEnd = np.searchsorted(sortedMin, rMax[rows].max()+maxRange)
+      for c0 in range(b0+1, colEnd, blockSize):
+        colPos = np.arange(c0, min(c0+blockSize, colEnd))
+        cols = alive[colPos]
+
+        diff = pos[rows][:, None]-pos[cols][None, :]
+        dist = np.sqrt((diff**2).sum(-1))
+        with np.errstate(invalid='ignore'):
+          link = dist < tangent[rows][:, None]+tangent[cols][None, :]
+        if maxRange is not None:
+          link &= dist < maxRange
+        link &= (rowPos[:, None] < colPos[None, :])[:, :, None]
+
+        i, j, k = np.nonzero(link)
+        chunkEdges.append((k+t0, np.minimum(rows[i], cols[j]), np.maximum(rows[i], cols[j]), dist[i, j, k]))
+
+    if chunkEdges:
+      epoch, src, tgt, dist = (np.concatenate(a) for a in zip(*chunkEdges))
+      order = np.lexsort((tgt, src, epoch))
+      sources.append(src[order].astype(np.int32))
+      targets.append(tgt[order].astype(np.int32))
+      distances.append(dist[order])
+      epochPtr[t0+1:t1+1] = np.bincount(epoch-t0, minlength=t1-t0)
 
+  np.cumsum(epochPtr, out=epochPtr)
+  if sources:
+    return LinkGraph(nSat, epochPtr, np.concatenate(sources), np.concatenate(targets),
+                     np.concatenate(distances))
+  empty = np.zeros(0, dtype=np.int32)
+  return LinkGraph(nSat, epochPtr, empty, empty, np.zeros(0))